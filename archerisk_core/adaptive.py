@@ -0,0 +1,191 @@
+from __future__ import annotations
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .aggregate import GROUP_FIELDS, StreamingAggregator
+from .dataset_generate import iter_cells, make_episode
+from .episode_schema import Episode, EpisodeResult
+from .metrics import METRIC_FIELDS, wilson_ci
+from .trace import TRACE_LEVELS, TracePolicy
+from .codec import encode_episode
+from .utils import tee_lines
+
+METRIC_NAMES = [m for m, _ in METRIC_FIELDS]
+# dataset order (task, topology family, mode, baseline, archetype) -> GROUP_FIELDS order
+_TO_GROUP = (3, 2, 1, 0, 4)
+
+def half_width(k: int, n: int) -> float:
+    lo, hi = wilson_ci(k, n)
+    return (hi - lo) / 2
+
+def required_n(k: int, n: int, target: float, z: float = 1.96) -> int:
+    # Agresti-Coull estimate, so cells at 0 or 1 still ask for the episodes a Wilson
+    # interval needs to narrow (about z^2 / (2 * target) of them)
+    p = (k + 2) / (n + 4)
+    return max(math.ceil(z * z * p * (1 - p) / (target * target)), math.ceil(z * z / (2 * target)))
+
+class AdaptiveSampler:
+    """Sequential per-cell sampling that stops a cell once its Wilson CIs are tight enough.
+
+    Every cell first gets `min_per_cell` episodes. After each round, a cell whose Wilson
+    half-width for every metric in `metrics` is at most `target` is done; the others are
+    scheduled the episodes their current rates suggest they still need (at most doubling
+    per round). When `budget` runs short, the widest cells are served first. Episodes are
+    numbered and seeded like `generate`, so a run is reproducible from `seed`.
+    """
+
+    def __init__(self, seed: int, target: float, metrics: Sequence[str] = tuple(METRIC_NAMES),
+                 min_per_cell: int = 20, max_per_cell: Optional[int] = None, budget: Optional[int] = None) -> None:
+        self.seed = seed
+        self.target = target
+        self.metrics = [METRIC_NAMES.index(m) + 1 for m in metrics]
+        self.min_per_cell = min_per_cell
+        self.max_per_cell = max_per_cell
+        self.budget = budget
+        self.cells = [tuple(c[i] for i in _TO_GROUP) for c in iter_cells()]
+        self.agg = StreamingAggregator()
+        self.rng = random.Random(seed)
+        self.idx = 0
+        self.rounds = 0
+
+    def counts(self, key: Tuple[str, ...]) -> List[int]:
+        return self.agg.cells.get(key, [0] * (1 + len(METRIC_FIELDS)))
+
+    def widths(self, key: Tuple[str, ...]) -> Dict[str, float]:
+        c = self.counts(key)
+        return {METRIC_NAMES[i - 1]: (half_width(c[i], c[0]) if c[0] else 0.5) for i in self.metrics}
+
+    def converged(self, key: Tuple[str, ...]) -> bool:
+        c = self.counts(key)
+        return c[0] >= self.min_per_cell and all(half_width(c[i], c[0]) <= self.target for i in self.metrics)
+
+    def _capped(self, key: Tuple[str, ...]) -> bool:
+        return self.max_per_cell is not None and self.counts(key)[0] >= self.max_per_cell
+
+    def plan(self) -> List[Tuple[Tuple[str, ...], int]]:
+        """Episodes to add per open cell in the next round (empty when sampling is finished)."""
+        wants: List[Tuple[float, Tuple[str, ...], int]] = []
+        for key in self.cells:
+            if self.converged(key) or self._capped(key):
+                continue
+            c = self.counts(key)
+            if c[0] < self.min_per_cell:
+                add = self.min_per_cell - c[0]
+            else:
+                need = max(required_n(c[i], c[0], self.target) for i in self.metrics)
+                add = min(max(need - c[0], 1), c[0])
+            if self.max_per_cell is not None:
+                add = min(add, self.max_per_cell - c[0])
+            wants.append((max(self.widths(key).values()), key, add))
+        if self.budget is not None:
+            left = self.budget - self.idx
+            kept = []
+            for _, key, add in sorted(wants, key=lambda w: -w[0]):
+                if left <= 0:
+                    break
+                kept.append((key, min(add, left)))
+                left -= add
+            order = {k: i for i, k in enumerate(self.cells)}
+            return sorted(kept, key=lambda ka: order[ka[0]])
+        return [(key, add) for _, key, add in wants]
+
+    def episodes(self, plan: Sequence[Tuple[Tuple[str, ...], int]]) -> Iterator[Episode]:
+        self.rounds += 1
+        for key, add in plan:
+            f = dict(zip(GROUP_FIELDS, key))
+            for _ in range(add):
+                yield make_episode(self.rng, self.idx, self.seed, f["task_family"], f["topology_family"],
+                                   f["topology_mode"], f["defense_baseline"], f["attack_archetype"])
+                self.idx += 1
+
+    def update(self, result: EpisodeResult) -> None:
+        self.agg.update(result.to_dict())
+
+    def report(self) -> Dict[str, Any]:
+        cells = []
+        for key in self.cells:
+            cells.append({"cell": list(key), "n": self.counts(key)[0], "converged": self.converged(key),
+                          "half_width": self.widths(key)})
+        n_max = max(c["n"] for c in cells)
+        return {
+            "target_half_width": self.target,
+            "metrics": [METRIC_NAMES[i - 1] for i in self.metrics],
+            "rounds": self.rounds,
+            "episodes": self.idx,
+            "converged_cells": sum(c["converged"] for c in cells),
+            "cells_total": len(cells),
+            # a balanced design reaching the same precision everywhere needs the largest cell's n in every cell
+            "balanced_equivalent": n_max * len(cells),
+            "cells": cells,
+        }
+
+def iter_adaptive(sampler: AdaptiveSampler, **run_kwargs: Any) -> Iterator[Tuple[Episode, EpisodeResult]]:
+    """Run rounds until `sampler.plan()` is empty; `run_kwargs` go to `parallel.run_episodes`.
+
+    With `workers > 1` one process pool serves every round, so small rounds do not each pay
+    the pool's startup and import cost.
+    """
+    from .parallel import run_episodes
+
+    with contextlib.ExitStack() as stack:
+        if run_kwargs.get("workers", 1) > 1 and run_kwargs.get("executor") is None:
+            from concurrent.futures import ProcessPoolExecutor
+            run_kwargs["executor"] = stack.enter_context(ProcessPoolExecutor(max_workers=run_kwargs["workers"]))
+        while True:
+            plan = sampler.plan()
+            if not plan:
+                return
+            eps = list(sampler.episodes(plan))
+            for ep, r in zip(eps, run_episodes(eps, **run_kwargs)):
+                sampler.update(r)
+                yield ep, r
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Sample each factor cell until its Wilson CIs reach a target half-width")
+    ap.add_argument("--out", required=True, help="Output EpisodeResult JSONL (or directory with --format columnar)")
+    ap.add_argument("--format", choices=["jsonl", "columnar"], default="jsonl")
+    ap.add_argument("--data_out", default=None, help="Also write the generated Episode JSONL here")
+    ap.add_argument("--report", default=None, help="Per-cell sample sizes and half-widths JSON")
+    ap.add_argument("--half_width", type=float, default=0.05, help="Target Wilson 95%% CI half-width")
+    ap.add_argument("--metrics", nargs="+", choices=METRIC_NAMES, default=METRIC_NAMES)
+    ap.add_argument("--min_per_cell", type=int, default=20)
+    ap.add_argument("--max_per_cell", type=int, default=None)
+    ap.add_argument("--budget", type=int, default=None, help="Total episode budget")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--trace_dir", default="runs/traces")
+    ap.add_argument("--trace", choices=TRACE_LEVELS, default="off")
+    ap.add_argument("--trace_rate", type=float, default=0.01)
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--chunk_size", type=int, default=256)
+    args = ap.parse_args(argv)
+
+    from .columnar import write_results
+
+    sampler = AdaptiveSampler(args.seed, args.half_width, args.metrics, args.min_per_cell,
+                              args.max_per_cell, args.budget)
+    pairs = iter_adaptive(sampler, trace_dir=args.trace_dir, workers=args.workers, chunk_size=args.chunk_size,
+                          policy=TracePolicy(args.trace, args.trace_rate))
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    if args.data_out:
+        os.makedirs(os.path.dirname(args.data_out) or ".", exist_ok=True)
+        with open(args.data_out, "w", encoding="utf-8") as data_f:
+            pairs = tee_lines(data_f, pairs, lambda p: encode_episode(p[0]))
+            n = write_results(args.out, (r.to_dict() for _, r in pairs), args.format)
+    else:
+        n = write_results(args.out, (r.to_dict() for _, r in pairs), args.format)
+
+    rep = sampler.report()
+    print(f"[OK] {n} episodes in {rep['rounds']} rounds; {rep['converged_cells']}/{rep['cells_total']} cells "
+          f"within ±{args.half_width} (a balanced design would need {rep['balanced_equivalent']})")
+    print(f"[OK] wrote results to {args.out}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(rep, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
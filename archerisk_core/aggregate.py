@@ -2,27 +2,151 @@ from __future__ import annotations
 import argparse
 import json
 import os
-from collections import defaultdict
-from typing import Dict, Any, List, Tuple
-
-from .utils import read_jsonl
-from .metrics import summarize_group
+from operator import attrgetter
+from typing import Dict, Any, Iterable, Iterator, List, Sequence, Tuple, Optional
+
+from .codec import iter_result_rows
+from .shard import add_shard_arg, checksum, load_manifest, parse_shard, write_manifest
+from .metrics import METRIC_FIELDS, summarize_counts
+
+GROUP_FIELDS = ("defense_baseline", "topology_mode", "topology_family", "task_family", "attack_archetype")
+ARCHETYPES = ["MANIPULATOR", "COVERT_ACTOR", "DECEIVER", "INFILTRATOR_ESCALATOR", "MIXED"]
+BASELINES = ["B1", "B2", "B3"]
+TOPOLOGIES = ["chain", "star", "fully_connected", "reviewer_hub"]
+
+class StreamingAggregator:
+    """Single-pass, mergeable aggregation of EpisodeResult rows.
+
+    Keeps one integer counter vector [n, ASR, LeakRate, UWR, TaskSuccess] per
+    GROUP_FIELDS cell; every coarser table in the summary is a sum of those cells,
+    so memory is bounded by the number of cells, not the number of rows.
+    """
+
+    def __init__(self) -> None:
+        self.cells: Dict[Tuple[str, ...], List[int]] = {}
+
+    def update(self, row: Dict[str, Any]) -> None:
+        key = tuple(row[f] for f in GROUP_FIELDS)
+        self._count(key, [row[f] for _, f in METRIC_FIELDS])
+
+    def observe(self, results: Iterable[Any]) -> Iterator[Any]:
+        """Pass EpisodeResult objects through unchanged while counting them."""
+        key_of = attrgetter(*GROUP_FIELDS)
+        flags_of = attrgetter(*(f for _, f in METRIC_FIELDS))
+        for r in results:
+            self._count(key_of(r), flags_of(r))
+            yield r
+
+    def _count(self, key: Tuple[str, ...], flags: Sequence[bool]) -> None:
+        c = self.cells.get(key)
+        if c is None:
+            c = self.cells[key] = [0] * (1 + len(METRIC_FIELDS))
+        c[0] += 1
+        for i, flag in enumerate(flags, 1):
+            if flag:
+                c[i] += 1
+
+    def update_many(self, rows: Iterable[Dict[str, Any]]) -> "StreamingAggregator":
+        for r in rows:
+            self.update(r)
+        return self
+
+    def update_columns(self, cols: Dict[str, Any]) -> "StreamingAggregator":
+        """Count a columnar batch (see `columnar.load_columns`) with np.bincount."""
+        import numpy as np
+        dicts = cols["dictionaries"]
+        sizes = tuple(len(dicts[f]) for f in GROUP_FIELDS)
+        if cols["n"] == 0:
+            return self
+        cell = np.ravel_multi_index([np.asarray(cols[f], dtype=np.intp) for f in GROUP_FIELDS], sizes)
+        total = int(np.prod(sizes))
+        counts = [np.bincount(cell, minlength=total)]
+        counts += [np.bincount(cell[np.asarray(cols[f], dtype=bool)], minlength=total) for _, f in METRIC_FIELDS]
+        # visit cells in first-seen order so summaries match the row-by-row path
+        uniq, first = np.unique(cell, return_index=True)
+        for c in uniq[np.argsort(first)]:
+            key = tuple(dicts[f][int(i)] for f, i in zip(GROUP_FIELDS, np.unravel_index(c, sizes)))
+            self.add_counts(key, [int(x[c]) for x in counts])
+        return self
+
+    def update_path(self, path: str) -> "StreamingAggregator":
+        from .columnar import is_columnar, load_columns
+        if is_columnar(path):
+            return self.update_columns(load_columns(path))
+        return self.update_many(iter_result_rows(path))
+
+    def add_counts(self, key: Tuple[str, ...], counts: List[int]) -> None:
+        c = self.cells.get(key)
+        if c is None:
+            self.cells[key] = list(counts)
+        else:
+            for i, v in enumerate(counts):
+                c[i] += v
+
+    def merge(self, other: "StreamingAggregator") -> "StreamingAggregator":
+        for key, counts in other.cells.items():
+            self.add_counts(key, counts)
+        return self
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "fields": list(GROUP_FIELDS),
+            "metrics": [m for m, _ in METRIC_FIELDS],
+            "cells": [[list(k), c] for k, c in self.cells.items()],
+        }
 
-def _key(r: Dict[str, Any], fields: Tuple[str, ...]) -> Tuple[Any, ...]:
-    return tuple(r[f] for f in fields)
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "StreamingAggregator":
+        if state.get("fields") != list(GROUP_FIELDS):
+            raise ValueError(f"Aggregator state has incompatible fields: {state.get('fields')}")
+        agg = cls()
+        for key, counts in state["cells"]:
+            agg.add_counts(tuple(key), counts)
+        return agg
+
+    def _sum(self, **match: str) -> List[int]:
+        idx = [(GROUP_FIELDS.index(f), v) for f, v in match.items()]
+        tot = [0] * (1 + len(METRIC_FIELDS))
+        for key, c in self.cells.items():
+            if all(key[i] == v for i, v in idx):
+                for j, x in enumerate(c):
+                    tot[j] += x
+        return tot
+
+    def summary(self) -> Dict[str, Any]:
+        def rates(c: List[int]) -> Dict[str, Any]:
+            gm = summarize_counts(c[0], c[1:])
+            return {m: gm[m].__dict__ for m in gm}
+
+        grouped_metrics = {str(k): rates(c) for k, c in self.cells.items()}
+
+        tableA: Dict[str, Any] = {a: {} for a in ARCHETYPES}
+        for a in ARCHETYPES:
+            for b in BASELINES:
+                tableA[a][b] = rates(self._sum(topology_mode="DEFENDED", attack_archetype=a, defense_baseline=b))
+
+        tableB: Dict[str, Any] = {t: {} for t in TOPOLOGIES}
+        for t in TOPOLOGIES:
+            for b in BASELINES:
+                tableB[t][b] = rates(self._sum(topology_mode="DEFENDED", topology_family=t, defense_baseline=b))
+
+        return {
+            "n_total": sum(c[0] for c in self.cells.values()),
+            "n_defended": self._sum(topology_mode="DEFENDED")[0],
+            "grouped_metrics": grouped_metrics,
+            "tables": {
+                "defended_by_archetype_baseline": tableA,
+                "defended_uwr_by_topology_baseline": tableB,
+            }
+        }
 
-def _group(rows: List[Dict[str, Any]], fields: Tuple[str, ...]) -> Dict[Tuple[Any, ...], List[Dict[str, Any]]]:
-    g: Dict[Tuple[Any, ...], List[Dict[str, Any]]] = defaultdict(list)
-    for r in rows:
-        g[_key(r, fields)].append(r)
-    return g
+def summarize_rows(rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    return StreamingAggregator().update_many(rows).summary()
 
 def _latex_rate(rt: Dict[str, Any]) -> str:
     return f"{rt['p']:.2f} [{rt['lo']:.2f}, {rt['hi']:.2f}]"
 
-def export_latex_tables(summary: Dict[str, Any], latex_dir: str) -> None:
-    os.makedirs(latex_dir, exist_ok=True)
-
+def _table_asr(summary: Dict[str, Any]) -> List[str]:
     tableA = summary["tables"]["defended_by_archetype_baseline"]
     baselines = ["B1", "B2", "B3"]
     archetypes = ["MANIPULATOR", "COVERT_ACTOR", "DECEIVER", "INFILTRATOR_ESCALATOR", "MIXED"]
@@ -40,10 +164,11 @@ def export_latex_tables(summary: Dict[str, Any], latex_dir: str) -> None:
         lines.append(" & ".join(row) + " \\")
     lines.append("\\bottomrule")
     lines.append("\\end{tabular}")
-    with open(os.path.join(latex_dir, "tab_asr_defended.tex"), "w", encoding="utf-8") as f:
-        f.write("\n".join(lines) + "\n")
+    return lines
 
+def _table_uwr(summary: Dict[str, Any]) -> List[str]:
     tableB = summary["tables"]["defended_uwr_by_topology_baseline"]
+    baselines = ["B1", "B2", "B3"]
     topo = ["chain", "star", "fully_connected", "reviewer_hub"]
 
     lines = []
@@ -59,59 +184,67 @@ def export_latex_tables(summary: Dict[str, Any], latex_dir: str) -> None:
         lines.append(" & ".join(row) + " \\")
     lines.append("\\bottomrule")
     lines.append("\\end{tabular}")
-    with open(os.path.join(latex_dir, "tab_uwr_topology.tex"), "w", encoding="utf-8") as f:
-        f.write("\n".join(lines) + "\n")
+    return lines
 
-def main() -> None:
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--in", dest="inp", required=True, help="Input EpisodeResult JSONL")
-    ap.add_argument("--out", required=True, help="Output summary JSON")
-    ap.add_argument("--latex_dir", default="paper_lncs/tables", help="Output LaTeX tables dir")
-    args = ap.parse_args()
-
-    rows = read_jsonl(args.inp)
+# file name (without .tex) -> table builder
+LATEX_TABLES = {"tab_asr_defended": _table_asr, "tab_uwr_topology": _table_uwr}
 
-    fields = ("defense_baseline", "topology_mode", "topology_family", "task_family", "attack_archetype")
-    groups = _group(rows, fields)
-
-    grouped_metrics: Dict[str, Any] = {}
-    for k, rs in groups.items():
-        gm = summarize_group(rs)
-        grouped_metrics[str(k)] = {m: gm[m].__dict__ for m in gm}
-
-    defended = [r for r in rows if r["topology_mode"] == "DEFENDED"]
+def export_latex_table(summary: Dict[str, Any], name: str, latex_dir: str) -> str:
+    os.makedirs(latex_dir, exist_ok=True)
+    path = os.path.join(latex_dir, f"{name}.tex")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(LATEX_TABLES[name](summary)) + "\n")
+    return path
 
-    archetypes = ["MANIPULATOR", "COVERT_ACTOR", "DECEIVER", "INFILTRATOR_ESCALATOR", "MIXED"]
-    baselines = ["B1", "B2", "B3"]
-    tableA: Dict[str, Any] = {a: {} for a in archetypes}
-    for a in archetypes:
-        for b in baselines:
-            rs = [r for r in defended if r["attack_archetype"] == a and r["defense_baseline"] == b]
-            gm = summarize_group(rs)
-            tableA[a][b] = {m: gm[m].__dict__ for m in gm}
+def export_latex_tables(summary: Dict[str, Any], latex_dir: str) -> None:
+    for name in LATEX_TABLES:
+        export_latex_table(summary, name, latex_dir)
 
-    topo = ["chain", "star", "fully_connected", "reviewer_hub"]
-    tableB: Dict[str, Any] = {t: {} for t in topo}
-    for t in topo:
-        for b in baselines:
-            rs = [r for r in defended if r["topology_family"] == t and r["defense_baseline"] == b]
-            gm = summarize_group(rs)
-            tableB[t][b] = {m: gm[m].__dict__ for m in gm}
-
-    summary = {
-        "n_total": len(rows),
-        "n_defended": len(defended),
-        "grouped_metrics": grouped_metrics,
-        "tables": {
-            "defended_by_archetype_baseline": tableA,
-            "defended_uwr_by_topology_baseline": tableB,
-        }
-    }
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--in", dest="inp", nargs="*", default=[],
+                    help="Input EpisodeResult JSONL file(s) or columnar result directories")
+    ap.add_argument("--state", nargs="*", default=[], help="Aggregator state JSON file(s) to merge in")
+    ap.add_argument("--out", required=True, help="Output summary JSON")
+    ap.add_argument("--state_out", default=None, help="Also write the mergeable aggregator state here")
+    ap.add_argument("--latex_dir", default="paper_lncs/tables", help="Output LaTeX tables dir")
+    add_shard_arg(ap)
+    args = ap.parse_args(argv)
+    if not (args.inp or args.state):
+        ap.error("pass at least one --in or --state")
+    run = None
+    if args.shard:
+        # a shard state is derived from exactly one result shard, whose manifest it is checked against
+        if len(args.inp) != 1 or args.state or not args.state_out:
+            ap.error("--shard takes one --in result shard and needs --state_out")
+        run = load_manifest(args.inp[0])
+        if run is None or run["stage"] != "run" or parse_shard(run["shard"]) != args.shard:
+            ap.error(f"{args.inp[0]} has no arche-risk-run --shard {args.shard} manifest")
+        if checksum(args.inp[0]) != run["sha256"]:
+            ap.error(f"{args.inp[0]} does not match the checksum in its shard manifest")
+
+    agg = StreamingAggregator()
+    for path in args.inp:
+        agg.update_path(path)
+    for path in args.state:
+        with open(path, "r", encoding="utf-8") as f:
+            agg.merge(StreamingAggregator.from_state(json.load(f)))
+
+    summary = agg.summary()
 
     os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
     with open(args.out, "w", encoding="utf-8") as f:
         json.dump(summary, f, ensure_ascii=False, indent=2)
 
+    if args.state_out:
+        os.makedirs(os.path.dirname(args.state_out) or ".", exist_ok=True)
+        with open(args.state_out, "w", encoding="utf-8") as f:
+            json.dump(agg.to_state(), f)
+        print(f"[OK] wrote aggregator state to {args.state_out}")
+        if run is not None:
+            write_manifest(args.state_out, "aggregate", args.shard, run["total"], summary["n_total"],
+                           run["config"], input_sha256=run["sha256"])
+
     export_latex_tables(summary, args.latex_dir)
 
     print(f"[OK] wrote summary to {args.out}")
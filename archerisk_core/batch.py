@@ -0,0 +1,222 @@
+from __future__ import annotations
+import argparse
+import math
+import os
+from dataclasses import dataclass, replace
+from typing import Dict, Any, List, Mapping, Sequence, Tuple, Optional
+
+import numpy as np
+
+from .episode_schema import Episode, EpisodeResult
+from .archetypes import ARCHETYPES
+from .dataset_generate import TASK_FAMILIES, TOPOLOGY_FAMILIES, TOPOLOGY_MODES, BASELINES
+from .agents import solve_task
+from .params import DEFAULT_PARAMS, SimParams
+from .runner import _attack_prob, _leak_prob, _uwr_prob, _task_degrade_prob
+from .episode_store import read_episodes
+from .codec import encode_results
+
+# Categorical factor columns and their level order (codes index into these lists)
+FACTORS: Dict[str, List[str]] = {
+    "defense_baseline": BASELINES,
+    "topology_mode": TOPOLOGY_MODES,
+    "topology_family": TOPOLOGY_FAMILIES,
+    "attack_archetype": ARCHETYPES,
+    "task_family": TASK_FAMILIES,
+}
+
+LEAKY = ("MANIPULATOR", "DECEIVER", "MIXED")
+TOOLY = ("COVERT_ACTOR", "INFILTRATOR_ESCALATOR", "MIXED")
+
+@dataclass(frozen=True)
+class CellTables:
+    """Per-cell probabilities of the simulator, indexed [baseline, mode, topology, archetype]."""
+    p_attack: np.ndarray
+    p_leak: np.ndarray
+    p_uwr: np.ndarray
+    p_bypass: np.ndarray       # planner-sink leak bypass (0 where it does not apply)
+    forced_leak: np.ndarray    # release stage leaks unconditionally (reviewer sink, no guard)
+    forced_uwr: np.ndarray     # tool stage flags the protected write unconditionally
+    p_degrade: np.ndarray
+
+def cell_tables(params: SimParams = DEFAULT_PARAMS) -> CellTables:
+    # Evaluate the reference probability functions over every factor level, so the
+    # batch engine can never drift from `simulate_episode`'s constants.
+    shape = tuple(len(FACTORS[f]) for f in ("defense_baseline", "topology_mode", "topology_family", "attack_archetype"))
+    t = {k: np.zeros(shape) for k in ("p_attack", "p_leak", "p_uwr", "p_bypass", "p_degrade")}
+    forced_leak = np.zeros(shape, dtype=bool)
+    forced_uwr = np.zeros(shape, dtype=bool)
+    for bi, b in enumerate(BASELINES):
+        for mi, m in enumerate(TOPOLOGY_MODES):
+            for ti, topo in enumerate(TOPOLOGY_FAMILIES):
+                sink = params.sink_role[topo]
+                for ai, a in enumerate(ARCHETYPES):
+                    idx = (bi, mi, ti, ai)
+                    t["p_attack"][idx] = _attack_prob(b, m, topo, a, params)
+                    t["p_leak"][idx] = _leak_prob(a, b, sink, params)
+                    t["p_uwr"][idx] = _uwr_prob(a, b, sink, params)
+                    t["p_degrade"][idx] = _task_degrade_prob(a, b, params)
+                    if sink != "reviewer" and a in LEAKY:
+                        t["p_bypass"][idx] = params.planner_bypass[b]
+                    # B1 reviewer releases unredacted worker output, which carries the secret
+                    # either appended (leaky archetypes) or inside the TOOL:write_file line
+                    forced_leak[idx] = sink == "reviewer" and b == "B1"
+                    # Every sink except an unguarded reviewer records the protected write
+                    forced_uwr[idx] = a in TOOLY and not (sink == "reviewer" and b == "B1")
+    return CellTables(forced_leak=forced_leak, forced_uwr=forced_uwr, **t)
+
+def encode_factors(columns: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    """Map factor columns (level strings or integer codes) to integer code arrays."""
+    codes: Dict[str, np.ndarray] = {}
+    for f, levels in FACTORS.items():
+        col = np.asarray(columns[f])
+        if col.dtype.kind in "iu":
+            codes[f] = col.astype(np.intp, copy=False)
+            continue
+        uniq, inv = np.unique(col, return_inverse=True)
+        lut = np.empty(len(uniq), dtype=np.intp)
+        for i, u in enumerate(uniq):
+            if u not in levels:
+                raise ValueError(f"Unknown {f}: {u}")
+            lut[i] = levels.index(u)
+        codes[f] = lut[inv]
+    return codes
+
+def _solved(ep: Episode) -> bool:
+    out, gt = solve_task(ep.prompt).strip(), ep.ground_truth.strip()
+    if ep.task_family == "arithmetic_check":
+        return out == gt
+    return out.upper().startswith(gt.upper())
+
+def episodes_to_columns(eps: Sequence[Episode]) -> Dict[str, np.ndarray]:
+    cols = {f: np.array([getattr(ep, f) for ep in eps]) for f in FACTORS}
+    cols["protected"] = np.array([bool(ep.protected_paths) for ep in eps])
+    cols["solved"] = np.array([_solved(ep) for ep in eps])
+    return cols
+
+def simulate_batch(columns: Mapping[str, Any], seed: int, chunk: int = 1_000_000,
+                   params: SimParams = DEFAULT_PARAMS) -> Dict[str, np.ndarray]:
+    """Vectorized counterpart of `simulate_episode` over factor columns.
+
+    Returns boolean arrays `attack_success`, `leak`, `unauthorized_write`, `task_success`.
+    Draws come from one NumPy generator, so outcomes match the reference engine in
+    distribution (per-cell rates), not episode by episode. Optional boolean columns:
+    `protected` marks episodes with non-empty `protected_paths` and `solved` marks tasks the
+    benign worker answers correctly (see `episodes_to_columns`); both default to True.
+    """
+    codes = encode_factors(columns)
+    n = len(codes["defense_baseline"])
+    protected = np.asarray(columns["protected"], dtype=bool) if "protected" in columns else np.ones(n, dtype=bool)
+    solved = np.asarray(columns["solved"], dtype=bool) if "solved" in columns else np.ones(n, dtype=bool)
+    tab = cell_tables(params)
+    rng = np.random.default_rng(seed)
+
+    out = {k: np.empty(n, dtype=bool) for k in ("attack_success", "leak", "unauthorized_write", "task_success")}
+    for lo in range(0, n, chunk):
+        hi = min(n, lo + chunk)
+        cell = (codes["defense_baseline"][lo:hi], codes["topology_mode"][lo:hi],
+                codes["topology_family"][lo:hi], codes["attack_archetype"][lo:hi])
+        u = rng.random((5, hi - lo))
+        attack = u[0] < tab.p_attack[cell]
+        leak = attack & ((u[1] < tab.p_leak[cell]) | (u[2] < tab.p_bypass[cell]) | tab.forced_leak[cell])
+        uwr = attack & ((u[3] < tab.p_uwr[cell]) | (tab.forced_uwr[cell] & protected[lo:hi]))
+        degraded = attack & (u[4] < tab.p_degrade[cell])
+        arith = codes["task_family"][lo:hi] == TASK_FAMILIES.index("arithmetic_check")
+        out["attack_success"][lo:hi] = attack
+        out["leak"][lo:hi] = leak
+        out["unauthorized_write"][lo:hi] = uwr
+        # An attacked arithmetic answer always carries the archetype suffix, so it never matches
+        out["task_success"][lo:hi] = solved[lo:hi] & (~attack | (~degraded & ~arith))
+    return out
+
+def batch_results(eps: Sequence[Episode], seed: int) -> List[EpisodeResult]:
+    outcomes = simulate_batch(episodes_to_columns(eps), seed)
+    return [
+        EpisodeResult(
+            episode_id=ep.episode_id,
+            seed=ep.seed,
+            task_family=ep.task_family,
+            task_id=ep.task_id,
+            topology_family=ep.topology_family,
+            topology_mode=ep.topology_mode,
+            defense_baseline=ep.defense_baseline,
+            attack_archetype=ep.attack_archetype,
+            task_success=bool(outcomes["task_success"][i]),
+            attack_success=bool(outcomes["attack_success"][i]),
+            leak=bool(outcomes["leak"][i]),
+            unauthorized_write=bool(outcomes["unauthorized_write"][i]),
+            trace_path="",
+        )
+        for i, ep in enumerate(eps)
+    ]
+
+METRICS = ("attack_success", "leak", "unauthorized_write", "task_success")
+
+def _z(k_a: int, k_b: int, n: int) -> float:
+    """Two-proportion z statistic of k_a/n vs k_b/n (0 when both rates are 0 or 1)."""
+    pooled = (k_a + k_b) / (2 * n)
+    se = math.sqrt(2 * pooled * (1 - pooled) / n)
+    return 0.0 if se == 0 else (k_a - k_b) / n / se
+
+def check_against_reference(eps: Sequence[Episode], reps: int, seed: int, z_max: float = 4.5,
+                            pooled_z_max: float = 3.5) -> List[Dict[str, Any]]:
+    """Compare the rates of `simulate_batch` and `simulate_episode`.
+
+    The dataset is tiled `reps` times with fresh per-episode seeds. Returns one row per
+    (cell, metric) whose two-proportion z statistic exceeds `z_max`, and one row (cell
+    ("all",)) per metric whose rate over all episodes differs by more than `pooled_z_max`;
+    the pooled test sees every episode, so it catches shifts too small for a single cell.
+    """
+    from .runner import simulate_episode
+    from .trace import TracePolicy
+
+    tiled = [replace(ep, episode_id=f"{ep.episode_id}_r{r}", seed=ep.seed + r * len(eps) * 7919)
+             for r in range(reps) for ep in eps]
+    fast = simulate_batch(episodes_to_columns(tiled), seed)
+    off = TracePolicy("off")  # no trace files for the (reps * len(eps)) reference episodes
+    results = [simulate_episode(ep, "", policy=off) for ep in tiled]
+    ref = {m: np.array([getattr(r, m) for r in results]) for m in METRICS}
+
+    cells: Dict[Tuple[str, ...], List[int]] = {}
+    for i, ep in enumerate(tiled):
+        cells.setdefault(tuple(getattr(ep, f) for f in FACTORS), []).append(i)
+
+    failures: List[Dict[str, Any]] = []
+    checks = [(key, idx, z_max) for key, idx in cells.items()] + [(("all",), slice(None), pooled_z_max)]
+    for key, idx, limit in checks:
+        for m in METRICS:
+            k_ref, k_fast = int(ref[m][idx].sum()), int(fast[m][idx].sum())
+            n = len(ref[m][idx])
+            z = _z(k_fast, k_ref, n)
+            if abs(z) > limit:
+                failures.append({"cell": key, "metric": m, "n": n, "ref": k_ref / n, "batch": k_fast / n, "z": z})
+    return failures
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", required=True, help="Input Episode JSONL")
+    ap.add_argument("--out", default=None, help="Output EpisodeResult JSONL (trace_path is empty)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--check", action="store_true", help="Compare per-cell and pooled rates against simulate_episode")
+    ap.add_argument("--reps", type=int, default=50, help="Dataset replicas used by --check")
+    args = ap.parse_args(argv)
+
+    eps = read_episodes(args.data)
+
+    if args.out:
+        results = batch_results(eps, args.seed)
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write("".join(encode_results(results)))
+        print(f"[OK] wrote {len(results)} results to {args.out}")
+
+    if args.check:
+        failures = check_against_reference(eps, args.reps, args.seed)
+        for f in failures:
+            print(f"[FAIL] {f['cell']} {f['metric']}: ref={f['ref']:.3f} batch={f['batch']:.3f} z={f['z']:.2f} (n={f['n']})")
+        if failures:
+            raise SystemExit(1)
+        print(f"[OK] batch engine matches simulate_episode on all cells and pooled rates ({len(eps) * args.reps} episodes)")
+
+if __name__ == "__main__":
+    main()
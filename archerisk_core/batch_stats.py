@@ -0,0 +1,215 @@
+from __future__ import annotations
+import argparse
+import json
+import math
+import os
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .aggregate import GROUP_FIELDS, StreamingAggregator
+from .batch import FACTORS
+from .metrics import METRIC_FIELDS
+
+METRIC_NAMES = [m for m, _ in METRIC_FIELDS]
+_erfc = np.frompyfunc(math.erfc, 1, 1)
+
+def wilson_ci_array(k: Any, n: Any, z: float = 1.96) -> Tuple[np.ndarray, np.ndarray]:
+    """`metrics.wilson_ci` over whole arrays of counts (n == 0 gives (0, 0))."""
+    k = np.asarray(k, dtype=float)
+    n = np.asarray(n, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p = k / n
+        denom = 1 + (z * z) / n
+        center = (p + (z * z) / (2 * n)) / denom
+        half = (z * np.sqrt(p * (1 - p) / n + (z * z) / (4 * n * n))) / denom
+    empty = n == 0
+    return np.where(empty, 0.0, np.maximum(0.0, center - half)), np.where(empty, 0.0, np.minimum(1.0, center + half))
+
+def bootstrap_ci(k: Any, n: Any, groups: Optional[Any] = None, reps: int = 2000, level: float = 0.95,
+                 seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Percentile bootstrap intervals of rates, all resampled in one array operation.
+
+    Each cell's count is redrawn as Binomial(n, k / n). With `groups` (one group index per
+    cell), cells are pooled per group after resampling, i.e. a stratified bootstrap of the
+    pooled group rate; otherwise every cell is its own group.
+    """
+    k = np.asarray(k, dtype=np.int64)
+    n = np.asarray(n, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p = np.where(n > 0, k / np.maximum(n, 1), 0.0)
+    draws = rng.binomial(n, p, size=(reps,) + n.shape)
+    if groups is not None:
+        groups = np.asarray(groups, dtype=np.intp)
+        G = int(groups.max()) + 1 if groups.size else 0
+        onehot = np.zeros((groups.size, G))
+        onehot[np.arange(groups.size), groups] = 1.0
+        draws, n = draws @ onehot, np.bincount(groups, weights=n, minlength=G)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rates = np.where(n > 0, draws / np.maximum(n, 1), 0.0)
+    tail = (1 - level) / 2 * 100
+    lo, hi = np.percentile(rates, [tail, 100 - tail], axis=0)
+    return lo, hi
+
+def two_proportion_test(k1: Any, n1: Any, k2: Any, n2: Any) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pooled two-proportion z tests over arrays; returns (p1 - p2, z, two-sided p-value)."""
+    k1, n1, k2, n2 = (np.asarray(a, dtype=float) for a in (k1, n1, k2, n2))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p1, p2 = k1 / n1, k2 / n2
+        pooled = (k1 + k2) / (n1 + n2)
+        se = np.sqrt(pooled * (1 - pooled) * (1 / n1 + 1 / n2))
+        z = np.where(se > 0, (p1 - p2) / se, 0.0)
+    pval = _erfc(np.abs(z) / math.sqrt(2)).astype(float)
+    untestable = (n1 == 0) | (n2 == 0)
+    return np.where(untestable, 0.0, p1 - p2), np.where(untestable, 0.0, z), np.where(untestable, 1.0, pval)
+
+def holm(p: Any) -> np.ndarray:
+    """Holm step-down adjusted p-values (family-wise error)."""
+    p = np.asarray(p, dtype=float)
+    order = np.argsort(p, kind="stable")
+    m = p.size
+    adj = np.maximum.accumulate(np.minimum(1.0, (m - np.arange(m)) * p[order]))
+    out = np.empty(m)
+    out[order] = adj
+    return out
+
+def benjamini_hochberg(p: Any) -> np.ndarray:
+    """Benjamini-Hochberg adjusted p-values (false discovery rate)."""
+    p = np.asarray(p, dtype=float)
+    order = np.argsort(p, kind="stable")
+    m = p.size
+    adj = np.minimum.accumulate((m / np.arange(m, 0, -1) * p[order[::-1]]))[::-1]
+    out = np.empty(m)
+    out[order] = np.minimum(1.0, adj)
+    return out
+
+CORRECTIONS = {"holm": holm, "bh": benjamini_hochberg}
+
+def count_cube(agg: StreamingAggregator) -> np.ndarray:
+    """Aggregator cells as one array indexed in GROUP_FIELDS order, last axis [n, metrics...]."""
+    shape = tuple(len(FACTORS[f]) for f in GROUP_FIELDS) + (1 + len(METRIC_FIELDS),)
+    cube = np.zeros(shape, dtype=np.int64)
+    for key, c in agg.cells.items():
+        cube[tuple(FACTORS[f].index(v) for f, v in zip(GROUP_FIELDS, key))] = c
+    return cube
+
+def _by_baseline(cube: np.ndarray, by: Sequence[str]) -> Tuple[np.ndarray, List[Tuple[str, ...]]]:
+    # -> (cells, baselines, counts) with cells ranging over the `by` levels
+    keep = ["defense_baseline"] + list(by)
+    drop = tuple(i for i, f in enumerate(GROUP_FIELDS) if f not in keep)
+    summed = cube.sum(axis=drop)
+    kept = [f for f in GROUP_FIELDS if f in keep]
+    summed = np.moveaxis(summed, [kept.index(f) for f in keep], range(len(keep)))
+    labels = [tuple(FACTORS[f][i] for f, i in zip(by, idx))
+              for idx in np.ndindex(*(len(FACTORS[f]) for f in by))]
+    return np.moveaxis(summed.reshape((len(FACTORS["defense_baseline"]), len(labels), -1)), 0, 1), labels
+
+def cell_intervals(agg: StreamingAggregator, by: Sequence[str] = ("topology_mode", "attack_archetype"),
+                   reps: int = 2000, seed: int = 0) -> List[Dict[str, Any]]:
+    """Wilson and stratified-bootstrap 95% intervals of every (by..., baseline) cell and metric."""
+    cube = count_cube(agg)
+    grouped, labels = _by_baseline(cube, by)
+    C, B = grouped.shape[:2]
+    # stratify the bootstrap over the full cells pooled into each (by..., baseline) group
+    flat = cube.reshape(-1, cube.shape[-1])
+    coords = np.array(list(np.ndindex(*cube.shape[:-1])))
+    dims = [len(FACTORS[f]) for f in by]
+    c_idx = (np.ravel_multi_index(tuple(coords[:, GROUP_FIELDS.index(f)] for f in by), dims)
+             if by else np.zeros(len(coords), dtype=np.intp))
+    group = c_idx * B + coords[:, GROUP_FIELDS.index("defense_baseline")]
+
+    rows: List[Dict[str, Any]] = []
+    n = grouped[..., 0]
+    out: Dict[str, Tuple[np.ndarray, ...]] = {}
+    for j, m in enumerate(METRIC_NAMES, 1):
+        lo, hi = wilson_ci_array(grouped[..., j], n)
+        blo, bhi = bootstrap_ci(flat[:, j], flat[:, 0], groups=group, reps=reps, seed=seed + j)
+        out[m] = (grouped[..., j], lo, hi, blo.reshape(C, B), bhi.reshape(C, B))
+    for c, label in enumerate(labels):
+        for b, base in enumerate(FACTORS["defense_baseline"]):
+            if n[c, b] == 0:
+                continue
+            row: Dict[str, Any] = {**dict(zip(by, label)), "defense_baseline": base, "n": int(n[c, b])}
+            for m, (k, lo, hi, blo, bhi) in out.items():
+                row[m] = {"k": int(k[c, b]), "p": float(k[c, b] / n[c, b]), "lo": float(lo[c, b]), "hi": float(hi[c, b]),
+                          "boot_lo": float(blo[c, b]), "boot_hi": float(bhi[c, b])}
+            rows.append(row)
+    return rows
+
+def pairwise_baselines(agg: StreamingAggregator, by: Sequence[str] = ("topology_mode", "attack_archetype"),
+                       metrics: Sequence[str] = tuple(METRIC_NAMES), correction: str = "holm",
+                       alpha: float = 0.05) -> List[Dict[str, Any]]:
+    """Two-proportion tests of every baseline pair (B1/B2, B1/B3, B2/B3) in every `by` cell.
+
+    p-values are adjusted with `correction` ("holm" or "bh") over the whole family of tests
+    of one metric, i.e. all cells and pairs together.
+    """
+    grouped, labels = _by_baseline(count_cube(agg), by)
+    bases = FACTORS["defense_baseline"]
+    pairs = list(combinations(range(len(bases)), 2))
+    rows: List[Dict[str, Any]] = []
+    for m in metrics:
+        j = METRIC_NAMES.index(m) + 1
+        i1 = np.array([a for a, _ in pairs])
+        i2 = np.array([b for _, b in pairs])
+        # (cells, pairs) arrays
+        k1, n1 = grouped[:, i1, j], grouped[:, i1, 0]
+        k2, n2 = grouped[:, i2, j], grouped[:, i2, 0]
+        diff, z, p = two_proportion_test(k1, n1, k2, n2)
+        tested = (n1 > 0) & (n2 > 0)
+        p_adj = np.ones_like(p)
+        p_adj[tested] = CORRECTIONS[correction](p[tested])
+        for c, label in enumerate(labels):
+            for q, (a, b) in enumerate(pairs):
+                if not tested[c, q]:
+                    continue
+                rows.append({**dict(zip(by, label)), "metric": m, "a": bases[a], "b": bases[b],
+                             "n_a": int(n1[c, q]), "n_b": int(n2[c, q]), "diff": float(diff[c, q]),
+                             "z": float(z[c, q]), "p": float(p[c, q]), "p_adj": float(p_adj[c, q]),
+                             "significant": bool(p_adj[c, q] < alpha)})
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Array Wilson/bootstrap intervals and pairwise baseline tests")
+    ap.add_argument("--in", dest="inp", nargs="*", default=[],
+                    help="Input EpisodeResult JSONL file(s) or columnar result directories")
+    ap.add_argument("--state", nargs="*", default=[], help="Aggregator state JSON file(s) to merge in")
+    ap.add_argument("--out", required=True, help="Output statistics JSON")
+    ap.add_argument("--by", nargs="*", default=["topology_mode", "attack_archetype"],
+                    choices=[f for f in GROUP_FIELDS if f != "defense_baseline"],
+                    help="Factors defining the cells in which baselines are compared")
+    ap.add_argument("--metrics", nargs="+", choices=METRIC_NAMES, default=METRIC_NAMES)
+    ap.add_argument("--correction", choices=sorted(CORRECTIONS), default="holm")
+    ap.add_argument("--alpha", type=float, default=0.05)
+    ap.add_argument("--bootstrap", type=int, default=2000, help="Bootstrap replicates")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    if not (args.inp or args.state):
+        ap.error("pass at least one --in or --state")
+
+    agg = StreamingAggregator()
+    for path in args.inp:
+        agg.update_path(path)
+    for path in args.state:
+        with open(path, "r", encoding="utf-8") as f:
+            agg.merge(StreamingAggregator.from_state(json.load(f)))
+
+    pairwise = pairwise_baselines(agg, args.by, args.metrics, args.correction, args.alpha)
+    out = {
+        "by": args.by,
+        "correction": args.correction,
+        "alpha": args.alpha,
+        "cells": cell_intervals(agg, args.by, args.bootstrap, args.seed),
+        "pairwise": pairwise,
+    }
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(out, f, ensure_ascii=False, indent=2)
+    n_sig = sum(r["significant"] for r in pairwise)
+    print(f"[OK] {n_sig} of {len(pairwise)} baseline comparisons significant ({args.correction}, alpha={args.alpha})")
+    print(f"[OK] wrote statistics to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .codec import encode_results, iter_result_rows
+from .dataset_generate import generate
+from .episode_schema import Episode, EpisodeResult
+from .runner import simulate_episode
+from .trace import FULL_TRACE, TracePolicy
+from .utils import read_jsonl, write_jsonl
+
+@dataclass
+class Case:
+    """One benchmark: `setup(size, tmp)` builds the inputs once, `run(state)` is the timed part."""
+    name: str
+    setup: Callable[[int, str], Any]
+    run: Callable[[Any], Any]
+
+def _call_main(main: Callable[[List[str]], None], argv: List[str]) -> None:
+    # the CLI entry points print progress; run them quietly
+    with contextlib.redirect_stdout(io.StringIO()):
+        main(argv)
+
+def _episodes(size: int, tmp: str) -> List[Episode]:
+    return generate(size, 7)
+
+def _results(size: int, tmp: str) -> str:
+    path = os.path.join(tmp, f"results_{size}.jsonl")
+    if not os.path.exists(path):
+        off = TracePolicy("off")
+        write_jsonl(path, (simulate_episode(e, tmp, policy=off).to_dict() for e in generate(size, 7)))
+    return path
+
+def _sim_setup(size: int, tmp: str) -> Any:
+    trace_dir = os.path.join(tmp, "traces")
+    os.makedirs(trace_dir, exist_ok=True)
+    return _episodes(size, tmp), trace_dir
+
+def _simulate(policy: TracePolicy) -> Callable[[Any], Any]:
+    def run(state: Any) -> None:
+        eps, trace_dir = state
+        for e in eps:
+            simulate_episode(e, trace_dir, policy=policy)
+    return run
+
+def _trace_setup(size: int, tmp: str) -> Any:
+    # a full trace of a typical episode, saved `size` times
+    ep = generate(1, 7)[0]
+    tr = FULL_TRACE.start(ep.episode_id)
+    tr.set_meta(**ep.to_dict())
+    for turn in range(6):
+        tr.log_msg("worker", "planner", ep.prompt, turn)
+        tr.log_tool("worker", "write_file", path=ep.protected_paths[0], allowed=False)
+        tr.log_decision("reviewer", "approve", turn=turn)
+    d = os.path.join(tmp, "trace_save")
+    os.makedirs(d, exist_ok=True)
+    return tr, [os.path.join(d, f"t{i}.json") for i in range(size)]
+
+def _trace_save(state: Any) -> None:
+    tr, paths = state
+    for p in paths:
+        tr.save(p)
+
+def _write_setup(size: int, tmp: str) -> Any:
+    return read_jsonl(_results(size, tmp)), os.path.join(tmp, f"write_{size}.jsonl")
+
+def _codec_setup(size: int, tmp: str) -> List[EpisodeResult]:
+    return [EpisodeResult(**r) for r in read_jsonl(_results(size, tmp))]
+
+def _aggregate_setup(size: int, tmp: str) -> List[str]:
+    return ["--in", _results(size, tmp), "--out", os.path.join(tmp, f"summary_{size}.json"),
+            "--latex_dir", os.path.join(tmp, "tables")]
+
+def _plot_setup(size: int, tmp: str) -> List[str]:
+    return ["--results", _results(size, tmp), "--out", os.path.join(tmp, "figures")]
+
+def _aggregate_run(argv: List[str]) -> None:
+    from .aggregate import main
+    _call_main(main, argv)
+
+def _plot_run(argv: List[str]) -> None:
+    from .plotting import main
+    _call_main(main, argv)
+
+CASES: List[Case] = [
+    Case("generate", lambda size, tmp: size, lambda n: generate(n, 7)),
+    Case("simulate_episode.trace", _sim_setup, _simulate(FULL_TRACE)),
+    Case("simulate_episode.notrace", _sim_setup, _simulate(TracePolicy("off"))),
+    Case("Trace.save", _trace_setup, _trace_save),
+    Case("read_jsonl", _results, read_jsonl),
+    Case("write_jsonl", _write_setup, lambda s: write_jsonl(s[1], s[0])),
+    Case("codec.encode_results", _codec_setup, encode_results),
+    Case("codec.iter_result_rows", _results, lambda path: sum(1 for _ in iter_result_rows(path))),
+    Case("aggregate.main", _aggregate_setup, _aggregate_run),
+    Case("plotting.main", _plot_setup, _plot_run),
+]
+
+def time_case(case: Case, size: int, tmp: str, repeat: int) -> Dict[str, Any]:
+    state = case.setup(size, tmp)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        case.run(state)
+        times.append(time.perf_counter() - t0)
+    best = min(times)
+    return {"size": size, "repeat": repeat, "min_s": best, "median_s": statistics.median(times),
+            "per_item_us": best / size * 1e6}
+
+def run_suite(sizes: Sequence[int], repeat: int = 3, only: Optional[str] = None,
+              log: Callable[[str], None] = lambda s: None) -> Dict[str, Dict[str, Any]]:
+    """Time every case at every size; results keyed "<case>@<size>"."""
+    out: Dict[str, Dict[str, Any]] = {}
+    tmp = tempfile.mkdtemp(prefix="arche_bench_")
+    try:
+        for case in CASES:
+            if only and not re.search(only, case.name):
+                continue
+            for size in sizes:
+                r = time_case(case, size, tmp, repeat)
+                out[f"{case.name}@{size}"] = r
+                log(f"  {case.name:<26} n={size:<7} min {r['min_s'] * 1000:9.2f} ms  "
+                    f"median {r['median_s'] * 1000:9.2f} ms  {r['per_item_us']:9.2f} us/item")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float) -> List[Dict[str, Any]]:
+    """Benchmarks whose best time exceeds the baseline's by more than `threshold` (a fraction)."""
+    regressions = []
+    for key, r in results.items():
+        b = baseline.get(key)
+        if not b or b["min_s"] <= 0:
+            continue
+        ratio = r["min_s"] / b["min_s"]
+        if ratio > 1 + threshold:
+            regressions.append({"benchmark": key, "baseline_s": b["min_s"], "current_s": r["min_s"], "ratio": ratio})
+    return regressions
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Time the pipeline's hot paths and track regressions")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[200, 2000], help="Dataset sizes (episodes / rows)")
+    ap.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark (the fastest counts)")
+    ap.add_argument("--only", default=None, help="Regex selecting benchmark names")
+    ap.add_argument("--history", default="runs/bench/history.jsonl", help="JSONL file each run is appended to")
+    ap.add_argument("--baseline", default="runs/bench/baseline.json", help="Baseline results to compare against")
+    ap.add_argument("--threshold", type=float, default=0.25,
+                    help="Fail when a benchmark is slower than its baseline by more than this fraction")
+    ap.add_argument("--save_baseline", action="store_true", help="Write this run's results as the new baseline")
+    args = ap.parse_args(argv)
+
+    print(f"[BENCH] sizes={args.sizes} repeat={args.repeat}")
+    results = run_suite(args.sizes, args.repeat, args.only, log=print)
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.history) or ".", exist_ok=True)
+    with open(args.history, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    print(f"[OK] appended results to {args.history}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        print(f"[OK] wrote baseline to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"[BENCH] no baseline at {args.baseline}; rerun with --save_baseline to create one")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    for r in regressions:
+        print(f"[REGRESSION] {r['benchmark']}: {r['baseline_s'] * 1000:.2f} ms -> {r['current_s'] * 1000:.2f} ms "
+              f"({r['ratio']:.2f}x)")
+    if regressions:
+        sys.exit(1)
+    print(f"[OK] no benchmark slower than baseline by more than {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
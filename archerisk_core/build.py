@@ -0,0 +1,252 @@
+from __future__ import annotations
+import argparse
+import functools
+import hashlib
+import importlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .instrument import (NULL_PROFILER, add_profile_args, disable as disable_profiler, enable as enable_profiler,
+                         finish_from_args, start_from_args)
+from .pipeline import PipelineConfig, add_pipeline_args, config_from_args
+from .shard import checksum, listing
+
+# Incremental build of the pipeline as a graph of steps:
+#   dataset -> results -> summary -> tab_* (LaTeX tables) and fig_* (figures)
+# A step's key hashes its parameters, the source of the modules that implement it and the
+# checksums of its dependencies' outputs. The key and output checksums are stored in a state
+# file. A step is skipped when its key is unchanged and its outputs still match, so a step
+# whose inputs come out byte-identical does not rerun its dependents. Large output trees
+# (the traces) are tracked by a listing of file names, sizes and mtimes instead, and are not
+# inputs of the dependents' keys. Independent steps (the tables and figures) run
+# concurrently in worker processes.
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+@dataclass
+class Step:
+    name: str
+    action: Callable[..., Any]  # module-level function, so it can run in a pool worker
+    params: Dict[str, Any]  # fingerprinted keyword arguments of `action`
+    outputs: List[str]
+    deps: List[str] = field(default_factory=list)
+    sources: Sequence[str] = ()  # package files whose code decides the outputs
+    options: Dict[str, Any] = field(default_factory=dict)  # extra arguments that do not change the outputs
+    preload: Sequence[str] = ()  # slow-to-import modules loaded once before forking workers
+    listed: List[str] = field(default_factory=list)  # output directories tracked by `listing`, not checksummed
+
+@functools.lru_cache(maxsize=None)
+def _source_hash(rel: str) -> str:
+    return checksum(os.path.join(PACKAGE_DIR, rel))
+
+def step_key(step: Step, dep_outputs: Dict[str, str]) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps({"params": step.params, "sources": {s: _source_hash(s) for s in step.sources},
+                         "inputs": dep_outputs}, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+def _gen(out: str, target_n: int, seed: int) -> None:
+    from .dataset_generate import iter_generate
+    from .episode_store import write_episodes
+    write_episodes(out, iter_generate(target_n, seed))
+
+def _run(data: str, out: str, fmt: str, trace_dir: str, trace: str, trace_rate: float, trace_store: str,
+         workers: int = 1, cache: Optional[str] = None, cache_max_entries: int = 5_000_000, **options: Any) -> None:
+    from .episode_store import iter_episodes
+    from .parallel import RunStats, run_to_file
+    from .trace import TracePolicy
+    from .trace_store import clear_traces
+    if trace != "off":
+        if not options.get("resume"):
+            # traces of an earlier run would linger next to this run's (and in its listing)
+            clear_traces(trace_dir)
+        os.makedirs(trace_dir, exist_ok=True)
+    stats = RunStats()
+    run_to_file(iter_episodes(data), out, fmt, source=os.path.abspath(data), trace_dir=trace_dir,
+                trace_store=trace_store, policy=TracePolicy(trace, trace_rate), workers=workers, cache=cache,
+                stats=stats, **options)
+    if workers > 1:
+        print(stats.report())
+    if cache:
+        from .runner import report_cache
+        report_cache(cache, cache_max_entries, stats.cache_hits, stats.cache_misses)
+
+def _summary(results: str, out: str) -> None:
+    from .aggregate import StreamingAggregator
+    summary = StreamingAggregator().update_path(results).summary()
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _table(summary: str, name: str, latex_dir: str) -> None:
+    from .aggregate import export_latex_table
+    export_latex_table(_load(summary), name, latex_dir)
+
+def _figure(summary: str, name: str, fig_dir: str) -> None:
+    from .plotting import plot_figure
+    plot_figure(_load(summary), name, fig_dir)
+
+def pipeline_graph(cfg: PipelineConfig) -> List[Step]:
+    """The steps of `run_pipeline` for `cfg`, in dependency order."""
+    from .aggregate import LATEX_TABLES
+    from .cache import SIM_SOURCES
+    from .plotting import FIGURES
+    if not (cfg.data_out and cfg.summary_out):
+        raise ValueError("an incremental build needs data_out and summary_out files")
+    gen_sources = ("dataset_generate.py", "episode_schema.py", "archetypes.py", "topologies.py",
+                   "tasks/arithmetic.py", "tasks/policy_triage.py", "tasks/file_triage.py")
+    steps = [
+        Step("dataset", _gen, {"out": cfg.data_out, "target_n": cfg.target_n, "seed": cfg.seed},
+             [cfg.data_out], sources=gen_sources),
+        Step("results", _run, {"data": cfg.data_out, "out": cfg.results_out, "fmt": cfg.results_format,
+                               "trace_dir": cfg.trace_dir, "trace": cfg.trace, "trace_rate": cfg.trace_rate,
+                               "trace_store": cfg.trace_store},
+             [cfg.results_out], ["dataset"], SIM_SOURCES + ("trace.py", "trace_store.py"),
+             {"workers": cfg.workers, "chunk_size": cfg.chunk_size, "cache": cfg.cache,
+              "cache_max_entries": cfg.cache_max_entries, "resume": cfg.resume, "commit_every": cfg.commit_every},
+             # the rows' trace_path values point into trace_dir, so the traces are outputs too
+             listed=[cfg.trace_dir] if cfg.trace != "off" else []),
+        Step("summary", _summary, {"results": cfg.results_out, "out": cfg.summary_out},
+             [cfg.summary_out], ["results"], ("aggregate.py", "metrics.py")),
+    ]
+    if cfg.latex_dir:
+        steps += [Step(name, _table, {"summary": cfg.summary_out, "name": name, "latex_dir": cfg.latex_dir},
+                       [os.path.join(cfg.latex_dir, f"{name}.tex")], ["summary"], ("aggregate.py",))
+                  for name in LATEX_TABLES]
+    if cfg.fig_dir:
+        steps += [Step(name, _figure, {"summary": cfg.summary_out, "name": name, "fig_dir": cfg.fig_dir},
+                       [os.path.join(cfg.fig_dir, f"{name}.{ext}") for ext in ("pdf", "png")], ["summary"],
+                       ("plotting.py",), preload=("matplotlib.pyplot",))
+                  for name in FIGURES]
+    return steps
+
+def _call(step: Step, profile: bool = False) -> Tuple[float, Optional[Dict[str, Any]]]:
+    # with `profile` (pool workers of a profiled build) the step is timed as a section here
+    # and the snapshot returned for the parent to merge
+    prof = enable_profiler() if profile else NULL_PROFILER
+    t0 = time.perf_counter()
+    with prof.section(f"build.{step.name}"):
+        step.action(**step.params, **step.options)
+    secs = time.perf_counter() - t0
+    snap = None
+    if profile:
+        snap = prof.snapshot()
+        disable_profiler()
+    return secs, snap
+
+class Build:
+    def __init__(self, steps: List[Step], state_path: str, jobs: int = 4, force: bool = False,
+                 log: Callable[[str], None] = print, prof: Any = NULL_PROFILER) -> None:
+        self.steps = {s.name: s for s in steps}
+        self.state_path = state_path
+        self.jobs = jobs
+        self.force = force
+        self.log = log
+        self.prof = prof
+        self.state: Dict[str, Any] = _load(state_path) if os.path.exists(state_path) else {}
+        self.ran: List[str] = []
+        self.skipped: List[str] = []
+
+    def _inputs(self, step: Step) -> Dict[str, str]:
+        return {p: sha for d in step.deps for p, sha in self.state[d]["outputs"].items()}
+
+    def fresh(self, step: Step, key: str) -> bool:
+        rec = self.state.get(step.name)
+        if self.force or rec is None or rec["key"] != key:
+            return False
+        listed = rec.get("listed", {})
+        if set(rec["outputs"]) != set(step.outputs) or set(listed) != set(step.listed):
+            return False
+        return (all(os.path.isdir(p) and listing(p) == sha for p, sha in listed.items())
+                and all(os.path.exists(p) and checksum(p) == sha for p, sha in rec["outputs"].items()))
+
+    def _done(self, step: Step, key: str, secs: float) -> None:
+        self.state[step.name] = {"key": key, "outputs": {p: checksum(p) for p in step.outputs},
+                                 "listed": {p: listing(p) for p in step.listed},
+                                 "seconds": round(secs, 3), "built": time.time()}
+        self.ran.append(step.name)
+        self.log(f"[BUILD] {step.name}: built in {secs:.2f}s")
+        self._save()
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    def run(self, dry_run: bool = False) -> None:
+        done: set = set()
+        would_build: set = set()
+        while len(done) < len(self.steps):
+            wave = [s for s in self.steps.values() if s.name not in done and all(d in done for d in s.deps)]
+            if not wave:
+                raise ValueError(f"dependency cycle among {sorted(set(self.steps) - done)}")
+            stale = []
+            for s in wave:
+                if dry_run and would_build.intersection(s.deps):
+                    # its inputs are not known until the steps before it have run
+                    would_build.add(s.name)
+                    self.log(f"[BUILD] {s.name}: would build if its inputs change")
+                    continue
+                key = step_key(s, self._inputs(s))
+                if self.fresh(s, key):
+                    self.skipped.append(s.name)
+                    self.log(f"[BUILD] {s.name}: up to date")
+                elif dry_run:
+                    would_build.add(s.name)
+                    self.log(f"[BUILD] {s.name}: would build")
+                else:
+                    stale.append((s, key))
+            self._execute(stale)
+            done.update(s.name for s in wave)
+
+    def _execute(self, stale: List[Any]) -> None:
+        for s, _ in stale:
+            for p in s.outputs + s.listed:
+                os.makedirs(os.path.dirname(p) or ".", exist_ok=True)
+        if len(stale) <= 1 or self.jobs <= 1:
+            for s, key in stale:
+                with self.prof.section(f"build.{s.name}"):
+                    secs, _ = _call(s)
+                self._done(s, key, secs)
+            return
+        from concurrent.futures import ProcessPoolExecutor
+        for mod in sorted({m for s, _ in stale for m in s.preload}):
+            importlib.import_module(mod)
+        with ProcessPoolExecutor(max_workers=min(self.jobs, len(stale))) as pool:
+            futures = [(s, key, pool.submit(_call, s, self.prof.enabled)) for s, key in stale]
+            for s, key, fut in futures:
+                secs, snap = fut.result()
+                if snap is not None:
+                    self.prof.merge(snap)
+                self._done(s, key, secs)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Build the pipeline incrementally, rerunning only stale steps")
+    add_pipeline_args(ap)
+    ap.add_argument("--state", default="runs/build_state.json", help="Step keys and output checksums")
+    ap.add_argument("--jobs", type=int, default=4, help="Processes for independent steps (tables, figures)")
+    ap.add_argument("--force", action="store_true", help="Rebuild every step")
+    ap.add_argument("--dry_run", action="store_true", help="Only report which steps are out of date")
+    add_profile_args(ap)
+    args = ap.parse_args(argv)
+    prof = start_from_args(args)
+
+    t0 = time.perf_counter()
+    build = Build(pipeline_graph(config_from_args(args)), args.state, args.jobs, args.force, prof=prof)
+    build.run(args.dry_run)
+    if not args.dry_run:
+        print(f"[OK] built {len(build.ran)} steps, {len(build.skipped)} up to date, "
+              f"{time.perf_counter() - t0:.2f}s")
+    finish_from_args(args, prof)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+from __future__ import annotations
+import argparse
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Callable, Dict, Iterable, List, Tuple, Optional
+
+from .codec import encode_result
+from .episode_schema import Episode, EpisodeResult
+
+# Modules whose code or probability tables decide an episode's outcome; editing any of
+# them changes the fingerprint and so invalidates every cached result.
+SIM_SOURCES = ("runner.py", "params.py", "agents.py", "defenses.py", "env.py")
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+@functools.lru_cache(maxsize=None)
+def simulator_fingerprint(root: str = PACKAGE_DIR) -> str:
+    h = hashlib.sha256()
+    for name in SIM_SOURCES:
+        with open(os.path.join(root, name), "rb") as f:
+            h.update(name.encode("utf-8") + b"\0" + f.read() + b"\0")
+    return h.hexdigest()
+
+def episode_key(ep: Episode, context: str = "") -> str:
+    """Content address of an episode's result: its fields, the simulator code and `context`
+    (anything else that shapes the stored row, e.g. the trace settings)."""
+    h = hashlib.sha256()
+    h.update(json.dumps(ep.to_dict(), sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    h.update(b"\0" + simulator_fingerprint().encode("ascii") + b"\0" + context.encode("utf-8"))
+    return h.hexdigest()
+
+class ResultCache:
+    """Persistent EpisodeResult cache in a local SQLite file, shared safely between processes.
+
+    Entries carry a last-access time; `evict` trims the cache to `max_entries` least
+    recently used first.
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=60.0)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, row TEXT NOT NULL, atime REAL NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_atime ON results (atime)")
+        self.db.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, keys: List[str], valid: Optional[Callable[[EpisodeResult], bool]] = None) -> Dict[str, EpisodeResult]:
+        """Cached results by key; a row failing `valid` counts as a miss (and is replaced by the next put)."""
+        found: Dict[str, EpisodeResult] = {}
+        for i in range(0, len(keys), 500):  # stay under SQLite's bound-parameter limit
+            part = keys[i:i + 500]
+            q = f"SELECT key, row FROM results WHERE key IN ({','.join('?' * len(part))})"
+            for k, row in self.db.execute(q, part):
+                r = EpisodeResult(**json.loads(row))
+                if valid is None or valid(r):
+                    found[k] = r
+        if found:
+            now = time.time()
+            with self.db:
+                self.db.executemany("UPDATE results SET atime = ? WHERE key = ?", [(now, k) for k in found])
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, EpisodeResult]]) -> None:
+        now = time.time()
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO results (key, row, atime) VALUES (?, ?, ?)",
+                                [(k, encode_result(r)[:-1], now) for k, r in items])
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def evict(self, max_entries: int) -> int:
+        excess = len(self) - max_entries
+        if excess <= 0:
+            return 0
+        with self.db:
+            self.db.execute("DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY atime LIMIT ?)", (excess,))
+        self.evictions += excess
+        return excess
+
+    def clear(self) -> None:
+        with self.db:
+            self.db.execute("DELETE FROM results")
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def close(self) -> None:
+        self.db.close()
+
+# Process-local connections, reused across chunks by pool workers
+_CACHES: Dict[str, ResultCache] = {}
+
+def get_cache(path: str) -> ResultCache:
+    c = _CACHES.get(path)
+    if c is None:
+        c = _CACHES[path] = ResultCache(path)
+    return c
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Inspect or trim the episode result cache")
+    ap.add_argument("--cache", required=True, help="Cache SQLite file")
+    ap.add_argument("--max_entries", type=int, default=None, help="Evict least recently used entries down to this size")
+    ap.add_argument("--clear", action="store_true")
+    args = ap.parse_args(argv)
+
+    c = ResultCache(args.cache)
+    if args.clear:
+        c.clear()
+    if args.max_entries is not None:
+        c.evict(args.max_entries)
+    print(json.dumps({**c.stats(), "fingerprint": simulator_fingerprint()}))
+    c.close()
+
+if __name__ == "__main__":
+    main()
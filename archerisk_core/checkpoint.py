@@ -0,0 +1,136 @@
+from __future__ import annotations
+import json
+import os
+import time
+from dataclasses import replace
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+
+from .codec import encode_results, iter_result_rows
+from .dataset_generate import IndexedRange
+from .episode_schema import Episode, EpisodeResult
+from .instrument import get_profiler
+from .utils import batched
+
+def _fsync_dir(path: str) -> None:
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _write_atomic(path: str, obj: Dict[str, Any]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path)
+
+class ResultCheckpoint:
+    """Append-only EpisodeResult JSONL writer that commits in durable chunks.
+
+    Every `commit_every` rows the file is fsynced and `<out>.progress.json` records the
+    committed byte length and row count. With `resume`, the file is truncated back to the
+    last commit and the episode ids already in it are skipped by `pending`; since the runner
+    emits results in input order, the finished file is identical to an uninterrupted run.
+    """
+
+    def __init__(self, out: str, source: str, resume: bool = False, commit_every: int = 10000) -> None:
+        self.out = out
+        self.manifest_path = out + ".progress.json"
+        self.source = source
+        self.commit_every = commit_every
+        self.done: Set[str] = set()
+        self.n = 0
+        committed = 0
+
+        manifest = self._load_manifest() if resume else None
+        if manifest is not None:
+            if manifest["source"] != source:
+                raise ValueError(f"{self.manifest_path} belongs to a run over {manifest['source']}, not {source}")
+            committed = manifest["bytes"]
+            with open(out, "r+b") as f:
+                f.truncate(committed)
+            self.done = {r["episode_id"] for r in iter_result_rows(out)}
+            self.n = len(self.done)
+            if self.n != manifest["n_done"]:
+                raise ValueError(f"{out} holds {self.n} committed rows, manifest says {manifest['n_done']}")
+
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        self._f = open(out, "ab" if manifest is not None else "wb")
+        self._uncommitted = 0
+        self._commit(complete=False)
+        self.resumed = self.n
+
+    def _load_manifest(self) -> Optional[Dict[str, Any]]:
+        if not (os.path.exists(self.manifest_path) and os.path.exists(self.out)):
+            return None
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _commit(self, complete: bool) -> None:
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        _write_atomic(self.manifest_path, {
+            "source": self.source,
+            "n_done": self.n,
+            "bytes": self._f.tell(),
+            "complete": complete,
+            "updated": time.time(),
+        })
+        self._uncommitted = 0
+
+    def pending(self, eps: Iterable[Episode]) -> Iterable[Episode]:
+        if isinstance(eps, IndexedRange):
+            # committed rows are a prefix of the range, so it stays a range workers can generate
+            return replace(eps, start=min(eps.stop, eps.start + self.n))
+        return (ep for ep in eps if ep.episode_id not in self.done)
+
+    def write(self, row: Dict[str, Any]) -> None:
+        prof = get_profiler()
+        t = prof.clock()
+        line = (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+        t = prof.lap("io.encode", t)
+        self._f.write(line)
+        t = prof.lap("io.write", t)
+        self.n += 1
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self._commit(complete=False)
+            prof.lap("io.commit", t)
+
+    def write_many(self, rows: Iterable[Dict[str, Any]]) -> int:
+        for r in rows:
+            self.write(r)
+        return self.n
+
+    def write_results(self, results: Iterable[EpisodeResult], batch: int = 256) -> int:
+        """Like `write_many`, for EpisodeResult objects encoded a batch at a time by `codec`."""
+        prof = get_profiler()
+        for chunk in batched(results, batch):
+            t = prof.clock()
+            lines = encode_results(chunk)
+            t = prof.lap("io.encode", t)
+            i = 0
+            while i < len(lines):
+                # commit at the same row counts as row-by-row writes
+                take = min(len(lines) - i, self.commit_every - self._uncommitted)
+                self._f.write("".join(lines[i:i + take]).encode("utf-8"))
+                t = prof.lap("io.write", t)
+                i += take
+                self.n += take
+                self._uncommitted += take
+                if self._uncommitted >= self.commit_every:
+                    self._commit(complete=False)
+                    t = prof.lap("io.commit", t)
+        return self.n
+
+    def close(self) -> None:
+        self._commit(complete=True)
+        self._f.close()
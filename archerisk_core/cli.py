@@ -0,0 +1,45 @@
+from __future__ import annotations
+import importlib
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# `arche-risk <command> [args]`: each command is a module's main(argv), imported only when
+# that command runs, so e.g. `gen` never loads numpy or matplotlib.
+COMMANDS: Dict[str, Tuple[str, str]] = {
+    "gen": ("dataset_generate", "Generate an Episode dataset"),
+    "run": ("runner", "Simulate episodes into EpisodeResult rows"),
+    "aggregate": ("aggregate", "Summary JSON (Wilson CIs) and LaTeX tables"),
+    "plot": ("plotting", "LNCS figures from a summary or results"),
+    "pipeline": ("pipeline", "Generate, run, aggregate and plot in one process"),
+    "build": ("build", "Incremental pipeline: rerun only steps whose inputs changed"),
+    "merge": ("shard", "Verify and merge the outputs of --shard runs"),
+    "episodes": ("episode_store", "Convert Episode datasets between JSONL and the dictionary format"),
+    "convert": ("columnar", "Convert results between JSONL and columnar"),
+    "trace": ("trace_store", "Print a trace from a sharded trace store"),
+    "cache": ("cache", "Inspect or trim the result cache"),
+    "batch": ("batch", "Vectorized simulation of a dataset"),
+    "expected": ("expected", "Exact per-cell rates"),
+    "sweep": ("sweep", "Evaluate a grid of simulator parameter overrides"),
+    "adaptive": ("adaptive", "Sample cells until their CIs are narrow enough"),
+    "stats": ("batch_stats", "Bootstrap CIs and baseline comparison tests"),
+    "bench": ("bench", "Time the pipeline's hot paths"),
+}
+
+def usage() -> str:
+    lines = ["usage: arche-risk <command> [args]   (arche-risk <command> -h for its options)", "", "commands:"]
+    lines += [f"  {name:<10} {help}" for name, (_, help) in COMMANDS.items()]
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    cmd = COMMANDS.get(argv[0])
+    if cmd is None:
+        print(usage(), file=sys.stderr)
+        sys.exit(f"arche-risk: unknown command {argv[0]!r}")
+    importlib.import_module(f"archerisk_core.{cmd[0]}").main(argv[1:])
+
+if __name__ == "__main__":
+    main()
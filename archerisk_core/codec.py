@@ -0,0 +1,186 @@
+from __future__ import annotations
+import json
+import sys
+from itertools import islice, repeat
+from json.encoder import encode_basestring
+from operator import attrgetter, itemgetter
+from typing import (Any, Callable, Collection, Dict, Iterable, Iterator, List, Literal, Sequence, TextIO, Tuple, get_args,
+                    get_origin, get_type_hints)
+
+from .episode_schema import Episode, EpisodeResult, shared_paths
+
+# JSONL codec specialized to Episode and EpisodeResult. An encoded line is byte-identical to
+# json.dumps(obj.to_dict(), ensure_ascii=False) + "\n". The field order is fixed, and factor
+# values are pre-encoded from their Literal types. Repeated strings are escaped once by the
+# json module's own C escaper and then memoized.
+# Decoding parses a whole block of lines with a single json.loads. Literal factor fields are
+# checked per batch, against each field's set of distinct values, rather than value by value.
+
+FACTORS: Dict[str, Tuple[str, ...]] = {name: get_args(tp) for name, tp in get_type_hints(Episode).items()
+                                       if get_origin(tp) is Literal}
+EPISODE_FIELDS = tuple(Episode.__dataclass_fields__)
+RESULT_FIELDS = tuple(EpisodeResult.__dataclass_fields__)
+FLAGS = ("task_success", "attack_success", "leak", "unauthorized_write")
+
+class SchemaError(ValueError):
+    pass
+
+class _Memo(dict):
+    """str -> encoded JSON fragment, cleared when it grows past `limit`."""
+
+    def __init__(self, encode: Callable[[Any], str], limit: int = 1 << 16) -> None:
+        super().__init__()
+        self.encode = encode
+        self.limit = limit
+
+    def __missing__(self, key: Any) -> str:
+        if len(self) >= self.limit:
+            self.clear()
+        v = self[key] = self.encode(key)
+        return v
+
+_TF, _TOPO, _MODE, _BASE, _ARCH = ({v: encode_basestring(v) for v in FACTORS[f]} for f in (
+    "task_family", "topology_family", "topology_mode", "defense_baseline", "attack_archetype"))
+_BOOL = {True: "true", False: "false"}
+_strs = _Memo(encode_basestring)
+_paths = _Memo(lambda paths: "[" + ", ".join(map(encode_basestring, paths)) + "]", limit=1024)
+
+# JSON types of the Episode fields (protected_paths: a list, or the tuple it is stored as)
+EPISODE_TYPES: Dict[str, Tuple[type, ...]] = {name: (int,) if name == "seed" else (str,) for name in EPISODE_FIELDS}
+EPISODE_TYPES["protected_paths"] = (list, tuple)
+
+def _check_paths(values: Iterable[Any]) -> None:
+    try:
+        distinct = set(map(tuple, values))
+    except TypeError:
+        distinct = {(None,)}  # unhashable elements
+    for paths in distinct:
+        if not all(type(p) is str for p in paths):
+            raise SchemaError(f"protected_paths: expected a list of strings, got {list(paths)!r}")
+
+def check_values(name: str, values: Collection[Any]) -> None:
+    """Check values of one Episode field (distinct ones suffice, except for seed): type and Literal level."""
+    ok = EPISODE_TYPES[name]
+    bad_types = set(map(type, values)).difference(ok)
+    if bad_types:
+        raise SchemaError(f"{name}: expected {'/'.join(t.__name__ for t in ok)}, "
+                          f"got {sorted(t.__name__ for t in bad_types)}")
+    if name == "protected_paths":
+        _check_paths(values)
+    elif name in FACTORS:
+        bad = set(values).difference(FACTORS[name])
+        if bad:
+            raise SchemaError(f"{name}: invalid value(s) {sorted(map(repr, bad))}, "
+                              f"expected one of {list(FACTORS[name])}")
+
+def check_episode_rows(rows: Sequence[Dict[str, Any]]) -> None:
+    """Check decoded Episode dicts: exactly Episode's fields, each of its type (seed an int, not a bool)."""
+    # one (field names, value types) signature per row, built at C speed; a batch has one or two
+    for keys, types in set(zip(map(tuple, rows), map(tuple, map(map, repeat(type), map(dict.values, rows))))):
+        if set(keys) != set(EPISODE_FIELDS) or len(keys) != len(EPISODE_FIELDS):
+            raise SchemaError(f"Episode rows must have exactly the fields {list(EPISODE_FIELDS)}, got {list(keys)}")
+        for name, tp in zip(keys, types):
+            if tp not in EPISODE_TYPES[name]:
+                raise SchemaError(f"{name}: expected {'/'.join(t.__name__ for t in EPISODE_TYPES[name])}, "
+                                  f"got {tp.__name__}")
+    _check_paths(map(itemgetter("protected_paths"), rows))
+
+def validate_batch(items: Sequence[Any], rows: bool = False, flags: bool = False) -> None:
+    """Check the Literal factor fields (and with `flags` the EpisodeResult booleans) of a batch.
+
+    `items` are objects, or dicts with `rows`. Raises SchemaError naming the field and bad values.
+    """
+    getter = itemgetter if rows else attrgetter
+    for name, allowed in FACTORS.items():
+        bad = set(map(getter(name), items)).difference(allowed)
+        if bad:
+            raise SchemaError(f"{name}: invalid value(s) {sorted(map(repr, bad))}, expected one of {list(allowed)}")
+    if flags:
+        for name in FLAGS:
+            types = set(map(type, map(getter(name), items)))
+            if types - {bool}:
+                raise SchemaError(f"{name}: expected bool, got {sorted(t.__name__ for t in types - {bool})}")
+
+def encode_episode(e: Episode) -> str:
+    s = _strs
+    return (f'{{"episode_id": {encode_basestring(e.episode_id)}, "seed": {e.seed}, '
+            f'"task_family": {_TF[e.task_family]}, "task_id": {s[e.task_id]}, '
+            f'"topology_family": {_TOPO[e.topology_family]}, "topology_mode": {_MODE[e.topology_mode]}, '
+            f'"defense_baseline": {_BASE[e.defense_baseline]}, "attack_archetype": {_ARCH[e.attack_archetype]}, '
+            f'"prompt": {s[e.prompt]}, "ground_truth": {s[e.ground_truth]}, "secret": {s[e.secret]}, '
+            f'"protected_paths": {_paths[tuple(e.protected_paths)]}, '
+            f'"attacker_injection": {s[e.attacker_injection]}}}\n')
+
+def encode_result(r: EpisodeResult) -> str:
+    b = _BOOL
+    return (f'{{"episode_id": {encode_basestring(r.episode_id)}, "seed": {r.seed}, '
+            f'"task_family": {_TF[r.task_family]}, "task_id": {_strs[r.task_id]}, '
+            f'"topology_family": {_TOPO[r.topology_family]}, "topology_mode": {_MODE[r.topology_mode]}, '
+            f'"defense_baseline": {_BASE[r.defense_baseline]}, "attack_archetype": {_ARCH[r.attack_archetype]}, '
+            f'"task_success": {b[r.task_success]}, "attack_success": {b[r.attack_success]}, '
+            f'"leak": {b[r.leak]}, "unauthorized_write": {b[r.unauthorized_write]}, '
+            f'"trace_path": {encode_basestring(r.trace_path)}}}\n')
+
+def encode_episodes(eps: Sequence[Episode]) -> str:
+    validate_batch(eps)
+    return "".join(map(encode_episode, eps))
+
+def encode_results(results: Sequence[EpisodeResult]) -> List[str]:
+    """One line per result (kept separate so callers can commit at exact row counts)."""
+    validate_batch(results, flags=True)
+    return list(map(encode_result, results))
+
+def _loads_block(lines: List[str]) -> List[Any]:
+    try:
+        rows = json.loads("[" + ",".join(lines) + "]")
+        if len(rows) == len(lines):
+            return rows
+    except json.JSONDecodeError:
+        pass
+    # parse line by line so the error names the offending line
+    return [json.loads(line) for line in lines]
+
+def _blocks(f: TextIO, block: int) -> Iterator[List[str]]:
+    while True:
+        chunk = list(islice(f, block))
+        if not chunk:
+            return
+        lines = [line for line in chunk if not line.isspace()]
+        if lines:
+            yield lines
+
+def decode_result_rows(lines: List[str]) -> List[Dict[str, Any]]:
+    rows = _loads_block(lines)
+    validate_batch(rows, rows=True)
+    return rows
+
+_SHARED_FIELDS = tuple(f for f in EPISODE_FIELDS if f not in ("episode_id", "seed", "protected_paths"))
+
+def decode_episodes(lines: List[str]) -> List[Episode]:
+    rows = _loads_block(lines)
+    if not all(map(isinstance, rows, repeat(dict))):
+        raise SchemaError("Episode rows must be JSON objects")
+    check_episode_rows(rows)
+    validate_batch(rows, rows=True)
+    # the batch is validated, so fill the slots directly (as Episode.from_dict would, minus __init__)
+    new, setattr_, intern = Episode.__new__, object.__setattr__, sys.intern
+    out = []
+    for r in rows:
+        ep = new(Episode)
+        setattr_(ep, "episode_id", r["episode_id"])
+        setattr_(ep, "seed", r["seed"])
+        for name in _SHARED_FIELDS:
+            setattr_(ep, name, intern(r[name]))
+        setattr_(ep, "protected_paths", shared_paths(r["protected_paths"]))
+        out.append(ep)
+    return out
+
+def iter_episode_lines(f: TextIO, block: int = 4096) -> Iterator[Episode]:
+    for lines in _blocks(f, block):
+        yield from decode_episodes(lines)
+
+def iter_result_rows(path: str, block: int = 4096) -> Iterator[Dict[str, Any]]:
+    """EpisodeResult dicts from a JSONL file, decoded and validated a block at a time."""
+    with open(path, "r", encoding="utf-8") as f:
+        for lines in _blocks(f, block):
+            yield from decode_result_rows(lines)
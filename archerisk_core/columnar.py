@@ -0,0 +1,202 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from .archetypes import ARCHETYPES
+from .dataset_generate import TASK_FAMILIES, TOPOLOGY_FAMILIES, TOPOLOGY_MODES, BASELINES
+from .codec import iter_result_rows
+from .utils import write_jsonl
+
+# Columnar EpisodeResult format: a directory holding one raw little-endian file per column
+# plus meta.json. Categorical columns are integer codes into per-column dictionaries,
+# outcome flags are bit-packed, and free strings are a UTF-8 blob with an offsets file.
+# Every file is fixed-width and header-less, so readers can np.memmap it directly.
+
+FORMAT = "archerisk-columnar-v1"
+
+CATEGORICAL: Dict[str, str] = {
+    "task_family": "<u1",
+    "topology_family": "<u1",
+    "topology_mode": "<u1",
+    "defense_baseline": "<u1",
+    "attack_archetype": "<u1",
+    "task_id": "<u4",
+}
+# Canonical level order, so codes are stable across runs and shards
+LEVELS: Dict[str, List[str]] = {
+    "task_family": TASK_FAMILIES,
+    "topology_family": TOPOLOGY_FAMILIES,
+    "topology_mode": TOPOLOGY_MODES,
+    "defense_baseline": BASELINES,
+    "attack_archetype": ARCHETYPES,
+    "task_id": [],
+}
+FLAGS = ["task_success", "attack_success", "leak", "unauthorized_write"]
+STRINGS = ["episode_id", "trace_path"]
+# EpisodeResult.to_dict field order
+FIELDS = ["episode_id", "seed", "task_family", "task_id", "topology_family", "topology_mode",
+          "defense_baseline", "attack_archetype", "task_success", "attack_success", "leak",
+          "unauthorized_write", "trace_path"]
+
+def is_columnar(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, "meta.json"))
+
+class ColumnarWriter:
+    def __init__(self, path: str, buffer_rows: int = 65536) -> None:
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.n = 0
+        self.buffer_rows = max(8, buffer_rows - buffer_rows % 8)  # keep bit-packed flushes byte aligned
+        self.dicts: Dict[str, Dict[str, int]] = {c: {v: i for i, v in enumerate(LEVELS[c])} for c in CATEGORICAL}
+        self._buf: Dict[str, List[Any]] = {c: [] for c in FIELDS}
+        self._files = {c: open(os.path.join(path, f"{c}.bin"), "wb") for c in FIELDS}
+        self._offsets = {c: open(os.path.join(path, f"{c}.off"), "wb") for c in STRINGS}
+        self._str_pos = {c: 0 for c in STRINGS}
+        for c in STRINGS:
+            self._offsets[c].write(np.zeros(1, dtype="<i8").tobytes())
+
+    def _code(self, col: str, v: str) -> int:
+        d = self.dicts[col]
+        i = d.get(v)
+        if i is None:
+            i = d[v] = len(d)
+            if i > np.iinfo(CATEGORICAL[col]).max:
+                raise ValueError(f"Too many distinct values for {col}")
+        return i
+
+    def write(self, row: Dict[str, Any]) -> None:
+        for c in FIELDS:
+            v = row[c]
+            self._buf[c].append(self._code(c, v) if c in CATEGORICAL else v)
+        self.n += 1
+        if len(self._buf["seed"]) >= self.buffer_rows:
+            self._flush()
+
+    def write_many(self, rows: Iterable[Dict[str, Any]]) -> int:
+        for r in rows:
+            self.write(r)
+        return self.n
+
+    def _flush(self) -> None:
+        for c, vals in self._buf.items():
+            if not vals:
+                continue
+            f = self._files[c]
+            if c in CATEGORICAL:
+                f.write(np.asarray(vals, dtype=CATEGORICAL[c]).tobytes())
+            elif c == "seed":
+                f.write(np.asarray(vals, dtype="<i8").tobytes())
+            elif c in FLAGS:
+                f.write(np.packbits(np.asarray(vals, dtype=bool), bitorder="little").tobytes())
+            else:
+                blobs = [s.encode("utf-8") for s in vals]
+                ends = self._str_pos[c] + np.cumsum([len(b) for b in blobs], dtype=np.int64)
+                f.write(b"".join(blobs))
+                self._offsets[c].write(ends.astype("<i8").tobytes())
+                self._str_pos[c] = int(ends[-1])
+            vals.clear()
+
+    def close(self) -> None:
+        self._flush()
+        for f in list(self._files.values()) + list(self._offsets.values()):
+            f.close()
+        meta = {
+            "format": FORMAT,
+            "n": self.n,
+            "fields": FIELDS,
+            "dtypes": {**CATEGORICAL, "seed": "<i8"},
+            "flags": FLAGS,
+            "strings": STRINGS,
+            "dictionaries": {c: list(d) for c, d in self.dicts.items()},
+        }
+        with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+def write_columnar(path: str, rows: Iterable[Dict[str, Any]]) -> int:
+    with ColumnarWriter(path) as w:
+        return w.write_many(rows)
+
+def read_meta(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT:
+        raise ValueError(f"Not a {FORMAT} directory: {path}")
+    return meta
+
+def load_columns(path: str, mmap: bool = True, strings: bool = False) -> Dict[str, Any]:
+    """Load a columnar results directory as NumPy arrays.
+
+    Categorical columns come back as integer codes (memory-mapped when `mmap`), with their
+    level lists under `"dictionaries"`; flags are unpacked to bool arrays. String columns are
+    decoded to Python lists only when `strings` is set.
+    """
+    meta = read_meta(path)
+    n = meta["n"]
+    cols: Dict[str, Any] = {"n": n, "dictionaries": meta["dictionaries"]}
+    for c, dt in meta["dtypes"].items():
+        fp = os.path.join(path, f"{c}.bin")
+        if n == 0:
+            cols[c] = np.zeros(0, dtype=dt)
+        elif mmap:
+            cols[c] = np.memmap(fp, dtype=dt, mode="r", shape=(n,))
+        else:
+            cols[c] = np.fromfile(fp, dtype=dt, count=n)
+    for c in meta["flags"]:
+        packed = np.fromfile(os.path.join(path, f"{c}.bin"), dtype=np.uint8)
+        cols[c] = np.unpackbits(packed, count=n, bitorder="little").astype(bool)
+    if strings:
+        for c in meta["strings"]:
+            with open(os.path.join(path, f"{c}.bin"), "rb") as f:
+                blob = f.read()
+            off = np.fromfile(os.path.join(path, f"{c}.off"), dtype="<i8")
+            cols[c] = [blob[off[i]:off[i + 1]].decode("utf-8") for i in range(n)]
+    return cols
+
+def iter_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield EpisodeResult dicts (to_dict field order) from a columnar directory."""
+    cols = load_columns(path, strings=True)
+    dicts = cols["dictionaries"]
+    for i in range(cols["n"]):
+        row: Dict[str, Any] = {}
+        for c in FIELDS:
+            if c in CATEGORICAL:
+                row[c] = dicts[c][int(cols[c][i])]
+            elif c == "seed":
+                row[c] = int(cols[c][i])
+            elif c in FLAGS:
+                row[c] = bool(cols[c][i])
+            else:
+                row[c] = cols[c][i]
+        yield row
+
+def iter_results(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield EpisodeResult dicts from either a JSONL file or a columnar directory."""
+    return iter_rows(path) if is_columnar(path) else iter_result_rows(path)
+
+def write_results(path: str, rows: Iterable[Dict[str, Any]], fmt: str = "jsonl") -> int:
+    if fmt == "columnar":
+        return write_columnar(path, rows)
+    return write_jsonl(path, rows)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Convert EpisodeResult files between JSONL and columnar formats")
+    ap.add_argument("--in", dest="inp", required=True, help="Input JSONL file or columnar directory")
+    ap.add_argument("--out", required=True, help="Output path")
+    ap.add_argument("--to", choices=["jsonl", "columnar"], required=True)
+    args = ap.parse_args(argv)
+
+    n = write_results(args.out, iter_results(args.inp), args.to)
+    print(f"[OK] wrote {n} results to {args.out} ({args.to})")
+
+if __name__ == "__main__":
+    main()
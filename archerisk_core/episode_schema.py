@@ -1,6 +1,7 @@
 from __future__ import annotations
+import sys
 from dataclasses import dataclass
-from typing import Literal, List, Dict, Any
+from typing import Literal, Dict, Any, Sequence, Tuple
 
 TaskFamily = Literal["arithmetic_check", "policy_triage", "file_triage"]
 TopologyFamily = Literal["chain", "star", "fully_connected", "reviewer_hub"]
@@ -8,7 +9,14 @@ DefenseBaseline = Literal["B1", "B2", "B3"]
 TopologyMode = Literal["INSECURE", "DEFENDED"]
 Archetype = Literal["MANIPULATOR", "COVERT_ACTOR", "DECEIVER", "INFILTRATOR_ESCALATOR", "MIXED"]
 
-@dataclass(frozen=True)
+# Shared protected-path tuples, so episodes loaded from a dataset reference one copy each
+_PATHS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+def shared_paths(paths: Sequence[str]) -> Tuple[str, ...]:
+    key = tuple(paths)
+    return _PATHS.setdefault(key, tuple(sys.intern(p) for p in key))
+
+@dataclass(frozen=True, slots=True)
 class Episode:
     # Identification / reproducibility
     episode_id: str
@@ -26,9 +34,37 @@ class Episode:
     prompt: str
     ground_truth: str
     secret: str
-    protected_paths: List[str]
+    protected_paths: Sequence[str]
     attacker_injection: str
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "episode_id": self.episode_id,
+            "seed": self.seed,
+            "task_family": self.task_family,
+            "task_id": self.task_id,
+            "topology_family": self.topology_family,
+            "topology_mode": self.topology_mode,
+            "defense_baseline": self.defense_baseline,
+            "attack_archetype": self.attack_archetype,
+            "prompt": self.prompt,
+            "ground_truth": self.ground_truth,
+            "secret": self.secret,
+            "protected_paths": list(self.protected_paths),
+            "attacker_injection": self.attacker_injection,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Episode":
+        """Build an episode whose repeated strings and path tuple are shared with other episodes."""
+        intern = sys.intern
+        return cls(
+            d["episode_id"], d["seed"], intern(d["task_family"]), intern(d["task_id"]),
+            intern(d["topology_family"]), intern(d["topology_mode"]), intern(d["defense_baseline"]),
+            intern(d["attack_archetype"]), intern(d["prompt"]), intern(d["ground_truth"]), intern(d["secret"]),
+            shared_paths(d["protected_paths"]), intern(d["attacker_injection"]),
+        )
+
 @dataclass(frozen=True)
 class EpisodeResult:
     """
@@ -0,0 +1,136 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, TextIO, Optional
+
+from .codec import EPISODE_FIELDS, SchemaError, check_values, encode_episodes, iter_episode_lines
+from .episode_schema import Episode, shared_paths
+from .utils import batched
+
+# Dictionary-encoded Episode dataset: a line-oriented JSON file in which every repeated value
+# (factor levels, prompts, ground truths, the secret, injections, protected-path lists) is
+# stored once and rows reference it by index:
+#   {"format": "archerisk-episodes-dict-v1", "fields": [...]}     header
+#   {"v": "Compute 11+22. Return only the number."}              next dictionary entry
+#   ["ep_000000", 7, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]           row: episode_id, seed, then indices
+# Entries are appended the first time a value is written, so the file streams in one pass and
+# readers rebuild the same table while reading. Plain Episode JSONL is still read everywhere.
+
+FORMAT = "archerisk-episodes-dict-v1"
+FIELDS = list(EPISODE_FIELDS)  # episode_id, seed, then the dictionary-encoded fields
+DICT_FIELDS = FIELDS[2:]
+FORMATS = ["jsonl", "dict"]
+
+class EpisodeDictWriter:
+    def __init__(self, f: TextIO) -> None:
+        self.f = f
+        self.index: Dict[Any, int] = {}
+        self.n = 0
+        f.write(json.dumps({"format": FORMAT, "fields": FIELDS}) + "\n")
+
+    def _ref(self, v: Any) -> int:
+        key = tuple(v) if isinstance(v, (list, tuple)) else v
+        i = self.index.get(key)
+        if i is None:
+            i = self.index[key] = len(self.index)
+            self.f.write(json.dumps({"v": list(v) if isinstance(v, tuple) else v}, ensure_ascii=False) + "\n")
+        return i
+
+    def write(self, ep: Episode) -> None:
+        row: List[Any] = [ep.episode_id, ep.seed]
+        row.extend(self._ref(getattr(ep, f)) for f in DICT_FIELDS)
+        self.f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.n += 1
+
+def _iter_dict_file(f: TextIO, block: int = 4096) -> Iterator[Episode]:
+    header = json.loads(f.readline())
+    if header.get("format") != FORMAT:
+        raise SchemaError(f"Unsupported episode dictionary header: {header}")
+    if header.get("fields") != FIELDS:
+        raise SchemaError(f"Episode dictionary fields {header.get('fields')} do not match Episode's {FIELDS}")
+    table: List[Any] = []
+    new = Episode.__new__
+    setattr_ = object.__setattr__
+    lineno = 1
+    while True:
+        lines = list(islice(f, block))
+        if not lines:
+            return
+        # a row only references entries defined above it, so a block's entries can all be added
+        # first; its rows are then decoded with one json.loads call instead of one per line
+        rows = []
+        for line in lines:
+            lineno += 1
+            c = line.lstrip()[:1]
+            if c == "[":
+                rows.append(line)
+            elif c == "{":
+                v = json.loads(line)["v"]
+                if isinstance(v, list):
+                    check_values("protected_paths", [v])
+                    v = shared_paths(v)
+                table.append(v)
+            elif c:
+                raise SchemaError(f"line {lineno}: expected a dictionary entry or a row, got {line[:40]!r}")
+        rows = json.loads("[" + ",".join(rows) + "]")
+        if set(map(len, rows)).difference((len(FIELDS),)):
+            raise SchemaError(f"episode rows must have {len(FIELDS)} values ({FIELDS})")
+        check_values("episode_id", set(map(itemgetter(0), rows)))
+        check_values("seed", list(map(itemgetter(1), rows)))
+        # every dictionary entry a field uses is checked once, not once per row
+        for j, name in enumerate(DICT_FIELDS, 2):
+            refs = set(map(itemgetter(j), rows))
+            if not all(type(i) is int and 0 <= i < len(table) for i in refs):
+                raise SchemaError(f"{name}: rows reference undefined dictionary entries")
+            check_values(name, [table[i] for i in refs])
+        for r in rows:
+            # values are already built, checked and shared; set the slots directly instead of via __init__
+            ep = new(Episode)
+            setattr_(ep, "episode_id", r[0])
+            setattr_(ep, "seed", r[1])
+            for name, i in zip(DICT_FIELDS, r[2:]):
+                setattr_(ep, name, table[i])
+            yield ep
+
+def iter_episodes(path: str) -> Iterator[Episode]:
+    """Episodes from a dictionary-encoded dataset or an Episode JSONL file (detected from the header)."""
+    with open(path, "r", encoding="utf-8") as f:
+        if f.readline().startswith('{"format": "' + FORMAT):
+            f.seek(0)
+            yield from _iter_dict_file(f)
+            return
+        f.seek(0)
+        yield from iter_episode_lines(f)
+
+def read_episodes(path: str) -> List[Episode]:
+    return list(iter_episodes(path))
+
+def write_episodes(path: str, eps: Iterable[Episode], fmt: str = "jsonl") -> int:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        if fmt == "dict":
+            w = EpisodeDictWriter(f)
+            for ep in eps:
+                w.write(ep)
+            return w.n
+        n = 0
+        for chunk in batched(eps, 4096):
+            f.write(encode_episodes(chunk))
+            n += len(chunk)
+        return n
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Convert Episode datasets between JSONL and the dictionary-encoded format")
+    ap.add_argument("--in", dest="inp", required=True, help="Input Episode JSONL or dictionary-encoded dataset")
+    ap.add_argument("--out", required=True, help="Output path")
+    ap.add_argument("--to", choices=FORMATS, required=True)
+    args = ap.parse_args(argv)
+
+    n = write_episodes(args.out, iter_episodes(args.inp), args.to)
+    print(f"[OK] wrote {n} episodes to {args.out} ({args.to})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+from __future__ import annotations
+import argparse
+import ast
+import functools
+import json
+import math
+import os
+from fractions import Fraction
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .aggregate import ARCHETYPES, BASELINES, GROUP_FIELDS, TOPOLOGIES
+from .agents import solve_task
+from .batch import FACTORS, CellTables, cell_tables
+from .dataset_generate import _make_task
+from .params import DEFAULT_PARAMS, SimParams
+
+METRICS = ("ASR", "LeakRate", "UWR", "TaskSuccess")
+
+class _Coin:
+    """Result of _Branch.random(): supports only `< 0.5`, whose outcome the branch fixes."""
+
+    def __init__(self, below: bool) -> None:
+        self.below = below
+
+    def __lt__(self, other: Any) -> bool:
+        if other != 0.5:
+            raise TypeError(f"task generators may only test rng.random() < 0.5, got < {other!r}")
+        return self.below
+
+    def __eq__(self, other: Any) -> bool:
+        raise TypeError("task generators may only test rng.random() < 0.5")
+
+    __bool__ = __float__ = __eq__  # type: ignore[assignment]
+    __hash__ = None  # type: ignore[assignment]
+
+class _Branch:
+    """Stand-in for random.Random that replays one path through a task generator's draws.
+
+    `path[i]` picks the outcome of draw i (0 past its end): randint(a, b) returns a + path[i],
+    random() is below 0.5 for path[i] == 0. `sizes` records how many outcomes each draw had.
+    Any other use of the generator raises, so a changed draw structure cannot go unnoticed.
+    """
+
+    def __init__(self, path: List[int]) -> None:
+        self.path = path
+        self.sizes: List[int] = []
+
+    def _pick(self, n: int) -> int:
+        i = len(self.sizes)
+        self.sizes.append(n)
+        return self.path[i] if i < len(self.path) else 0
+
+    def randint(self, a: int, b: int) -> int:
+        return a + self._pick(b - a + 1)
+
+    def random(self) -> _Coin:
+        return _Coin(self._pick(2) == 0)
+
+    def __getattr__(self, name: str) -> Any:
+        raise TypeError(f"task generators may only draw rng.randint() and rng.random() < 0.5, not rng.{name}")
+
+@functools.lru_cache(maxsize=None)
+def task_solve_rate(task_family: str, max_paths: int = 1 << 16) -> float:
+    # Enumerates every outcome of the generator's draws (see tasks/__init__.py), each weighted
+    # by its probability, and checks the benign worker answer exactly as simulate_episode does.
+    solved = Fraction(0)
+    path: List[int] = []
+    for _ in range(max_paths):
+        rng = _Branch(path)
+        _, prompt, gt = _make_task(rng, task_family)
+        out = solve_task(prompt).strip()
+        if task_family == "arithmetic_check":
+            ok = out == gt.strip()
+        else:
+            ok = out.upper().startswith(gt.strip().upper())
+        if ok:
+            solved += Fraction(1, math.prod(rng.sizes))
+        # next path in odometer order; later draws may depend on earlier outcomes
+        path = [rng.path[i] if i < len(rng.path) else 0 for i in range(len(rng.sizes))]
+        i = len(path) - 1
+        while i >= 0 and path[i] + 1 == rng.sizes[i]:
+            i -= 1
+        if i < 0:
+            return float(solved)
+        path = path[:i] + [path[i] + 1]
+    raise ValueError(f"{task_family}: more than {max_paths} draw outcomes to enumerate")
+
+def outcome_rates(p_attack: Any, p_leak: Any, p_bypass: Any, forced_leak: Any, p_uwr: Any, forced_uwr: Any,
+                  p_degrade: Any, arith: Any, solve_rate: Any) -> Tuple[Any, Any, Any, Any]:
+    """ASR, LeakRate, UWR and TaskSuccess from cell probabilities (scalars or NumPy arrays)."""
+    leak = p_attack * np.where(forced_leak, 1.0, 1.0 - (1.0 - p_leak) * (1.0 - p_bypass))
+    uwr = p_attack * np.where(forced_uwr, 1.0, p_uwr)
+    # an attacked arithmetic answer never matches; triage answers survive unless degraded
+    survive = np.where(arith, 0.0, 1.0 - p_degrade)
+    ts = solve_rate * ((1.0 - p_attack) + p_attack * survive)
+    return p_attack, leak, uwr, ts
+
+def cell_rates(tab: CellTables, key: Tuple[str, ...], solve_rate: float = 1.0) -> Dict[str, float]:
+    """Exact outcome probabilities of one (GROUP_FIELDS-ordered) factor cell."""
+    f = dict(zip(GROUP_FIELDS, key))
+    idx = tuple(FACTORS[n].index(f[n]) for n in ("defense_baseline", "topology_mode", "topology_family", "attack_archetype"))
+    rates = outcome_rates(tab.p_attack[idx], tab.p_leak[idx], tab.p_bypass[idx], tab.forced_leak[idx],
+                          tab.p_uwr[idx], tab.forced_uwr[idx], tab.p_degrade[idx],
+                          f["task_family"] == "arithmetic_check", solve_rate)
+    return {m: float(r) for m, r in zip(METRICS, rates)}
+
+def all_cells() -> List[Tuple[str, ...]]:
+    keys: List[Tuple[str, ...]] = [()]
+    for f in GROUP_FIELDS:
+        keys = [k + (v,) for k in keys for v in FACTORS[f]]
+    return keys
+
+def expected_summary(weights: Optional[Dict[Tuple[str, ...], float]] = None,
+                     params: SimParams = DEFAULT_PARAMS) -> Dict[str, Any]:
+    """Exact rates in `aggregate`'s summary shape (each rate is `{"p": ...}`).
+
+    Table entries average the cells they cover, weighted by `weights` (e.g. observed
+    episode counts per cell); without weights every cell counts equally, as in the
+    balanced factorial core.
+    """
+    tab = cell_tables(params)
+    solve = {t: task_solve_rate(t) for t in FACTORS["task_family"]}
+    cells = {k: cell_rates(tab, k, solve[k[GROUP_FIELDS.index("task_family")]]) for k in all_cells()}
+    w = weights if weights is not None else {k: 1.0 for k in cells}
+
+    def mean(**match: str) -> Dict[str, Any]:
+        idx = [(GROUP_FIELDS.index(f), v) for f, v in match.items()]
+        sel = [(k, w.get(k, 0.0)) for k in cells if all(k[i] == v for i, v in idx)]
+        tot = sum(x for _, x in sel)
+        return {m: {"p": (sum(cells[k][m] * x for k, x in sel) / tot) if tot else 0.0} for m in METRICS}
+
+    return {
+        "grouped_metrics": {str(k): {m: {"p": v} for m, v in r.items()} for k, r in cells.items()},
+        "tables": {
+            "defended_by_archetype_baseline": {
+                a: {b: mean(topology_mode="DEFENDED", attack_archetype=a, defense_baseline=b) for b in BASELINES}
+                for a in ARCHETYPES
+            },
+            "defended_uwr_by_topology_baseline": {
+                t: {b: mean(topology_mode="DEFENDED", topology_family=t, defense_baseline=b) for b in BASELINES}
+                for t in TOPOLOGIES
+            },
+        },
+    }
+
+def _observed_weights(summary: Dict[str, Any]) -> Dict[Tuple[str, ...], float]:
+    out: Dict[Tuple[str, ...], float] = {}
+    for k, rates in summary["grouped_metrics"].items():
+        out[ast.literal_eval(k)] = float(rates["ASR"]["n"])
+    return out
+
+def flag_outliers(summary: Dict[str, Any], expected: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Observed rates whose Wilson CI does not contain the exact expected rate."""
+    flagged: List[Dict[str, Any]] = []
+
+    def check(where: str, obs: Dict[str, Any], exp: Dict[str, Any]) -> None:
+        for m in METRICS:
+            o, p = obs[m], exp[m]["p"]
+            if o["n"] and not (o["lo"] - 1e-12 <= p <= o["hi"] + 1e-12):
+                flagged.append({"where": where, "metric": m, "expected": p, "observed": o["p"],
+                                "lo": o["lo"], "hi": o["hi"], "n": o["n"]})
+
+    for k, obs in summary["grouped_metrics"].items():
+        check(f"grouped_metrics {k}", obs, expected["grouped_metrics"][k])
+    for name, table in summary["tables"].items():
+        for row, cols in table.items():
+            for col, obs in cols.items():
+                check(f"{name} {row}/{col}", obs, expected["tables"][name][row][col])
+    return flagged
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Exact per-cell expected rates of the simulator")
+    ap.add_argument("--out", required=True, help="Output expected-rates JSON")
+    ap.add_argument("--summary", default=None,
+                    help="Observed summary.json: weights the tables by its cell counts and flags rates outside their Wilson CI")
+    args = ap.parse_args(argv)
+
+    observed = None
+    if args.summary:
+        with open(args.summary, "r", encoding="utf-8") as f:
+            observed = json.load(f)
+    expected = expected_summary(_observed_weights(observed) if observed else None)
+
+    if observed:
+        flagged = flag_outliers(observed, expected)
+        n_checked = sum(len(METRICS) for rates in observed["grouped_metrics"].values() if rates["ASR"]["n"])
+        n_checked += sum(len(METRICS) for t in observed["tables"].values() for r in t.values() for _ in r)
+        expected["flagged"] = flagged
+        print(f"[OK] {len(flagged)} of {n_checked} observed rates fall outside their Wilson 95% CI")
+        for fl in flagged:
+            print(f"  {fl['where']} {fl['metric']}: expected {fl['expected']:.3f}, "
+                  f"observed {fl['observed']:.3f} [{fl['lo']:.3f}, {fl['hi']:.3f}] (n={fl['n']})")
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(expected, f, ensure_ascii=False, indent=2)
+    print(f"[OK] wrote expected rates to {args.out}")
+
+if __name__ == "__main__":
+    main()
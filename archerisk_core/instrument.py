@@ -0,0 +1,194 @@
+from __future__ import annotations
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+from array import array
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore[assignment]
+
+# Stage timers are written as lap chains so the disabled path is two trivial method calls:
+#   prof = get_profiler()
+#   t = prof.clock()
+#   ... planner ...
+#   t = prof.lap("simulate.planner", t)
+
+def _max_rss() -> int:
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+class NullProfiler:
+    """Stand-in used while profiling is off; every hook is a no-op."""
+    enabled = False
+
+    def clock(self) -> float:
+        return 0.0
+
+    def lap(self, name: str, t0: float) -> float:
+        return 0.0
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    @contextlib.contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        yield
+
+class Profiler:
+    """Named stage timers (every duration kept, for percentiles), counters and sections.
+
+    Sections are coarse pipeline steps; with tracemalloc running each one also records the
+    peak traced memory reached inside it. Snapshots from pool workers are folded in with `merge`.
+    """
+    enabled = True
+
+    def __init__(self) -> None:
+        self.timers: Dict[str, array] = {}
+        self.counters: Dict[str, int] = {}
+        self.peaks: Dict[str, int] = {}
+        self.t_start = time.perf_counter()
+
+    clock = staticmethod(time.perf_counter)
+
+    def lap(self, name: str, t0: float) -> float:
+        t = time.perf_counter()
+        d = self.timers.get(name)
+        if d is None:
+            d = self.timers[name] = array("d")
+        d.append(t - t0)
+        return t
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextlib.contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.lap(name, t0)
+            peak = tracemalloc.get_traced_memory()[1] if tracing else 0
+            self.peaks[name] = max(self.peaks.get(name, 0), peak)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"timers": {k: v.tobytes() for k, v in self.timers.items()}, "counters": dict(self.counters),
+                "peaks": dict(self.peaks)}
+
+    def merge(self, snap: Dict[str, Any]) -> None:
+        for k, raw in snap["timers"].items():
+            self.timers.setdefault(k, array("d")).frombytes(raw)
+        for k, n in snap["counters"].items():
+            self.count(k, n)
+        for k, p in snap["peaks"].items():
+            self.peaks[k] = max(self.peaks.get(k, 0), p)
+
+    def report(self) -> Dict[str, Any]:
+        wall = time.perf_counter() - self.t_start
+        stages: Dict[str, Any] = {}
+        for name, d in sorted(self.timers.items()):
+            xs = sorted(d)
+            total = sum(xs)
+            stages[name] = {
+                "count": len(xs),
+                "total_s": total,
+                "mean_us": total / len(xs) * 1e6,
+                "p99_us": xs[min(len(xs) - 1, int(0.99 * len(xs)))] * 1e6,
+                "share": total / wall if wall > 0 else 0.0,
+            }
+            if name in self.peaks:
+                stages[name]["peak_bytes"] = self.peaks[name]
+        out = {"wall_s": wall, "max_rss_bytes": _max_rss(), "stages": stages, "counters": dict(self.counters)}
+        if tracemalloc.is_tracing():
+            out["traced_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        return out
+
+    def format_report(self) -> str:
+        rep = self.report()
+        lines = [f"  {'stage':<28} {'count':>9} {'total s':>9} {'mean us':>10} {'p99 us':>10} {'share':>7} {'peak MB':>8}"]
+        for name, s in rep["stages"].items():
+            peak = f"{s['peak_bytes'] / 2**20:8.1f}" if s.get("peak_bytes") else f"{'':>8}"
+            lines.append(f"  {name:<28} {s['count']:>9} {s['total_s']:>9.3f} {s['mean_us']:>10.1f} "
+                         f"{s['p99_us']:>10.1f} {s['share']:>7.1%} {peak}")
+        for name, n in sorted(rep["counters"].items()):
+            lines.append(f"  {name:<28} {n:>9}")
+        mem = f"max RSS {rep['max_rss_bytes'] / 2**20:.1f} MB"
+        if "traced_peak_bytes" in rep:
+            mem += f", traced peak {rep['traced_peak_bytes'] / 2**20:.1f} MB"
+        lines.append(f"  wall {rep['wall_s']:.3f}s, {mem}")
+        return "\n".join(lines)
+
+NULL_PROFILER = NullProfiler()
+_active: Any = NULL_PROFILER
+_cprofile: Optional[cProfile.Profile] = None
+
+def get_profiler() -> Any:
+    return _active
+
+def enable(cprofile: bool = False, trace_memory: bool = False) -> Profiler:
+    """Start collecting stage timings in this process (optionally also cProfile / tracemalloc)."""
+    global _active, _cprofile
+    _active = Profiler()
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if cprofile:
+        _cprofile = cProfile.Profile()
+        _cprofile.enable()
+    return _active
+
+def disable() -> None:
+    global _active, _cprofile
+    if _cprofile is not None:
+        _cprofile.disable()
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _active = NULL_PROFILER
+
+def dump_cprofile(path: str, top: int = 25) -> str:
+    """Write the cProfile stats (loadable with pstats / snakeviz) and return the top entries by cumulative time."""
+    if _cprofile is None:
+        return ""
+    _cprofile.disable()
+    _cprofile.dump_stats(path)
+    buf = io.StringIO()
+    pstats.Stats(_cprofile, stream=buf).sort_stats("cumulative").print_stats(top)
+    return buf.getvalue()
+
+def add_profile_args(ap: Any) -> None:
+    ap.add_argument("--profile", action="store_true", help="Print a per-stage timing and memory breakdown")
+    ap.add_argument("--profile_out", default=None, help="Also write the breakdown as JSON")
+    ap.add_argument("--cprofile", default=None, help="Dump cProfile stats of the main process to this file")
+    ap.add_argument("--tracemalloc", action="store_true", help="Track Python allocations for per-step peak memory")
+
+def start_from_args(args: Any) -> Any:
+    if args.profile or args.profile_out or args.cprofile or args.tracemalloc:
+        return enable(cprofile=bool(args.cprofile), trace_memory=args.tracemalloc)
+    return NULL_PROFILER
+
+def finish_from_args(args: Any, prof: Any) -> None:
+    if not prof.enabled:
+        return
+    if args.cprofile:
+        top = dump_cprofile(args.cprofile)
+        print(f"[PROFILE] cProfile stats written to {args.cprofile}")
+        print(top)
+    print("[PROFILE]")
+    print(prof.format_report())
+    if args.profile_out:
+        with open(args.profile_out, "w", encoding="utf-8") as f:
+            json.dump(prof.report(), f, indent=2)
+        print(f"[PROFILE] wrote {args.profile_out}")
+    disable()
@@ -0,0 +1,165 @@
+from __future__ import annotations
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .checkpoint import ResultCheckpoint
+from .dataset_generate import IndexedRange
+from .episode_schema import Episode, EpisodeResult
+from .instrument import disable as disable_profiler, enable as enable_profiler, get_profiler
+from .runner import simulate_episode
+from .trace import FULL_TRACE, TracePolicy
+from .trace_store import get_store, trace_exists
+from .utils import batched
+
+@dataclass
+class WorkerStats:
+    episodes: int = 0
+    chunks: int = 0
+    busy_s: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return (self.episodes / self.busy_s) if self.busy_s > 0 else 0.0
+
+@dataclass
+class RunStats:
+    workers: Dict[int, WorkerStats] = field(default_factory=dict)
+    wall_s: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+    @property
+    def episodes(self) -> int:
+        return sum(w.episodes for w in self.workers.values())
+
+    def record(self, pid: int, n: int, busy_s: float, hits: int = 0, misses: int = 0) -> None:
+        w = self.workers.setdefault(pid, WorkerStats())
+        w.episodes += n
+        w.chunks += 1
+        w.busy_s += busy_s
+        self.cache_hits += hits
+        self.cache_misses += misses
+
+    def report(self) -> str:
+        lines = []
+        for i, (pid, w) in enumerate(sorted(self.workers.items())):
+            lines.append(f"  worker {i} (pid {pid}): {w.episodes} episodes in {w.chunks} chunks, "
+                         f"{w.busy_s:.2f}s busy, {w.throughput:.1f} ep/s")
+        total = (self.episodes / self.wall_s) if self.wall_s > 0 else 0.0
+        lines.append(f"  total: {self.episodes} episodes in {self.wall_s:.2f}s wall, {total:.1f} ep/s")
+        if self.cache_hits or self.cache_misses:
+            lines.append(f"  cache: {self.cache_hits} hits, {self.cache_misses} misses")
+        return "\n".join(lines)
+
+def _chunks(eps: Iterable[Episode], chunk_size: int) -> Iterator[Any]:
+    # an IndexedRange is split into sub-ranges that the workers generate themselves
+    if isinstance(eps, IndexedRange):
+        return eps.split(chunk_size)
+    return batched(eps, chunk_size)
+
+def _run_chunk(eps: Any, trace_dir: str, trace_store: str, policy: TracePolicy,
+               cache_path: Optional[str], profile: bool = False) -> Tuple[Any, ...]:
+    # with `profile` (pool workers of a profiled run) stage timings are collected here and
+    # returned as a snapshot for the parent to merge
+    prof = enable_profiler() if profile else None
+    t0 = time.perf_counter()
+    if isinstance(eps, IndexedRange):
+        eps = list(eps)
+    store = get_store(trace_dir) if trace_store == "sharded" and policy.level != "off" else None
+    if cache_path is None:
+        out = [simulate_episode(ep, trace_dir, store, policy) for ep in eps]
+        hits = misses = 0
+    else:
+        from .cache import episode_key, get_cache
+        # cached rows embed trace_path, so the trace settings are part of the key
+        cache = get_cache(cache_path)
+        context = f"{trace_store}|{trace_dir}|{policy.level}|{policy.rate}"
+        keys = [episode_key(ep, context) for ep in eps]
+        # a hit whose trace was deleted since is a miss: re-simulating writes the trace again
+        found = cache.get_many(keys, valid=lambda r: trace_exists(r.trace_path))
+        out = [found.get(k) or simulate_episode(ep, trace_dir, store, policy) for ep, k in zip(eps, keys)]
+        cache.put_many((k, r) for k, r in zip(keys, out) if k not in found)
+        hits, misses = len(found), len(eps) - len(found)
+    if store is not None:
+        # pool workers exit without running atexit hooks, so make each chunk durable
+        store.flush()
+    snap = None
+    if prof is not None:
+        snap = prof.snapshot()
+        disable_profiler()
+    return os.getpid(), time.perf_counter() - t0, out, hits, misses, snap
+
+def _record(stats: RunStats, done: Tuple[Any, ...]) -> List[EpisodeResult]:
+    pid, busy, res, hits, misses, snap = done
+    stats.record(pid, len(res), busy, hits, misses)
+    if snap is not None:
+        get_profiler().merge(snap)
+    return res
+
+def _pooled(pool: Executor, eps: Iterable[Episode], workers: int, chunk_size: int, stats: RunStats,
+            args: Tuple[Any, ...]) -> Iterator[EpisodeResult]:
+    pending: Deque[Future] = deque()
+    for chunk in _chunks(eps, chunk_size):
+        pending.append(pool.submit(_run_chunk, chunk, *args))
+        if len(pending) >= 2 * workers:
+            yield from _record(stats, pending.popleft().result())
+    while pending:
+        yield from _record(stats, pending.popleft().result())
+
+def run_episodes(eps: Iterable[Episode], trace_dir: str, workers: int = 1, chunk_size: int = 256,
+                 stats: Optional[RunStats] = None, trace_store: str = "files",
+                 policy: TracePolicy = FULL_TRACE, cache: Optional[str] = None,
+                 executor: Optional[Executor] = None) -> Iterator[EpisodeResult]:
+    """Simulate episodes, optionally over a process pool, yielding results in input order.
+
+    Every episode carries its own seed, so results do not depend on `workers` or `chunk_size`.
+    `eps` is consumed lazily and at most `2 * workers` chunks are in flight at once, so memory
+    stays bounded for arbitrarily long episode streams. With `trace_store="sharded"` each
+    process appends to its own shards, so `trace_path` references depend on the worker layout.
+    With `cache` (a `ResultCache` file), episodes whose result is cached are not simulated.
+    An `IndexedRange` is not materialized here: each worker generates its own slice of it.
+    `executor` is a process pool kept by the caller across calls (it is not shut down here);
+    otherwise one is started for this call when `workers > 1`.
+    """
+    stats = stats if stats is not None else RunStats()
+    t0 = time.perf_counter()
+    try:
+        if workers <= 1 and executor is None:
+            for chunk in _chunks(eps, chunk_size):
+                yield from _record(stats, _run_chunk(chunk, trace_dir, trace_store, policy, cache))
+            return
+
+        args = (trace_dir, trace_store, policy, cache, get_profiler().enabled)
+        if executor is not None:
+            yield from _pooled(executor, eps, max(1, workers), chunk_size, stats, args)
+            return
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from _pooled(pool, eps, workers, chunk_size, stats, args)
+    finally:
+        stats.wall_s = time.perf_counter() - t0
+
+def run_to_file(eps: Iterable[Episode], out: str, fmt: str = "jsonl", source: str = "", resume: bool = False,
+                commit_every: int = 10000, tap: Optional[Callable[[Iterable[EpisodeResult]], Iterator[EpisodeResult]]] = None,
+                **run_kwargs: Any) -> Tuple[int, int]:
+    """Run episodes straight into a results file; returns (rows in file, rows kept from a resumed run).
+
+    JSONL output is committed in durable chunks (see `ResultCheckpoint`), so a killed run can
+    continue with `resume=True` from its last commit. `run_kwargs` go to `run_episodes`. `tap`
+    wraps the stream of newly simulated results, e.g. `StreamingAggregator.observe`.
+    """
+    tap = tap or iter
+    if fmt != "jsonl":
+        if resume:
+            raise ValueError("resume is only supported for JSONL results")
+        from .columnar import write_results
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        return write_results(out, (r.to_dict() for r in tap(run_episodes(eps, **run_kwargs))), fmt), 0
+    ckpt = ResultCheckpoint(out, source, resume=resume, commit_every=commit_every)
+    n = ckpt.write_results(tap(run_episodes(ckpt.pending(eps), **run_kwargs)))
+    ckpt.close()
+    return n, ckpt.resumed
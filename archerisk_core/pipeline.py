@@ -0,0 +1,167 @@
+from __future__ import annotations
+import argparse
+import contextlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .aggregate import StreamingAggregator, export_latex_tables
+from .codec import encode_episode
+from .dataset_generate import iter_generate
+from .instrument import NULL_PROFILER, add_profile_args, finish_from_args, start_from_args
+from .parallel import RunStats, run_to_file
+from .trace import TRACE_LEVELS, TracePolicy
+from .utils import tee_lines
+
+# In-process pipeline: generate -> run -> aggregate -> plot. Stages hand each other objects
+# (the aggregator counts results as they are written, the summary dict goes straight to the
+# tables and figures), so nothing is re-read from disk; matplotlib is only imported to plot.
+
+@dataclass
+class PipelineConfig:
+    target_n: int = 2000
+    seed: int = 7
+    data_out: Optional[str] = "data/arche_risk_core_v3.jsonl"
+    results_out: str = "runs/results.jsonl"
+    results_format: str = "jsonl"
+    trace_dir: str = "runs/traces"
+    trace_store: str = "files"
+    trace: str = "full"
+    trace_rate: float = 0.01
+    workers: int = 1
+    chunk_size: int = 256
+    cache: Optional[str] = None
+    cache_max_entries: int = 5_000_000
+    resume: bool = False
+    commit_every: int = 10000
+    summary_out: Optional[str] = "runs/summary.json"
+    latex_dir: Optional[str] = "paper_lncs/tables"
+    fig_dir: Optional[str] = "paper_lncs/figures"
+
+@dataclass
+class PipelineResult:
+    n: int
+    resumed: int
+    stats: RunStats
+    aggregator: StreamingAggregator
+    summary: Dict[str, Any]
+
+def run_stage(cfg: PipelineConfig) -> Tuple[int, int, RunStats, StreamingAggregator]:
+    """Generate and simulate, streaming episodes to `data_out` and results to `results_out`."""
+    for path in (cfg.data_out, cfg.results_out):
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if cfg.trace != "off":
+        os.makedirs(cfg.trace_dir, exist_ok=True)
+    agg = StreamingAggregator()
+    stats = RunStats()
+    data_f = open(cfg.data_out, "w", encoding="utf-8") if cfg.data_out else contextlib.nullcontext()
+    with data_f:
+        eps = iter_generate(target_n=cfg.target_n, seed=cfg.seed)
+        if cfg.data_out:
+            eps = tee_lines(data_f, eps, encode_episode)
+        n, resumed = run_to_file(eps, cfg.results_out, cfg.results_format,
+                                 source=f"generate(target_n={cfg.target_n}, seed={cfg.seed})",
+                                 resume=cfg.resume, commit_every=cfg.commit_every, tap=agg.observe,
+                                 trace_dir=cfg.trace_dir, workers=cfg.workers, chunk_size=cfg.chunk_size,
+                                 stats=stats, trace_store=cfg.trace_store,
+                                 policy=TracePolicy(cfg.trace, cfg.trace_rate), cache=cfg.cache)
+    if resumed:
+        # the kept rows were never simulated here; count the finished file in order instead
+        agg = StreamingAggregator().update_path(cfg.results_out)
+    return n, resumed, stats, agg
+
+def aggregate_stage(agg: StreamingAggregator, summary_out: Optional[str] = None,
+                    latex_dir: Optional[str] = None) -> Dict[str, Any]:
+    summary = agg.summary()
+    if summary_out:
+        os.makedirs(os.path.dirname(summary_out) or ".", exist_ok=True)
+        with open(summary_out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    if latex_dir:
+        export_latex_tables(summary, latex_dir)
+    return summary
+
+def plot_stage(summary: Dict[str, Any], fig_dir: str) -> None:
+    from .plotting import plot_summary
+    plot_summary(summary, fig_dir)
+
+def run_pipeline(cfg: PipelineConfig, prof: Any = NULL_PROFILER, log: Any = print) -> PipelineResult:
+    with prof.section("pipeline.generate_run"):
+        n, resumed, stats, agg = run_stage(cfg)
+    if resumed:
+        log(f"[OK] resumed: kept {resumed} committed results, simulated {n - resumed}")
+    if cfg.data_out:
+        log(f"[OK] dataset: {n} episodes -> {cfg.data_out}")
+    log(f"[OK] results: {n} EpisodeResult rows -> {cfg.results_out}")
+    if cfg.workers > 1:
+        log(stats.report())
+    if cfg.cache:
+        from .runner import report_cache
+        report_cache(cfg.cache, cfg.cache_max_entries, stats.cache_hits, stats.cache_misses)
+
+    with prof.section("pipeline.aggregate"):
+        summary = aggregate_stage(agg, cfg.summary_out, cfg.latex_dir)
+    if cfg.summary_out:
+        log(f"[OK] wrote summary to {cfg.summary_out}")
+    if cfg.latex_dir:
+        log(f"[OK] wrote LaTeX tables to {cfg.latex_dir}")
+
+    if cfg.fig_dir:
+        with prof.section("pipeline.plot"):
+            plot_stage(summary, cfg.fig_dir)
+        log(f"[OK] wrote figures to {cfg.fig_dir}")
+    return PipelineResult(n, resumed, stats, agg, summary)
+
+def add_pipeline_args(ap: argparse.ArgumentParser) -> None:
+    d = PipelineConfig()
+    ap.add_argument("--target_n", type=int, default=d.target_n)
+    ap.add_argument("--seed", type=int, default=d.seed)
+
+    ap.add_argument("--data_out", default=d.data_out)
+    ap.add_argument("--results_out", default=d.results_out)
+    ap.add_argument("--trace_dir", default=d.trace_dir)
+    ap.add_argument("--results_format", choices=["jsonl", "columnar"], default=d.results_format)
+    ap.add_argument("--summary_out", default=d.summary_out)
+
+    ap.add_argument("--latex_dir", default=d.latex_dir)
+    ap.add_argument("--fig_dir", default=d.fig_dir)
+    ap.add_argument("--no_plot", action="store_true", help="Skip the figures")
+
+    ap.add_argument("--trace_store", choices=["files", "sharded"], default=d.trace_store)
+    ap.add_argument("--trace", choices=TRACE_LEVELS, default=d.trace)
+    ap.add_argument("--trace_rate", type=float, default=d.trace_rate)
+    ap.add_argument("--workers", type=int, default=d.workers, help="Simulation processes (1 = serial)")
+    ap.add_argument("--chunk_size", type=int, default=d.chunk_size, help="Episodes per worker task")
+    ap.add_argument("--cache", default=d.cache, help="Result cache file; cached episodes are not re-simulated")
+    ap.add_argument("--cache_max_entries", type=int, default=d.cache_max_entries)
+    ap.add_argument("--resume", action="store_true", help="Continue an interrupted run from its last committed chunk")
+    ap.add_argument("--commit_every", type=int, default=d.commit_every)
+
+def config_from_args(args: argparse.Namespace, root: str = "") -> PipelineConfig:
+    """PipelineConfig from `add_pipeline_args` options, with relative paths taken under `root`."""
+    def path(p: Optional[str]) -> Optional[str]:
+        return os.path.join(root, p) if p else None
+
+    return PipelineConfig(
+        target_n=args.target_n, seed=args.seed, data_out=path(args.data_out), results_out=path(args.results_out),
+        results_format=args.results_format, trace_dir=path(args.trace_dir), trace_store=args.trace_store,
+        trace=args.trace, trace_rate=args.trace_rate, workers=args.workers, chunk_size=args.chunk_size,
+        cache=path(args.cache), cache_max_entries=args.cache_max_entries, resume=args.resume,
+        commit_every=args.commit_every, summary_out=path(args.summary_out), latex_dir=path(args.latex_dir),
+        fig_dir=None if args.no_plot else path(args.fig_dir),
+    )
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Generate, run, aggregate and plot in one process")
+    add_pipeline_args(ap)
+    add_profile_args(ap)
+    args = ap.parse_args(argv)
+    prof = start_from_args(args)
+    run_pipeline(config_from_args(args), prof)
+    print("[DONE]")
+    finish_from_args(args, prof)
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,7 @@ from __future__ import annotations
 import argparse
 import json
 import os
-from typing import Dict, Any, List
-
-import matplotlib.pyplot as plt
+from typing import Dict, Any, List, Optional
 
 ARCHETYPES = ["MANIPULATOR", "COVERT_ACTOR", "DECEIVER", "INFILTRATOR_ESCALATOR", "MIXED"]
 BASELINES = ["B1", "B2", "B3"]
@@ -20,6 +18,8 @@ def _extract(summary: Dict[str, Any], metric: str) -> List[List[float]]:
     return vals
 
 def _plot_grouped(vals: List[List[float]], title: str, ylabel: str, out_pdf: str, out_png: str) -> None:
+    # imported here so that importing this module (e.g. for plot_summary) stays cheap
+    import matplotlib.pyplot as plt
     import numpy as np
     x = np.arange(len(ARCHETYPES))
     width = 0.24
@@ -37,33 +37,44 @@ def _plot_grouped(vals: List[List[float]], title: str, ylabel: str, out_pdf: str
     fig.savefig(out_png, dpi=200)
     plt.close(fig)
 
-def main() -> None:
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--summary", required=True)
-    ap.add_argument("--out", required=True, help="Output directory for figures")
-    args = ap.parse_args()
-
-    with open(args.summary, "r", encoding="utf-8") as f:
-        summary = json.load(f)
+# file name (without extension) -> (metric, title, y label)
+FIGURES = {
+    "fig_attack_success_behavior_lncs": ("ASR", "Attack Success Rate by Behaviour Archetype (DEFENDED)", "ASR"),
+    "fig_leak_behavior_lncs": ("LeakRate", "Leak Rate by Behaviour Archetype (DEFENDED)", "Leak Rate"),
+    "fig_unauthorized_write_behavior_lncs": ("UWR", "Unauthorized Write Rate by Behaviour Archetype (DEFENDED)", "UWR"),
+}
 
-    os.makedirs(args.out, exist_ok=True)
+def plot_figure(summary: Dict[str, Any], name: str, out_dir: str) -> List[str]:
+    """Render one of FIGURES as PDF and PNG; returns both paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    metric, title, ylabel = FIGURES[name]
+    paths = [os.path.join(out_dir, f"{name}.pdf"), os.path.join(out_dir, f"{name}.png")]
+    _plot_grouped(_extract(summary, metric), title, ylabel, *paths)
+    return paths
 
-    asr_vals = _extract(summary, "ASR")
-    leak_vals = _extract(summary, "LeakRate")
-    uwr_vals = _extract(summary, "UWR")
+def plot_summary(summary: Dict[str, Any], out_dir: str) -> None:
+    for name in FIGURES:
+        plot_figure(summary, name, out_dir)
 
-    _plot_grouped(asr_vals, "Attack Success Rate by Behaviour Archetype (DEFENDED)", "ASR", 
-                  os.path.join(args.out, "fig_attack_success_behavior_lncs.pdf"),
-                  os.path.join(args.out, "fig_attack_success_behavior_lncs.png"))
-
-    _plot_grouped(leak_vals, "Leak Rate by Behaviour Archetype (DEFENDED)", "Leak Rate", 
-                  os.path.join(args.out, "fig_leak_behavior_lncs.pdf"),
-                  os.path.join(args.out, "fig_leak_behavior_lncs.png"))
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser()
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--summary", help="Summary JSON written by arche-risk-aggregate")
+    src.add_argument("--results", nargs="+", help="EpisodeResult JSONL file(s) or columnar directories")
+    ap.add_argument("--out", required=True, help="Output directory for figures")
+    args = ap.parse_args(argv)
 
-    _plot_grouped(uwr_vals, "Unauthorized Write Rate by Behaviour Archetype (DEFENDED)", "UWR", 
-                  os.path.join(args.out, "fig_unauthorized_write_behavior_lncs.pdf"),
-                  os.path.join(args.out, "fig_unauthorized_write_behavior_lncs.png"))
+    if args.summary:
+        with open(args.summary, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+    else:
+        from .aggregate import StreamingAggregator
+        agg = StreamingAggregator()
+        for path in args.results:
+            agg.update_path(path)
+        summary = agg.summary()
 
+    plot_summary(summary, args.out)
     print(f"[OK] wrote figures to {args.out}")
 
 if __name__ == "__main__":
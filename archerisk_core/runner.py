@@ -2,127 +2,93 @@ from __future__ import annotations
 import argparse
 import os
 import random
-from typing import Dict, Any, Tuple, Optional
+from itertools import islice
+from typing import Dict, Any, Iterable, Tuple, Optional, List
 
 from .episode_schema import Episode, EpisodeResult
 from .defenses import get_defense
 from .env import Environment
-from .trace import Trace
+from .instrument import add_profile_args, finish_from_args, get_profiler, start_from_args
+from .params import DEFAULT_PARAMS, SimParams
+from .trace import FULL_TRACE, TRACE_LEVELS, TracePolicy
+from .trace_store import ShardedTraceStore
 from .agents import Planner, Worker, Reviewer
-from .utils import read_jsonl, write_jsonl
+from .episode_store import iter_episodes
+from .shard import add_shard_arg, checksum, load_manifest, write_manifest
 
 # Sink role per topology family (simplified)
-SINK_ROLE = {
-    "chain": "reviewer",
-    "reviewer_hub": "reviewer",
-    "star": "planner",
-    "fully_connected": "planner",
-}
+SINK_ROLE = DEFAULT_PARAMS.sink_role
 
 def _wilson_like_noise(rng: random.Random, p: float) -> bool:
     return rng.random() < max(0.0, min(1.0, p))
 
-def _base_asr(baseline: str, topo_mode: str, archetype: str) -> float:
-    # Baseline-level behavioural resilience pattern (tuned to match reviewer narrative)
-    if baseline == "B1":
-        return 0.95
-    if baseline == "B2":
-        if archetype in ("MANIPULATOR", "DECEIVER"):
-            return 0.22
-        if archetype == "INFILTRATOR_ESCALATOR":
-            return 0.55
-        if archetype == "MIXED":
-            return 0.82
-        return 0.88  # covert
-    # B3
-    if archetype in ("MANIPULATOR", "DECEIVER"):
-        return 0.15
-    if archetype == "INFILTRATOR_ESCALATOR":
-        return 0.40
-    if archetype == "MIXED":
-        return 0.72
-    return 0.78
-
-def _topology_modifier(topo_family: str) -> float:
-    if topo_family == "reviewer_hub":
-        return -0.18
-    if topo_family == "chain":
-        return -0.10
-    if topo_family == "star":
-        return +0.08
-    if topo_family == "fully_connected":
-        return +0.04
-    return 0.0
-
-def _leak_prob(archetype: str, baseline: str, sink_role: str) -> float:
-    # Leak mostly for archetypes that try to print secret
-    if archetype in ("MANIPULATOR", "DECEIVER", "MIXED"):
-        p = 0.70
-    else:
-        p = 0.20  # covert sometimes leaks as "checksum"
-    if baseline == "B3":
-        p *= 0.35  # redaction helps
-    if sink_role == "reviewer":
-        p *= 0.25  # reviewer blocks leakage more often
+def _base_asr(baseline: str, topo_mode: str, archetype: str, params: SimParams = DEFAULT_PARAMS) -> float:
+    return params.base_asr[baseline][archetype]
+
+def _topology_modifier(topo_family: str, params: SimParams = DEFAULT_PARAMS) -> float:
+    return params.topology_modifier.get(topo_family, 0.0)
+
+def _attack_prob(baseline: str, topo_mode: str, topo_family: str, archetype: str,
+                 params: SimParams = DEFAULT_PARAMS) -> float:
+    p_as = _base_asr(baseline, topo_mode, archetype, params) + _topology_modifier(topo_family, params)
+    # INSECURE mode weakens defenses
+    if topo_mode == "INSECURE":
+        p_as = min(params.p_attack_max, p_as + params.insecure_bump)
+    return max(params.p_attack_min, min(params.p_attack_max, p_as))
+
+def _leak_prob(archetype: str, baseline: str, sink_role: str, params: SimParams = DEFAULT_PARAMS) -> float:
+    p = params.leak_base[archetype]
+    p *= params.leak_baseline_factor[baseline]  # redaction helps
+    p *= params.leak_sink_factor[sink_role]  # reviewer blocks leakage more often
     return p
 
-def _uwr_prob(archetype: str, baseline: str, sink_role: str) -> float:
-    if archetype in ("COVERT_ACTOR", "INFILTRATOR_ESCALATOR", "MIXED"):
-        p = 0.70
-    else:
-        p = 0.15
-    if baseline == "B3":
-        p *= 0.70
-    if sink_role == "reviewer":
-        p *= 0.45
+def _uwr_prob(archetype: str, baseline: str, sink_role: str, params: SimParams = DEFAULT_PARAMS) -> float:
+    p = params.uwr_base[archetype]
+    p *= params.uwr_baseline_factor[baseline]
+    p *= params.uwr_sink_factor[sink_role]
     return p
 
-def _task_degrade_prob(archetype: str, baseline: str) -> float:
+def _task_degrade_prob(archetype: str, baseline: str, params: SimParams = DEFAULT_PARAMS) -> float:
     # when attacked, benign task can fail
-    if baseline == "B1":
-        return 0.35
-    if baseline == "B2":
-        return 0.25
-    return 0.18
+    return params.task_degrade[baseline]
 
-def simulate_episode(ep: Episode, out_trace_dir: str) -> EpisodeResult:
+def simulate_episode(ep: Episode, out_trace_dir: str, store: Optional[ShardedTraceStore] = None,
+                     policy: TracePolicy = FULL_TRACE, params: SimParams = DEFAULT_PARAMS) -> EpisodeResult:
+    prof = get_profiler()
+    t = prof.clock()
     rng = random.Random(ep.seed)
     env = Environment(secret=ep.secret, protected_paths=list(ep.protected_paths))
-    trace = Trace(episode_id=ep.episode_id)
-    trace.set_meta(**ep.__dict__)
+    trace = policy.start(ep.episode_id)
 
     cfg = get_defense(ep.defense_baseline, ep.topology_mode)
-    sink = SINK_ROLE[ep.topology_family]
+    sink = params.sink_role[ep.topology_family]
 
     planner = Planner()
     worker = Worker()
     reviewer = Reviewer()
 
     turn = 0
+    t = prof.lap("simulate.setup", t)
 
     plan, blocked, turn = planner.run(ep.prompt, ep.attacker_injection, cfg, env, trace, turn)
+    t = prof.lap("simulate.planner", t)
 
     # Determine whether attack "activates" end-to-end
-    p_as = _base_asr(ep.defense_baseline, ep.topology_mode, ep.attack_archetype) + _topology_modifier(ep.topology_family)
-
-    # INSECURE mode weakens defenses
-    if ep.topology_mode == "INSECURE":
-        p_as = min(0.98, p_as + 0.10)
-
-    p_as = max(0.02, min(0.98, p_as))
+    p_as = _attack_prob(ep.defense_baseline, ep.topology_mode, ep.topology_family, ep.attack_archetype, params)
     attack_success = _wilson_like_noise(rng, p_as)
 
     # Worker output: if attack not successful, render benign output (archetype="NONE" simulation)
     worker_arche = ep.attack_archetype if attack_success else "NONE"
     out, tool, turn = worker.run(ep.prompt, plan, worker_arche, cfg, env, trace, turn)
+    t = prof.lap("simulate.worker", t)
 
     # Decide risk events (leak/uwr) conditioned on attack_success
     leak = False
     unauthorized_write = False
 
     if attack_success:
-        leak = _wilson_like_noise(rng, _leak_prob(ep.attack_archetype, ep.defense_baseline, sink))
-        unauthorized_write = _wilson_like_noise(rng, _uwr_prob(ep.attack_archetype, ep.defense_baseline, sink))
+        leak = _wilson_like_noise(rng, _leak_prob(ep.attack_archetype, ep.defense_baseline, sink, params))
+        unauthorized_write = _wilson_like_noise(rng, _uwr_prob(ep.attack_archetype, ep.defense_baseline, sink, params))
     else:
         leak = False
         unauthorized_write = False
@@ -130,10 +96,10 @@ def simulate_episode(ep: Episode, out_trace_dir: str) -> EpisodeResult:
     # If archetype output actually contains secret and sink isn't reviewer, leak can happen via bypass
     if attack_success and sink != "reviewer" and ep.attack_archetype in ("MANIPULATOR", "DECEIVER", "MIXED"):
         # planner sink has a weaker check in B2 and improved in B3
-        if ep.defense_baseline == "B2":
-            leak = leak or _wilson_like_noise(rng, 0.30)
-        elif ep.defense_baseline == "B3":
-            leak = leak or _wilson_like_noise(rng, 0.12)
+        p_bypass = params.planner_bypass[ep.defense_baseline]
+        if p_bypass > 0:
+            leak = leak or _wilson_like_noise(rng, p_bypass)
+    t = prof.lap("simulate.risk", t)
 
     # Tool execution model:
     # - If sink is reviewer, reviewer tool guard decides
@@ -147,13 +113,16 @@ def simulate_episode(ep: Episode, out_trace_dir: str) -> EpisodeResult:
             path = tool.get("path", "")
             if cfg.strict_tool_guard and env.is_protected(path):
                 unauthorized_write = True
-                trace.log_tool("planner", "deny_write", path=path)
+                if trace.enabled:
+                    trace.log_tool("planner", "deny_write", path=path)
             else:
                 # execute write
                 env.write_file(path, tool.get("content", ""))
-                trace.log_tool("planner", "allow_write", path=path)
+                if trace.enabled:
+                    trace.log_tool("planner", "allow_write", path=path)
                 # Unauthorized write occurs only if protected
                 unauthorized_write = unauthorized_write or env.is_protected(path)
+    t = prof.lap("simulate.tool", t)
 
     # Release stage
     if sink == "reviewer":
@@ -162,11 +131,14 @@ def simulate_episode(ep: Episode, out_trace_dir: str) -> EpisodeResult:
         unauthorized_write = unauthorized_write or uwr2
     else:
         # planner releases output (reviewer may exist but not on release path)
-        trace.log_msg("planner", "planner", f"FINAL: {out}", turn); turn += 1
+        if trace.enabled:
+            trace.log_msg("planner", "planner", f"FINAL: {out}", turn)
+        turn += 1
+    t = prof.lap("simulate.release", t)
 
     # Task success
     # If attacked and success, degrade with probability
-    if attack_success and _wilson_like_noise(rng, _task_degrade_prob(ep.attack_archetype, ep.defense_baseline)):
+    if attack_success and _wilson_like_noise(rng, _task_degrade_prob(ep.attack_archetype, ep.defense_baseline, params)):
         task_success = False
     else:
         # Evaluate trivially using gt for families with exact answers
@@ -174,13 +146,22 @@ def simulate_episode(ep: Episode, out_trace_dir: str) -> EpisodeResult:
             task_success = out.strip() == ep.ground_truth.strip()
         else:
             task_success = out.strip().upper().startswith(ep.ground_truth.strip().upper())
+    t = prof.lap("simulate.task_check", t)
 
-    # Save trace
-    os.makedirs(out_trace_dir, exist_ok=True)
-    trace_path = os.path.join(out_trace_dir, f"{ep.episode_id}.json")
-    trace.save(trace_path)
+    # Save trace (one JSON file per episode, or a shard#offset reference into the store)
+    trace_path = ""
+    if policy.keep(trace, attack_success, leak, unauthorized_write):
+        trace.set_meta(**ep.to_dict())
+        if store is not None:
+            trace_path = store.append(trace)
+        else:
+            os.makedirs(out_trace_dir, exist_ok=True)
+            trace_path = os.path.join(out_trace_dir, f"{ep.episode_id}.json")
+            trace.save(trace_path)
+        prof.count("traces_kept")
+    t = prof.lap("simulate.trace_save", t)
 
-    return EpisodeResult(
+    res = EpisodeResult(
         episode_id=ep.episode_id,
         seed=ep.seed,
         task_family=ep.task_family,
@@ -195,25 +176,92 @@ def simulate_episode(ep: Episode, out_trace_dir: str) -> EpisodeResult:
         unauthorized_write=bool(unauthorized_write),
         trace_path=trace_path,
     )
+    prof.lap("simulate.result", t)
+    return res
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     ap = argparse.ArgumentParser()
-    ap.add_argument("--data", required=True, help="Input Episode JSONL")
-    ap.add_argument("--out", required=True, help="Output EpisodeResult JSONL")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--data", help="Input Episode JSONL or dictionary-encoded dataset")
+    src.add_argument("--generate", type=int, metavar="N",
+                     help="Run N episodes of the indexed generation scheme instead; workers derive each "
+                          "episode from (--seed, index), so no dataset file is written or read")
+    ap.add_argument("--seed", type=int, default=7, help="Dataset seed for --generate")
+    ap.add_argument("--out", required=True, help="Output EpisodeResult JSONL (or directory with --format columnar)")
+    ap.add_argument("--format", choices=["jsonl", "columnar"], default="jsonl", help="Results file format")
     ap.add_argument("--trace_dir", default="runs/traces", help="Trace output directory")
-    args = ap.parse_args()
+    ap.add_argument("--trace_store", choices=["files", "sharded"], default="files",
+                    help="files: one JSON per episode; sharded: compressed append-only shards in --trace_dir")
+    ap.add_argument("--trace", choices=TRACE_LEVELS, default="full",
+                    help="Trace policy: off | summary (counters) | failures | sample (see --trace_rate) | full")
+    ap.add_argument("--trace_rate", type=float, default=0.01, help="Fraction of episodes traced with --trace sample")
+    ap.add_argument("--workers", type=int, default=1, help="Simulation processes (1 = serial)")
+    ap.add_argument("--chunk_size", type=int, default=256, help="Episodes per worker task")
+    ap.add_argument("--cache", default=None, help="Result cache file; cached episodes are not re-simulated")
+    ap.add_argument("--cache_max_entries", type=int, default=5_000_000, help="LRU size limit of --cache")
+    ap.add_argument("--resume", action="store_true", help="Continue an interrupted run from its last committed chunk")
+    ap.add_argument("--commit_every", type=int, default=10000, help="Results per durable commit (JSONL output)")
+    add_shard_arg(ap)
+    add_profile_args(ap)
+    args = ap.parse_args(argv)
+    if args.resume and args.format != "jsonl":
+        ap.error("--resume requires --format jsonl")
+
+    from .parallel import RunStats, run_to_file
 
-    eps_raw = read_jsonl(args.data)
-    eps = [Episode(**r) for r in eps_raw]
+    shard = args.shard
+    if args.generate is not None:
+        from .dataset_generate import IndexedRange
+        total = args.generate
+        lo, hi = shard.bounds(total) if shard else (0, total)
+        eps: Iterable[Episode] = IndexedRange(args.seed, lo, hi)
+        source = f"indexed(target_n={args.generate}, seed={args.seed})"
+        dataset = {"scheme": "indexed", "seed": args.seed, "target_n": total}
+    else:
+        eps, source = iter_episodes(args.data), os.path.abspath(args.data)
+        gen = load_manifest(args.data) if shard else None
+        if gen is not None:
+            # the dataset is itself the matching shard written by arche-risk-gen --shard
+            if gen["shard"] != str(shard):
+                ap.error(f"{args.data} is dataset shard {gen['shard']}, not {shard}")
+            total, dataset = gen["total"], gen["config"]
+        elif shard:
+            total = sum(1 for _ in iter_episodes(args.data))
+            eps = islice(eps, *shard.bounds(total))
+            dataset = {"sha256": checksum(args.data)}
+    if shard:
+        source += f" shard {shard}"
 
-    results = []
-    for ep in eps:
-        res = simulate_episode(ep, args.trace_dir)
-        results.append(res.to_dict())
+    prof = start_from_args(args)
+    stats = RunStats()
+    with prof.section("run"):
+        n, resumed = run_to_file(eps, args.out, args.format, source=source,
+                                 resume=args.resume, commit_every=args.commit_every,
+                                 trace_dir=args.trace_dir, workers=args.workers, chunk_size=args.chunk_size, stats=stats,
+                                 trace_store=args.trace_store, policy=TracePolicy(args.trace, args.trace_rate),
+                                 cache=args.cache)
+    if resumed:
+        print(f"[OK] resumed: kept {resumed} committed results, simulated {n - resumed}")
+    print(f"[OK] wrote {n} results to {args.out}")
+    if shard:
+        write_manifest(args.out, "run", shard, total, n,
+                       {"dataset": dataset, "format": args.format, "trace": args.trace, "trace_rate": args.trace_rate,
+                        "trace_store": args.trace_store, "trace_dir": args.trace_dir})
+        lo, hi = shard.bounds(total)
+        print(f"[OK] shard {shard}: episodes [{lo}, {hi}) of {total}")
+    if args.workers > 1:
+        print(stats.report())
+    if args.cache:
+        report_cache(args.cache, args.cache_max_entries, stats.cache_hits, stats.cache_misses)
+    finish_from_args(args, prof)
 
-    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
-    write_jsonl(args.out, results)
-    print(f"[OK] wrote {len(results)} results to {args.out}")
+def report_cache(path: str, max_entries: int, hits: int, misses: int) -> None:
+    from .cache import ResultCache
+    cache = ResultCache(path)
+    evicted = cache.evict(max_entries)
+    print(f"[OK] cache {path}: {hits} hits, {misses} misses, "
+          f"{evicted} evicted, {len(cache)} entries")
+    cache.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,266 @@
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from dataclasses import dataclass
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple
+
+# A sharded experiment splits the episode index space [0, target_n) into N contiguous slices;
+# shard k (0-based) covers [k * target_n // N, (k + 1) * target_n // N). Every sharded output
+# gets a manifest next to it, <output>.shard.json:
+#   {"stage": "run", "shard": "1/4", "total": 2000, "start": 500, "stop": 1000, "n": 500,
+#    "sha256": "...", "config": {...}, ...}
+# Shards are concatenated in k order, so merged outputs equal those of a single-node run.
+
+MANIFEST_SUFFIX = ".shard.json"
+
+@dataclass(frozen=True)
+class Shard:
+    k: int
+    n: int
+
+    def __str__(self) -> str:
+        return f"{self.k}/{self.n}"
+
+    def bounds(self, total: int) -> Tuple[int, int]:
+        return self.k * total // self.n, (self.k + 1) * total // self.n
+
+def parse_shard(spec: str) -> Shard:
+    try:
+        k, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected k/N, got {spec!r}") from None
+    if n < 1 or not 0 <= k < n:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..N-1, got {spec!r}")
+    return Shard(k, n)
+
+def add_shard_arg(ap: Any) -> None:
+    ap.add_argument("--shard", type=parse_shard, default=None, metavar="k/N",
+                    help="Only process slice k (0-based) of N contiguous slices of the episode indices, "
+                         "and write a <out>.shard.json manifest for arche-risk-merge")
+
+def _hash_file(h: Any, path: str) -> None:
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+
+def _walk(root: str) -> List[str]:
+    # relative paths of the files under `root`, sorted ("/"-separated, so portable in manifests)
+    out = []
+    for d, _, files in os.walk(root):
+        rel = os.path.relpath(d, root)
+        out += [name if rel == "." else f"{rel}/{name}".replace(os.sep, "/") for name in files]
+    return sorted(out)
+
+def listing(path: str) -> str:
+    """sha256 of the (relative path, size, mtime) of every file under a directory.
+
+    A cheap stand-in for `checksum` on large output trees: it changes when any file is
+    added, removed or rewritten, without reading a byte of them.
+    """
+    h = hashlib.sha256()
+    for name in _walk(path):
+        st = os.stat(os.path.join(path, name))
+        h.update(f"{name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+def checksum(path: str) -> str:
+    """sha256 of a file, or of every file (relative path and bytes) under a directory."""
+    h = hashlib.sha256()
+    if os.path.isdir(path):
+        for name in _walk(path):
+            h.update(name.encode("utf-8") + b"\0")
+            _hash_file(h, os.path.join(path, name))
+    else:
+        _hash_file(h, path)
+    return h.hexdigest()
+
+def manifest_path(out: str) -> str:
+    return out.rstrip("/\\") + MANIFEST_SUFFIX
+
+def write_manifest(out: str, stage: str, shard: Shard, total: int, n: int, config: Dict[str, Any],
+                   **extra: Any) -> Dict[str, Any]:
+    """Record a finished shard output; `config` must be identical across the shards of one experiment."""
+    start, stop = shard.bounds(total)
+    m = {"stage": stage, "shard": str(shard), "total": total, "start": start, "stop": stop, "n": n,
+         "path": os.path.basename(out.rstrip("/\\")), "sha256": checksum(out), "config": config}
+    m.update(extra)
+    with open(manifest_path(out), "w", encoding="utf-8") as f:
+        json.dump(m, f, ensure_ascii=False, indent=2)
+    return m
+
+def load_manifest(out: str) -> Optional[Dict[str, Any]]:
+    """The manifest of a shard output (`out` may also name the manifest itself)."""
+    path = out if out.endswith(MANIFEST_SUFFIX) else manifest_path(out)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        m = json.load(f)
+    m["_file"] = os.path.join(os.path.dirname(path), m["path"])
+    m["_manifest"] = path
+    return m
+
+def verify(manifests: List[Dict[str, Any]], check_files: bool = True) -> List[str]:
+    """Problems that keep these manifests from forming one complete, consistent shard set."""
+    if not manifests:
+        return ["no shard manifests"]
+    first = manifests[0]
+    n_shards = parse_shard(first["shard"]).n
+    problems = []
+    seen: Dict[int, Dict[str, Any]] = {}
+    for m in manifests:
+        s = parse_shard(m["shard"])
+        where = f"shard {m['shard']} ({m['_file']})"
+        for key in ("stage", "total", "config"):
+            if m[key] != first[key]:
+                problems.append(f"{where}: {key} differs from shard {first['shard']}")
+        if s.n != n_shards:
+            problems.append(f"{where}: part of a {s.n}-way split, expected {n_shards}")
+            continue
+        if s.k in seen:
+            problems.append(f"{where}: duplicate of {seen[s.k]['_file']}")
+            continue
+        seen[s.k] = m
+        if (m["start"], m["stop"]) != s.bounds(m["total"]):
+            problems.append(f"{where}: covers [{m['start']}, {m['stop']}), expected {list(s.bounds(m['total']))}")
+        elif m["n"] != m["stop"] - m["start"]:
+            problems.append(f"{where}: holds {m['n']} rows, expected {m['stop'] - m['start']}")
+        if check_files:
+            if not os.path.exists(m["_file"]):
+                problems.append(f"{where}: output missing")
+            elif checksum(m["_file"]) != m["sha256"]:
+                problems.append(f"{where}: checksum mismatch")
+    for k in range(n_shards):
+        if k not in seen:
+            problems.append(f"shard {k}/{n_shards}: missing")
+    return problems
+
+def ordered(manifests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(manifests, key=lambda m: parse_shard(m["shard"]).k)
+
+def _load_all(paths: List[str]) -> List[Dict[str, Any]]:
+    # an output and its manifest name the same shard (`runs/state*.json` matches both), so
+    # keep one entry per manifest file
+    out: Dict[str, Dict[str, Any]] = {}
+    for p in paths:
+        m = load_manifest(p)
+        if m is None:
+            raise SystemExit(f"[FAIL] {p}: no shard manifest ({manifest_path(p)})")
+        out.setdefault(os.path.realpath(m["_manifest"]), m)
+    return list(out.values())
+
+def _check_inputs(runs: List[Dict[str, Any]], states: List[Dict[str, Any]]) -> List[str]:
+    """Problems that keep `states` from being the aggregates of exactly the result shards `runs`."""
+    by_shard = {m["shard"]: m for m in runs}
+    keys = sorted(by_shard, key=lambda s: parse_shard(s).k)
+    state_keys = sorted((m["shard"] for m in states), key=lambda s: parse_shard(s).k)
+    if state_keys != keys:
+        return [f"states cover shards {state_keys}, results cover {keys}; split both with the same --shard k/N"]
+    return [f"shard {m['shard']} state was not computed from {by_shard[m['shard']]['_file']}"
+            for m in ordered(states) if m.get("input_sha256") != by_shard[m["shard"]]["sha256"]]
+
+def _check(stage: str, manifests: List[Dict[str, Any]]) -> None:
+    problems = verify(manifests)
+    for p in problems:
+        print(f"[FAIL] {stage}: {p}")
+    if problems:
+        bad = sorted({p.split(":")[0] for p in problems if p.startswith("shard ")})
+        if bad:
+            print(f"[FAIL] rerun {', '.join(bad)} with the same arguments and --shard k/N, then merge again")
+        sys.exit(1)
+    n = sum(m["n"] for m in manifests)
+    print(f"[OK] {stage}: {len(manifests)} shards verified, {n} rows, total {manifests[0]['total']}")
+
+def merge_results(manifests: List[Dict[str, Any]], out: str, fmt: str) -> int:
+    """Concatenate verified result shards in shard order."""
+    from .columnar import is_columnar, iter_results, write_results
+    files = [m["_file"] for m in ordered(manifests)]
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    if fmt == "jsonl" and not any(is_columnar(p) for p in files):
+        with open(out, "wb") as dst:
+            for p in files:
+                with open(p, "rb") as src:
+                    shutil.copyfileobj(src, dst)
+        return sum(m["n"] for m in manifests)
+    return write_results(out, chain.from_iterable(iter_results(p) for p in files), fmt)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Verify and merge the per-shard outputs of a sharded experiment")
+    ap.add_argument("--data", nargs="*", default=[], help="Dataset shards written by arche-risk-gen --shard")
+    ap.add_argument("--results", nargs="*", default=[], help="Result shards written by arche-risk-run --shard")
+    ap.add_argument("--states", nargs="*", default=[],
+                    help="Aggregator states written by arche-risk-aggregate --shard ... --state_out")
+    ap.add_argument("--check", action="store_true", help="Only verify counts and checksums")
+    ap.add_argument("--results_out", default=None, help="Write the merged EpisodeResult file here")
+    ap.add_argument("--results_format", choices=["jsonl", "columnar"], default="jsonl")
+    ap.add_argument("--out", default=None, help="Output summary JSON")
+    ap.add_argument("--state_out", default=None, help="Also write the merged aggregator state here")
+    ap.add_argument("--latex_dir", default=None, help="Output LaTeX tables dir")
+    ap.add_argument("--fig_dir", default=None, help="Output directory for figures")
+    args = ap.parse_args(argv)
+    if not (args.data or args.results or args.states):
+        ap.error("pass shard outputs via --data, --results or --states")
+
+    sets = {"gen": _load_all(args.data), "run": _load_all(args.results), "aggregate": _load_all(args.states)}
+    for stage, ms in sets.items():
+        if ms:
+            _check(stage, ms)
+    if sets["run"] and sets["aggregate"]:
+        problems = _check_inputs(sets["run"], sets["aggregate"])
+        for p in problems:
+            print(f"[FAIL] aggregate: {p}")
+        if problems:
+            sys.exit(1)
+    if args.check:
+        return
+
+    if args.results_out:
+        if not sets["run"]:
+            ap.error("--results_out needs --results")
+        n = merge_results(sets["run"], args.results_out, args.results_format)
+        print(f"[OK] wrote {n} merged results to {args.results_out}")
+
+    if not (args.out or args.state_out or args.latex_dir or args.fig_dir):
+        return
+    from .aggregate import StreamingAggregator, export_latex_tables
+    agg = StreamingAggregator()
+    # merging in shard order keeps the cells in first-seen order, as in a single pass
+    if sets["aggregate"]:
+        for m in ordered(sets["aggregate"]):
+            with open(m["_file"], "r", encoding="utf-8") as f:
+                agg.merge(StreamingAggregator.from_state(json.load(f)))
+    elif sets["run"]:
+        for m in ordered(sets["run"]):
+            agg.update_path(m["_file"])
+    else:
+        ap.error("summaries need --results or --states")
+    summary = agg.summary()
+    total = (sets["aggregate"] or sets["run"])[0]["total"]
+    if summary["n_total"] != total:
+        print(f"[FAIL] merged {summary['n_total']} rows, the experiment has {total}")
+        sys.exit(1)
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"[OK] wrote summary to {args.out}")
+    if args.state_out:
+        os.makedirs(os.path.dirname(args.state_out) or ".", exist_ok=True)
+        with open(args.state_out, "w", encoding="utf-8") as f:
+            json.dump(agg.to_state(), f)
+        print(f"[OK] wrote aggregator state to {args.state_out}")
+    if args.latex_dir:
+        export_latex_tables(summary, args.latex_dir)
+        print(f"[OK] wrote LaTeX tables to {args.latex_dir}")
+    if args.fig_dir:
+        from .plotting import plot_summary
+        plot_summary(summary, args.fig_dir)
+        print(f"[OK] wrote figures to {args.fig_dir}")
+
+if __name__ == "__main__":
+    main()
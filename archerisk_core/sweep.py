@@ -0,0 +1,192 @@
+from __future__ import annotations
+import argparse
+import itertools
+import json
+import os
+from typing import Any, Dict, List, Mapping, Sequence, Tuple, Optional
+
+import numpy as np
+
+from .batch import FACTORS, cell_tables, encode_factors, episodes_to_columns
+from .dataset_generate import TASK_FAMILIES
+from .episode_store import iter_episodes
+from .expected import outcome_rates, task_solve_rate
+from .metrics import METRIC_FIELDS, summarize_counts
+from .params import DEFAULT_PARAMS, SimParams
+from .utils import write_jsonl
+
+# A sweep spec (JSON) lists parameter points as dotted-path overrides of SimParams:
+#   {"seed": 7,
+#    "base": {"insecure_bump": 0.15},                       # applied to every point
+#    "grid": {"base_asr.B3.MIXED": [0.6, 0.7, 0.8],          # cartesian product
+#             "planner_bypass.B2": {"start": 0.1, "stop": 0.5, "num": 5}},
+#    "points": [{"task_degrade.B1": 0.5}]}                  # extra explicit points
+
+CELL_AXES = ("defense_baseline", "topology_mode", "topology_family", "attack_archetype")
+
+def _axis(v: Any) -> List[Any]:
+    if isinstance(v, list):
+        return v
+    if isinstance(v, dict):
+        if "num" in v:
+            return [float(x) for x in np.linspace(v["start"], v["stop"], int(v["num"]))]
+        if "step" in v:
+            n = int(round((v["stop"] - v["start"]) / v["step"])) + 1
+            return [round(v["start"] + i * v["step"], 12) for i in range(n)]
+    raise ValueError(f"Grid axis must be a list or {{start, stop, num|step}}: {v!r}")
+
+def expand_spec(spec: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    """Parameter points (override dicts, base applied) in grid order, then explicit points."""
+    base = dict(spec.get("base", {}))
+    points: List[Dict[str, Any]] = []
+    grid = spec.get("grid", {})
+    if grid:
+        names = list(grid)
+        for combo in itertools.product(*(_axis(grid[k]) for k in names)):
+            points.append({**base, **dict(zip(names, combo))})
+    for p in spec.get("points", []):
+        points.append({**base, **p})
+    if not points:
+        points.append(base)
+    return points
+
+def stack_tables(points: Sequence[Mapping[str, Any]], params: SimParams = DEFAULT_PARAMS) -> Dict[str, np.ndarray]:
+    """Cell tables of every point, each flattened to shape (n_points, n_cells)."""
+    tabs = [cell_tables(params.with_overrides(p)) for p in points]
+    return {k: np.stack([getattr(t, k).ravel() for t in tabs]) for k in tabs[0].__dataclass_fields__}
+
+def _group_codes(codes: Mapping[str, np.ndarray], by: Sequence[str]) -> Tuple[np.ndarray, List[Tuple[str, ...]]]:
+    if not by:
+        return np.zeros(len(codes["defense_baseline"]), dtype=np.intp), [()]
+    dims = tuple(len(FACTORS[f]) for f in by)
+    g = np.ravel_multi_index(tuple(codes[f] for f in by), dims)
+    labels = [tuple(FACTORS[f][i] for f, i in zip(by, idx)) for idx in itertools.product(*(range(d) for d in dims))]
+    return g, labels
+
+def sweep_batch(columns: Mapping[str, Any], points: Sequence[Mapping[str, Any]], seed: int,
+                by: Sequence[str] = (), chunk: int = 4_000_000,
+                params: SimParams = DEFAULT_PARAMS) -> Tuple[List[Tuple[str, ...]], np.ndarray, np.ndarray]:
+    """Monte Carlo outcome counts of every parameter point over one dataset.
+
+    The dataset is encoded once and all points are simulated together, several per
+    vectorized block of at most `chunk` episode-draws; a dataset larger than `chunk` is also
+    split along the episodes. Returns group labels, episodes per group `(G,)` and success
+    counts `(P, G, 4)` in METRIC_FIELDS order.
+    """
+    codes = encode_factors(columns)
+    n = len(codes["defense_baseline"])
+    protected = np.asarray(columns["protected"], dtype=bool) if "protected" in columns else np.ones(n, dtype=bool)
+    solved = np.asarray(columns["solved"], dtype=bool) if "solved" in columns else np.ones(n, dtype=bool)
+    arith = codes["task_family"] == TASK_FAMILIES.index("arithmetic_check")
+    cell = np.ravel_multi_index(tuple(codes[f] for f in CELL_AXES), tuple(len(FACTORS[f]) for f in CELL_AXES))
+    g, labels = _group_codes(codes, by)
+    G = len(labels)
+
+    tabs = stack_tables(points, params)
+    rng = np.random.default_rng(seed)
+    P = len(points)
+    counts = np.zeros((P, G, len(METRIC_FIELDS)), dtype=np.int64)
+    step = max(1, chunk // max(1, n))
+    width = max(1, min(n, chunk))
+    for p0 in range(0, P, step):
+        p1 = min(P, p0 + step)
+        for e0 in range(0, n, width):
+            e1 = min(n, e0 + width)
+            c = cell[e0:e1]
+            t = {k: v[p0:p1][:, c] for k, v in tabs.items()}
+            u = rng.random((5, p1 - p0, e1 - e0))
+            attack = u[0] < t["p_attack"]
+            leak = attack & ((u[1] < t["p_leak"]) | (u[2] < t["p_bypass"]) | t["forced_leak"])
+            uwr = attack & ((u[3] < t["p_uwr"]) | (t["forced_uwr"] & protected[e0:e1]))
+            degraded = attack & (u[4] < t["p_degrade"])
+            task = solved[e0:e1] & (~attack | (~degraded & ~arith[e0:e1]))
+            flat = (np.arange(p1 - p0)[:, None] * G + g[e0:e1]).ravel()
+            for j, flag in enumerate((attack, leak, uwr, task)):
+                counts[p0:p1, :, j] += np.bincount(flat, weights=flag.ravel(),
+                                                   minlength=(p1 - p0) * G).reshape(-1, G).astype(np.int64)
+    return labels, np.bincount(g, minlength=G), counts
+
+def sweep_expected(columns: Mapping[str, Any], points: Sequence[Mapping[str, Any]], by: Sequence[str] = (),
+                   params: SimParams = DEFAULT_PARAMS) -> Tuple[List[Tuple[str, ...]], np.ndarray, np.ndarray]:
+    """Exact expected rates of every point, weighted by the dataset's factor-cell counts.
+
+    Same shapes as `sweep_batch`, with expected rates `(P, G, 4)` in place of counts.
+    """
+    codes = encode_factors(columns)
+    n = len(codes["defense_baseline"])
+    protected = np.asarray(columns["protected"], dtype=bool) if "protected" in columns else np.ones(n, dtype=bool)
+    g, labels = _group_codes(codes, by)
+    G = len(labels)
+    # cells are factor combinations split by `protected`, which decides the forced writes
+    keys = np.stack([codes[f] for f in FACTORS] + [protected.astype(np.intp)], axis=1)
+    uniq, inv = np.unique(keys, axis=0, return_inverse=True)
+    inv = inv.ravel()
+    n_cell = np.bincount(inv, minlength=len(uniq))
+    cell_group = np.zeros(len(uniq), dtype=np.intp)
+    cell_group[inv] = g
+    n_group = np.bincount(g, minlength=G)
+    solve = {t: task_solve_rate(t) for t in FACTORS["task_family"]}
+
+    tabs = stack_tables(points, params)
+    c120 = np.ravel_multi_index(tuple(uniq[:, list(FACTORS).index(f)] for f in CELL_AXES),
+                                tuple(len(FACTORS[f]) for f in CELL_AXES))
+    family = [FACTORS["task_family"][i] for i in uniq[:, list(FACTORS).index("task_family")]]
+    forced_uwr = tabs["forced_uwr"][:, c120] & uniq[:, -1].astype(bool)
+    rates = outcome_rates(tabs["p_attack"][:, c120], tabs["p_leak"][:, c120], tabs["p_bypass"][:, c120],
+                          tabs["forced_leak"][:, c120], tabs["p_uwr"][:, c120], forced_uwr,
+                          tabs["p_degrade"][:, c120],
+                          np.array([t == "arithmetic_check" for t in family]),
+                          np.array([solve[t] for t in family]))
+    onehot = np.zeros((len(uniq), G))
+    onehot[np.arange(len(uniq)), cell_group] = n_cell
+    out = np.stack([r @ onehot for r in rates], axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where(n_group[None, :, None] > 0, out / n_group[None, :, None], 0.0)
+    return labels, n_group, out
+
+def sweep_rows(points: Sequence[Mapping[str, Any]], by: Sequence[str], labels: Sequence[Tuple[str, ...]],
+               n_group: np.ndarray, values: np.ndarray, exact: bool) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for i, p in enumerate(points):
+        for gi, label in enumerate(labels):
+            n = int(n_group[gi])
+            if n == 0:
+                continue
+            row: Dict[str, Any] = {"point": i, "params": dict(p), **dict(zip(by, label)), "n": n}
+            if exact:
+                row.update({m: {"p": float(values[i, gi, j])} for j, (m, _) in enumerate(METRIC_FIELDS)})
+            else:
+                rates = summarize_counts(n, [int(k) for k in values[i, gi]])
+                row.update({m: r.__dict__ for m, r in rates.items()})
+            rows.append(row)
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Evaluate a grid of simulator parameter points over one dataset")
+    ap.add_argument("--data", required=True, help="Input Episode JSONL")
+    ap.add_argument("--spec", required=True, help="Sweep spec JSON (base / grid / points over SimParams paths)")
+    ap.add_argument("--out", required=True, help="Output JSONL, one row per parameter point and group")
+    ap.add_argument("--by", nargs="*", default=[], choices=list(FACTORS), help="Factors to break rates down by")
+    ap.add_argument("--engine", choices=["batch", "expected"], default="batch",
+                    help="batch: vectorized Monte Carlo draws; expected: exact rates, no sampling")
+    ap.add_argument("--seed", type=int, default=None, help="Monte Carlo seed (default: the spec's, else 7)")
+    args = ap.parse_args(argv)
+
+    with open(args.spec, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    points = expand_spec(spec)
+    columns = episodes_to_columns(list(iter_episodes(args.data)))
+
+    if args.engine == "batch":
+        seed = args.seed if args.seed is not None else spec.get("seed", 7)
+        labels, n_group, values = sweep_batch(columns, points, seed, args.by)
+    else:
+        labels, n_group, values = sweep_expected(columns, points, args.by)
+    rows = sweep_rows(points, args.by, labels, n_group, values, exact=args.engine == "expected")
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    write_jsonl(args.out, rows)
+    print(f"[OK] swept {len(points)} parameter points ({args.engine}) -> {len(rows)} rows in {args.out}")
+
+if __name__ == "__main__":
+    main()
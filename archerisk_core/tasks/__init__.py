@@ -1,3 +1,5 @@
+# Task generators draw only rng.randint(a, b) and rng.random() < 0.5: expected.task_solve_rate
+# enumerates exactly those draws to get exact solve rates, and raises on any other use of rng.
 from .arithmetic import gen_arithmetic_task, eval_arithmetic
 from .policy_triage import gen_policy_task, eval_policy
 from .file_triage import gen_file_task, eval_file
@@ -1,11 +1,17 @@
 from __future__ import annotations
 import json
 import time
+import zlib
 from dataclasses import dataclass, field
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Literal, Union
+
+TraceLevel = Literal["off", "summary", "failures", "sample", "full"]
+TRACE_LEVELS = ["off", "summary", "failures", "sample", "full"]
 
 @dataclass
 class Trace:
+    enabled = True  # class attribute; call sites skip building log payloads when False
+
     episode_id: str
     meta: Dict[str, Any] = field(default_factory=dict)
     messages: List[Dict[str, Any]] = field(default_factory=list)
@@ -46,3 +52,88 @@ class Trace:
     def save(self, path: str) -> None:
         with open(path, "w", encoding="utf-8") as f:
             json.dump(self.to_json(), f, ensure_ascii=False, indent=2)
+
+class SummaryTrace:
+    """Counts events per kind and per role/action instead of recording their content."""
+    enabled = True
+
+    def __init__(self, episode_id: str) -> None:
+        self.episode_id = episode_id
+        self.meta: Dict[str, Any] = {}
+        self.counts = {"messages": 0, "tool_events": 0, "decisions": 0}
+        self.actions: Dict[str, int] = {}
+
+    def _bump(self, kind: str, key: str) -> None:
+        self.counts[kind] += 1
+        self.actions[key] = self.actions.get(key, 0) + 1
+
+    def set_meta(self, **kwargs: Any) -> None:
+        self.meta.update(kwargs)
+
+    def log_msg(self, role: str, sender: str, content: str, turn: int) -> None:
+        self._bump("messages", f"{sender}:message")
+
+    def log_tool(self, role: str, action: str, **payload: Any) -> None:
+        self._bump("tool_events", f"{role}:{action}")
+
+    def log_decision(self, role: str, decision: str, **payload: Any) -> None:
+        self._bump("decisions", f"{role}:{decision}")
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"episode_id": self.episode_id, "meta": self.meta, "counts": self.counts, "actions": self.actions}
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, ensure_ascii=False, indent=2)
+
+class NullTrace:
+    """Stateless sink for untraced episodes; one shared instance, nothing allocated."""
+    __slots__ = ()
+    enabled = False
+    episode_id = ""
+
+    def set_meta(self, **kwargs: Any) -> None:
+        pass
+
+    def log_msg(self, role: str, sender: str, content: str, turn: int) -> None:
+        pass
+
+    def log_tool(self, role: str, action: str, **payload: Any) -> None:
+        pass
+
+    def log_decision(self, role: str, decision: str, **payload: Any) -> None:
+        pass
+
+NULL_TRACE = NullTrace()
+
+TraceSink = Union[Trace, SummaryTrace, NullTrace]
+
+@dataclass(frozen=True)
+class TracePolicy:
+    """Which episodes get a trace, and how much of it.
+
+    off: nothing recorded or written; summary: per-episode event counters;
+    failures: full traces kept only when attack_success, leak or unauthorized_write;
+    sample: full traces for a deterministic `rate` fraction of episodes; full: every trace.
+    """
+    level: TraceLevel = "full"
+    rate: float = 1.0
+
+    def start(self, episode_id: str) -> TraceSink:
+        if self.level == "off":
+            return NULL_TRACE
+        if self.level == "summary":
+            return SummaryTrace(episode_id)
+        if self.level == "sample" and zlib.crc32(episode_id.encode("utf-8")) >= self.rate * 2**32:
+            # keyed on episode_id so the sample is stable across runs and worker layouts
+            return NULL_TRACE
+        return Trace(episode_id=episode_id)
+
+    def keep(self, trace: TraceSink, attack_success: bool, leak: bool, unauthorized_write: bool) -> bool:
+        if not trace.enabled:
+            return False
+        if self.level == "failures":
+            return attack_success or leak or unauthorized_write
+        return True
+
+FULL_TRACE = TracePolicy()
@@ -0,0 +1,229 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import struct
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from .trace import TraceSink
+
+# Sharded append-only trace store.
+#
+# Layout under `root` (one writer per process, so pool workers never share a file):
+#   shard-<writer>-<seq>.trs          length-prefixed zlib records
+#   shard-<writer>-<seq>.trs.strings  string table of that shard, one JSON string per line
+#   index-<writer>.tsv                episode_id \t shard file \t offset
+#
+# A record references every string through the shard's table, so the prompt templates,
+# attacker injections and meta fields repeated across traces are stored once per shard.
+# References handed out as `EpisodeResult.trace_path` look like `<root>/<shard>#<offset>`.
+
+_LEN = struct.Struct(">I")
+
+def _pack(v: Any, intern: Dict[str, int]) -> Any:
+    # str -> table id; float/bool/None stay raw; int and containers are tagged lists
+    if isinstance(v, str):
+        i = intern.get(v)
+        if i is None:
+            i = intern[v] = len(intern)
+        return i
+    if v is None or isinstance(v, (bool, float)):
+        return v
+    if isinstance(v, int):
+        return ["i", v]
+    if isinstance(v, dict):
+        out: List[Any] = ["d"]
+        for k, x in v.items():
+            out.append(_pack(k, intern))
+            out.append(_pack(x, intern))
+        return out
+    if isinstance(v, (list, tuple)):
+        return ["l"] + [_pack(x, intern) for x in v]
+    raise TypeError(f"Unsupported trace value: {type(v).__name__}")
+
+def _unpack(v: Any, table: List[str]) -> Any:
+    if isinstance(v, bool) or v is None or isinstance(v, float):
+        return v
+    if isinstance(v, int):
+        return table[v]
+    tag = v[0]
+    if tag == "i":
+        return v[1]
+    if tag == "d":
+        return {table[v[i]]: _unpack(v[i + 1], table) for i in range(1, len(v), 2)}
+    return [_unpack(x, table) for x in v[1:]]
+
+class ShardedTraceStore:
+    def __init__(self, root: str, writer: Optional[str] = None, shard_bytes: int = 64 << 20, level: int = 6) -> None:
+        self.root = root
+        self.writer = writer or str(os.getpid())
+        self.shard_bytes = shard_bytes
+        self.level = level
+        os.makedirs(root, exist_ok=True)
+        self._seq = 0
+        while os.path.exists(self._shard_path(self._seq)):
+            self._seq += 1
+        self._index = open(os.path.join(root, f"index-{self.writer}.tsv"), "a", encoding="utf-8")
+        self._open_shard()
+
+    def _shard_name(self, seq: int) -> str:
+        return f"shard-{self.writer}-{seq:04d}.trs"
+
+    def _shard_path(self, seq: int) -> str:
+        return os.path.join(self.root, self._shard_name(seq))
+
+    def _open_shard(self) -> None:
+        self._data = open(self._shard_path(self._seq), "ab")
+        self._strings = open(self._shard_path(self._seq) + ".strings", "a", encoding="utf-8")
+        self._intern: Dict[str, int] = {}
+
+    def _roll(self) -> None:
+        self.flush()
+        self._data.close()
+        self._strings.close()
+        self._seq += 1
+        self._open_shard()
+
+    def append(self, trace: TraceSink) -> str:
+        if self._data.tell() >= self.shard_bytes:
+            self._roll()
+        known = len(self._intern)
+        body = json.dumps(_pack(trace.to_json(), self._intern), separators=(",", ":")).encode("utf-8")
+        if len(self._intern) > known:
+            new = list(self._intern)[known:]
+            self._strings.write("".join(json.dumps(s, ensure_ascii=False) + "\n" for s in new))
+        blob = zlib.compress(body, self.level)
+        offset = self._data.tell()
+        self._data.write(_LEN.pack(len(blob)) + blob)
+        name = self._shard_name(self._seq)
+        self._index.write(f"{trace.episode_id}\t{name}\t{offset}\n")
+        return f"{os.path.join(self.root, name)}#{offset}"
+
+    def flush(self) -> None:
+        # strings before data before index: a visible index entry is always readable
+        self._strings.flush()
+        self._data.flush()
+        self._index.flush()
+
+    def close(self) -> None:
+        self.flush()
+        for f in (self._strings, self._data, self._index):
+            f.close()
+
+    def __enter__(self) -> "ShardedTraceStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+# Process-local writers, reused across chunks by pool workers
+_WRITERS: Dict[str, ShardedTraceStore] = {}
+
+def get_store(root: str) -> ShardedTraceStore:
+    st = _WRITERS.get(root)
+    if st is None:
+        st = _WRITERS[root] = ShardedTraceStore(root)
+    return st
+
+def _is_trace_file(name: str) -> bool:
+    # per-episode JSON traces, and the shards, string tables and indexes of a sharded store
+    return (name.endswith(".json") or name.startswith("index-") and name.endswith(".tsv")
+            or name.startswith("shard-") and name.endswith((".trs", ".trs.strings")))
+
+def clear_traces(root: str) -> int:
+    """Delete the traces a previous run wrote directly under `root`; returns the files removed.
+
+    Other files and subdirectories are left alone. This process's writer for `root` is closed
+    first, so the next `get_store(root)` starts fresh shards.
+    """
+    st = _WRITERS.pop(root, None)
+    if st is not None:
+        st.close()
+    if not os.path.isdir(root):
+        return 0
+    n = 0
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if _is_trace_file(name) and os.path.isfile(path):
+            os.remove(path)
+            _TABLES.pop(path, None)
+            n += 1
+    return n
+
+_TABLES: Dict[str, List[str]] = {}
+
+def _table(shard_path: str, need: int) -> List[str]:
+    table = _TABLES.get(shard_path)
+    if table is None or len(table) <= need:
+        with open(shard_path + ".strings", "r", encoding="utf-8") as f:
+            table = _TABLES[shard_path] = [json.loads(line) for line in f]
+    return table
+
+def _max_id(v: Any) -> int:
+    if isinstance(v, bool) or v is None or isinstance(v, float):
+        return -1
+    if isinstance(v, int):
+        return v
+    if v[0] == "i":
+        return -1
+    return max((_max_id(x) for x in v[1:]), default=-1)
+
+def split_ref(ref: str) -> Tuple[str, int]:
+    path, _, off = ref.rpartition("#")
+    return path, int(off)
+
+def trace_exists(ref: str) -> bool:
+    """Whether the trace behind a `trace_path` is still on disk (an empty path references none)."""
+    if not ref:
+        return True
+    if "#" not in ref:
+        return os.path.exists(ref)
+    path, offset = split_ref(ref)
+    try:
+        return os.path.getsize(path) > offset
+    except OSError:
+        return False
+
+def load_trace(ref: str) -> Dict[str, Any]:
+    """Load a trace from a `shard#offset` reference or a plain per-episode JSON path."""
+    if "#" not in ref:
+        with open(ref, "r", encoding="utf-8") as f:
+            return json.load(f)
+    path, offset = split_ref(ref)
+    with open(path, "rb") as f:
+        f.seek(offset)
+        (n,) = _LEN.unpack(f.read(_LEN.size))
+        packed = json.loads(zlib.decompress(f.read(n)))
+    return _unpack(packed, _table(path, _max_id(packed)))
+
+def find_trace(root: str, episode_id: str) -> Optional[str]:
+    """Scan the store's index files for an episode and return its reference."""
+    for name in sorted(os.listdir(root)):
+        if not (name.startswith("index-") and name.endswith(".tsv")):
+            continue
+        with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+            for line in f:
+                eid, shard, off = line.rstrip("\n").split("\t")
+                if eid == episode_id:
+                    return f"{os.path.join(root, shard)}#{off}"
+    return None
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ref", default=None, help="Trace reference (shard#offset or JSON path)")
+    ap.add_argument("--root", default=None, help="Trace store directory (with --episode_id)")
+    ap.add_argument("--episode_id", default=None)
+    args = ap.parse_args(argv)
+
+    ref = args.ref
+    if ref is None:
+        if not (args.root and args.episode_id):
+            ap.error("pass --ref or --root with --episode_id")
+        ref = find_trace(args.root, args.episode_id)
+        if ref is None:
+            raise SystemExit(f"[ERR] {args.episode_id} not found in {args.root}")
+    print(json.dumps(load_trace(ref), ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,46 @@
 from __future__ import annotations
 import json
-from typing import Iterable, Dict, Any, List
+from typing import Iterable, Iterator, Dict, Any, List, TypeVar, Callable, TextIO
 
-def read_jsonl(path: str) -> List[Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
+T = TypeVar("T")
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
     with open(path, "r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
-            rows.append(json.loads(line))
-    return rows
+            yield json.loads(line)
+
+def read_jsonl(path: str) -> List[Dict[str, Any]]:
+    return list(iter_jsonl(path))
 
-def write_jsonl(path: str, rows: Iterable[Dict[str, Any]]) -> None:
+def write_jsonl(path: str, rows: Iterable[Dict[str, Any]]) -> int:
+    n = 0
     with open(path, "w", encoding="utf-8") as f:
         for r in rows:
             f.write(json.dumps(r, ensure_ascii=False) + "\n")
+            n += 1
+    return n
+
+def tee_jsonl(f: TextIO, items: Iterable[T], to_dict: Callable[[T], Dict[str, Any]]) -> Iterator[T]:
+    # Pass items through unchanged while spooling each one to an open JSONL file
+    for it in items:
+        f.write(json.dumps(to_dict(it), ensure_ascii=False) + "\n")
+        yield it
+
+def tee_lines(f: TextIO, items: Iterable[T], to_line: Callable[[T], str]) -> Iterator[T]:
+    # Like tee_jsonl, for a serializer that already returns the newline-terminated line
+    for it in items:
+        f.write(to_line(it))
+        yield it
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    buf: List[T] = []
+    for it in items:
+        buf.append(it)
+        if len(buf) >= size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
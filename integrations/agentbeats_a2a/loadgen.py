@@ -0,0 +1,283 @@
+from __future__ import annotations
+import argparse
+import http.client
+import json
+import math
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+sys.path.insert(0, ROOT)
+
+from archerisk_core.dataset_generate import iter_generate  # noqa: E402
+from archerisk_core.episode_store import iter_episodes  # noqa: E402
+
+def percentile(sorted_xs: List[float], q: float) -> float:
+    # nearest-rank percentile of an ascending list (0.0 for no samples)
+    if not sorted_xs:
+        return 0.0
+    return sorted_xs[min(len(sorted_xs), max(1, math.ceil(q / 100 * len(sorted_xs)))) - 1]
+
+def latency_summary(xs: List[float]) -> Dict[str, float]:
+    s = sorted(xs)
+    return {
+        "n": len(s),
+        "mean_ms": (sum(s) / len(s) * 1000) if s else 0.0,
+        "p50_ms": percentile(s, 50) * 1000,
+        "p95_ms": percentile(s, 95) * 1000,
+        "p99_ms": percentile(s, 99) * 1000,
+        "max_ms": (s[-1] * 1000) if s else 0.0,
+    }
+
+class Client:
+    """One keep-alive-less JSON-RPC client (the stdlib server closes each connection)."""
+
+    def __init__(self, url: str, timeout: float) -> None:
+        u = urlparse(url)
+        self.host, self.port = u.hostname or "127.0.0.1", u.port or 80
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            body = json.dumps(payload).encode("utf-8") if payload is not None else None
+            conn.request(method, path, body, {"Content-Type": "application/json"} if body else {})
+            resp = conn.getresponse()
+            data = resp.read()
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}")
+            return json.loads(data)
+        finally:
+            conn.close()
+
+    def rpc(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        out = self.request("POST", "/", {"jsonrpc": "2.0", "id": str(uuid.uuid4()), "method": method, "params": params})
+        if "error" in out:
+            raise RpcError(out["error"].get("code"), out["error"].get("message", ""))
+        return out["result"]
+
+class RpcError(RuntimeError):
+    def __init__(self, code: Any, message: str) -> None:
+        super().__init__(f"{code}: {message}")
+        self.code = code
+
+class Recorder:
+    """Thread-safe request log: (finish time, kind, latency seconds, error kind or None)."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.rows: List[Tuple[float, str, float, Optional[str]]] = []
+        self.samples: List[Dict[str, Any]] = []
+
+    def add(self, kind: str, latency: float, error: Optional[str] = None) -> None:
+        with self.lock:
+            self.rows.append((time.perf_counter(), kind, latency, error))
+
+def _error_kind(e: BaseException) -> str:
+    if isinstance(e, RpcError):
+        return "busy" if e.code == -32000 else f"rpc_{e.code}"
+    if isinstance(e, TimeoutError):
+        return "timeout"
+    if isinstance(e, OSError):
+        return "connection"
+    return type(e).__name__
+
+def one_episode(client: Client, ep: Dict[str, Any], mode: str, poll_interval: float, rec: Recorder,
+                t0: Optional[float] = None) -> None:
+    """Send one episode; in `poll` mode send non-blocking and poll `tasks/get` until it finishes.
+
+    Episode latency runs from `t0` (its scheduled start; default now) to the finished task.
+    """
+    t0 = time.perf_counter() if t0 is None else t0
+    params: Dict[str, Any] = {"message": {"role": "user", "parts": [{"kind": "data", "data": {"episode": ep}}]}}
+    if mode == "poll":
+        params["configuration"] = {"blocking": False}
+    ts = time.perf_counter()
+    try:
+        task = client.rpc("message/send", params)
+    except Exception as e:
+        rec.add("send", time.perf_counter() - ts, _error_kind(e))
+        rec.add("episode", time.perf_counter() - t0, _error_kind(e))
+        return
+    rec.add("send", time.perf_counter() - ts)
+    while task["status"]["state"] not in ("completed", "failed"):
+        time.sleep(poll_interval)
+        t1 = time.perf_counter()
+        try:
+            task = client.rpc("tasks/get", {"id": task["id"]})
+        except Exception as e:
+            rec.add("get", time.perf_counter() - t1, _error_kind(e))
+            rec.add("episode", time.perf_counter() - t0, _error_kind(e))
+            return
+        rec.add("get", time.perf_counter() - t1)
+    failed = "task_failed" if task["status"]["state"] == "failed" else None
+    rec.add("episode", time.perf_counter() - t0, failed)
+
+def sample_server(client: Client, rec: Recorder, t0: float, interval: float, stop: threading.Event) -> None:
+    # GET /stats every `interval`: task store size, episodes in flight and server RSS
+    while not stop.wait(interval):
+        s: Dict[str, Any] = {"t": time.perf_counter() - t0}
+        try:
+            s.update(client.request("GET", "/stats"))
+        except Exception as e:
+            s["error"] = _error_kind(e)
+        with rec.lock:
+            rec.samples.append(s)
+
+def run_load(client: Client, episodes: List[Dict[str, Any]], rate: float, concurrency: int, mode: str,
+             poll_interval: float, rec: Recorder) -> float:
+    """Issue every episode once from `concurrency` threads; returns the wall time.
+
+    With `rate > 0` episodes start on a fixed open-loop schedule (episode i at i / rate) and
+    latency is measured from the scheduled start, so a falling-behind server shows up as
+    queueing delay rather than as a silently lower offered rate.
+    """
+    lock = threading.Lock()
+    nxt = [0]
+    t0 = time.perf_counter()
+
+    def worker() -> None:
+        while True:
+            with lock:
+                i = nxt[0]
+                nxt[0] += 1
+            if i >= len(episodes):
+                return
+            start = None
+            if rate > 0:
+                start = t0 + i / rate
+                if start > time.perf_counter():
+                    time.sleep(start - time.perf_counter())
+            one_episode(client, episodes[i], mode, poll_interval, rec, start)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, concurrency))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0
+
+def report(rec: Recorder, t0: float, wall: float, interval: float, config: Dict[str, Any]) -> Dict[str, Any]:
+    by_kind: Dict[str, List[Tuple[float, str, float, Optional[str]]]] = {}
+    for row in rec.rows:
+        by_kind.setdefault(row[1], []).append(row)
+    kinds: Dict[str, Any] = {}
+    for kind, rows in sorted(by_kind.items()):
+        errors: Dict[str, int] = {}
+        for r in rows:
+            if r[3]:
+                errors[r[3]] = errors.get(r[3], 0) + 1
+        ok = [r[2] for r in rows if not r[3]]
+        kinds[kind] = {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": (len(rows) - len(ok)) / len(rows) if rows else 0.0,
+            "throughput_rps": len(ok) / wall if wall > 0 else 0.0,
+            "latency": latency_summary(ok),
+        }
+    timeline = []
+    episodes = by_kind.get("episode", [])
+    n_bins = int(wall // interval) + 1
+    for b in range(n_bins):
+        lo, hi = t0 + b * interval, t0 + (b + 1) * interval
+        rows = [r for r in episodes if lo <= r[0] < hi]
+        ok = [r[2] for r in rows if not r[3]]
+        lat = latency_summary(ok)
+        timeline.append({"t": round(b * interval, 3), "completed": len(ok), "errors": len(rows) - len(ok),
+                         "throughput_eps": len(ok) / interval,
+                         "p50_ms": lat["p50_ms"], "p95_ms": lat["p95_ms"], "p99_ms": lat["p99_ms"]})
+    return {"config": config, "wall_s": wall, "requests": kinds, "timeline": timeline, "server": rec.samples}
+
+def start_server(port: int, server_args: List[str]) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    cmd = [sys.executable, os.path.join(HERE, "server.py"), "--host", "127.0.0.1", "--port", str(port)] + server_args
+    # the server logs every request to stderr; an undrained pipe would stall it
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def wait_ready(client: Client, proc: Optional[subprocess.Popen], timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            client.request("GET", "/.well-known/agent.json")
+            return
+        except Exception:
+            time.sleep(0.1)
+    raise RuntimeError("server did not become ready")
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Load generator and latency benchmark for the A2A server")
+    ap.add_argument("--url", default=None, help="Target an already running server instead of starting one")
+    ap.add_argument("--port", type=int, default=8765, help="Port of the locally started server")
+    ap.add_argument("--server_args", default="", help="Extra server.py flags for the local server, e.g. \"--mode single\"")
+    ap.add_argument("--data", default=None, help="Episode JSONL to send (default: generate --n episodes)")
+    ap.add_argument("--n", type=int, default=1000, help="Episodes to send")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--rate", type=float, default=0, help="Episodes started per second (0: as fast as --concurrency allows)")
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--mode", choices=["blocking", "poll"], default="blocking",
+                    help="blocking: one message/send per episode; poll: non-blocking send then tasks/get")
+    ap.add_argument("--poll_interval", type=float, default=0.01)
+    ap.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    ap.add_argument("--interval", type=float, default=1.0, help="Timeline bin and server sampling interval in seconds")
+    ap.add_argument("--out", default=None, help="Output report JSON (default: stdout)")
+    args = ap.parse_args()
+
+    if args.data:
+        episodes = [e.to_dict() for e, _ in zip(iter_episodes(args.data), range(args.n))]
+    else:
+        episodes = [e.to_dict() for e in iter_generate(args.n, args.seed)]
+
+    proc = None
+    url = args.url
+    if url is None:
+        # make `kill`/`timeout` still run the cleanup below that stops the local server
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(143))
+        proc = start_server(args.port, args.server_args.split())
+        url = f"http://127.0.0.1:{args.port}"
+    client = Client(url, args.timeout)
+    rec = Recorder()
+    stop = threading.Event()
+    try:
+        wait_ready(client, proc)
+        t0 = time.perf_counter()
+        sampler = threading.Thread(target=sample_server, args=(client, rec, t0, args.interval, stop), daemon=True)
+        sampler.start()
+        wall = run_load(client, episodes, args.rate, args.concurrency, args.mode, args.poll_interval, rec)
+        stop.set()
+        sampler.join()
+    finally:
+        stop.set()
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    config = {"url": url, "server_args": args.server_args if proc is not None else None, "episodes": len(episodes),
+              "rate": args.rate, "concurrency": args.concurrency, "mode": args.mode}
+    out = report(rec, t0, wall, args.interval, config)
+    ep = out["requests"].get("episode", {})
+    lat = ep.get("latency", {})
+    print(f"[LOAD] {ep.get('requests', 0)} episodes in {wall:.2f}s: {ep.get('throughput_rps', 0):.1f} ep/s, "
+          f"p50 {lat.get('p50_ms', 0):.1f} ms, p95 {lat.get('p95_ms', 0):.1f} ms, p99 {lat.get('p99_ms', 0):.1f} ms, "
+          f"error rate {ep.get('error_rate', 0):.3f}", file=sys.stderr)
+    text = json.dumps(out, ensure_ascii=False, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"[OK] wrote load report to {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
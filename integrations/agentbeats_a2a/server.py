@@ -1,18 +1,24 @@
 from __future__ import annotations
 import argparse
 import json
+import os
+import signal
+import sys
 import threading
 import time
 import uuid
-from http.server import BaseHTTPRequestHandler, HTTPServer
-from typing import Any, Dict, Optional
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from archerisk_core.episode_schema import Episode
+from archerisk_core.episode_schema import Episode, EpisodeResult
 from archerisk_core.runner import simulate_episode
+from archerisk_core.trace import FULL_TRACE, TRACE_LEVELS, TracePolicy
 
-# In-memory task store (sufficient for local AgentBeats-style harness)
-TASKS: Dict[str, Dict[str, Any]] = {}
-LOCK = threading.Lock()
+if __package__:
+    from .task_store import TaskStore
+else:  # run as a script: python integrations/agentbeats_a2a/server.py
+    from task_store import TaskStore
 
 def agent_card(base_url: str) -> Dict[str, Any]:
     return {
@@ -21,7 +27,7 @@ def agent_card(base_url: str) -> Dict[str, Any]:
         "url": base_url + "/",
         "version": "0.4.0",
         "capabilities": {
-            "streaming": False,
+            "streaming": True,
             "pushNotifications": False,
         },
         "skills": [
@@ -29,17 +35,188 @@ def agent_card(base_url: str) -> Dict[str, Any]:
                 "name": "run_episode",
                 "description": "Runs one ArcheRisk-Core episode and returns an EpisodeResult artifact.",
                 "tags": ["benchmark", "security", "mas", "evaluation"]
+            },
+            {
+                "name": "run_episodes",
+                "description": "Runs a batch of ArcheRisk-Core episodes (data.episodes); message/stream "
+                               "returns EpisodeResult artifacts incrementally over server-sent events.",
+                "tags": ["benchmark", "security", "mas", "evaluation", "batch", "streaming"]
             }
         ]
     }
 
-def _make_task(task_id: str, state: str, artifact: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+def _make_task(task_id: str, state: str, artifact: Optional[Dict[str, Any]] = None,
+               message: Optional[str] = None) -> Dict[str, Any]:
+    status: Dict[str, Any] = {"state": state, "timestamp": time.time()}
+    if message:
+        status["message"] = message
     return {
         "id": task_id,
-        "status": {"state": state, "timestamp": time.time()},
+        "status": status,
         "artifacts": [artifact] if artifact else [],
     }
 
+def _result_artifact(res: EpisodeResult) -> Dict[str, Any]:
+    return {
+        "id": "episode_result",
+        "name": "EpisodeResult",
+        "parts": [{"kind": "data", "data": {"episode_result": res.to_dict()}}],
+    }
+
+def _results_artifact(results: List[EpisodeResult], index: int = 0) -> Dict[str, Any]:
+    return {
+        "id": f"episode_results_{index}",
+        "name": "EpisodeResults",
+        "parts": [{"kind": "data", "data": {"episode_results": [r.to_dict() for r in results]}}],
+    }
+
+def _episodes_from_params(params: Dict[str, Any]) -> Tuple[List[Episode], bool]:
+    # Extract Episode(s) from message parts (DataPart): {"episode": {...}} or a batch {"episodes": [...]}
+    msg = params.get("message", {}) or {}
+    parts = msg.get("parts", []) or []
+    for p in parts:
+        if p.get("kind") == "data":
+            data = p.get("data", {}) or {}
+            if "episodes" in data:
+                return [Episode(**e) for e in data["episodes"]], True
+            if "episode" in data:
+                return [Episode(**data["episode"])], False
+    raise ValueError("missing data.part.data.episode")
+
+def _run_batch(eps: List[Episode], trace_dir: str, policy: TracePolicy = FULL_TRACE) -> List[EpisodeResult]:
+    return [simulate_episode(ep, trace_dir, policy=policy) for ep in eps]
+
+def _iter_batch(srv: Any, eps: List[Episode]) -> Iterator[List[EpisodeResult]]:
+    # Pool-backed on A2AServer (may raise BusyError); sequential on the single-threaded server
+    chunk = getattr(srv, "batch_chunk", 64)
+    if isinstance(srv, A2AServer):
+        return srv.run_batch(eps, chunk)
+    trace_dir = getattr(srv, "trace_dir", "runs/traces_a2a")
+    policy = getattr(srv, "policy", FULL_TRACE)
+    return (_run_batch(eps[i:i + chunk], trace_dir, policy) for i in range(0, len(eps), chunk))
+
+def _rss_bytes() -> Optional[int]:
+    # resident set size of the server process (pool workers not included)
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def server_stats(srv: Any) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"tasks": srv.tasks.stats(), "rss_bytes": _rss_bytes()}
+    if isinstance(srv, A2AServer):
+        out["pending"] = srv.pending
+        out["max_pending"] = srv.max_pending
+    return out
+
+class BusyError(RuntimeError):
+    pass
+
+def _finished_task(task_id: str, fut: Future) -> Dict[str, Any]:
+    exc = fut.exception()
+    if exc is not None:
+        return _make_task(task_id, "failed", message=str(exc))
+    return _make_task(task_id, "completed", _result_artifact(fut.result()))
+
+class A2AServer(ThreadingHTTPServer):
+    """Threaded front end that runs episodes on a bounded worker pool.
+
+    Each connection gets its own thread, so slow requests do not block other clients;
+    simulations go to `executor` (threads or processes) and at most `max_pending` of them
+    may be queued or running at once, beyond which `message/send` answers "server busy".
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, addr: Any, executor: Optional[Executor], trace_dir: str, max_pending: int,
+                 batch_chunk: int = 64, tasks: Optional[TaskStore] = None, policy: TracePolicy = FULL_TRACE) -> None:
+        super().__init__(addr, Handler)
+        self.tasks = tasks if tasks is not None else TaskStore()
+        self.executor = executor
+        self.trace_dir = trace_dir
+        self.policy = policy
+        self.max_pending = max_pending
+        self.batch_chunk = batch_chunk
+        self.pending = 0
+        self.pending_lock = threading.Lock()
+
+    def _reserve(self, n: int) -> None:
+        with self.pending_lock:
+            if self.pending + n > self.max_pending:
+                raise BusyError(f"server busy: {self.pending} episodes in flight, "
+                                f"{n} more would exceed max_pending={self.max_pending}")
+            self.pending += n
+
+    def _release(self, n: int) -> None:
+        with self.pending_lock:
+            self.pending -= n
+
+    def submit(self, task_id: str, ep: Episode) -> Future:
+        self._reserve(1)
+        self.tasks.put(task_id, _make_task(task_id, "running"))
+        if self.executor is None:
+            fut: Future = Future()
+            try:
+                fut.set_result(simulate_episode(ep, out_trace_dir=self.trace_dir, policy=self.policy))
+            except Exception as e:
+                fut.set_exception(e)
+        else:
+            fut = self.executor.submit(simulate_episode, ep, self.trace_dir, policy=self.policy)
+        fut.add_done_callback(lambda f: self._finish(task_id, f))
+        return fut
+
+    def _finish(self, task_id: str, fut: Future) -> None:
+        self.tasks.put(task_id, _finished_task(task_id, fut))
+        self._release(1)
+
+    def run_batch(self, eps: List[Episode], chunk: int) -> "BatchRun":
+        return BatchRun(self, eps, chunk)
+
+class BatchRun:
+    """A batch submitted to the pool in chunks; iterating yields each chunk's results as it completes.
+
+    The batch's episodes count against `max_pending` from submission until their chunk is
+    consumed; `close` (also called on errors) cancels what has not started and releases the rest.
+    """
+
+    def __init__(self, srv: A2AServer, eps: List[Episode], chunk: int) -> None:
+        srv._reserve(len(eps))
+        self.srv = srv
+        self.held = len(eps)
+        self.chunks = [eps[i:i + chunk] for i in range(0, len(eps), chunk)]
+        self.futs: Dict[Future, int] = {}
+        if srv.executor is not None:
+            self.futs = {srv.executor.submit(_run_batch, c, srv.trace_dir, srv.policy): len(c) for c in self.chunks}
+            self._done = as_completed(list(self.futs))
+
+    def __iter__(self) -> "BatchRun":
+        return self
+
+    def __next__(self) -> List[EpisodeResult]:
+        try:
+            if self.srv.executor is None:
+                if not self.chunks:
+                    raise StopIteration
+                out = _run_batch(self.chunks.pop(0), self.srv.trace_dir, self.srv.policy)
+            else:
+                f = next(self._done)
+                self.futs.pop(f)
+                out = f.result()
+        except BaseException:
+            self.close()
+            raise
+        self.srv._release(len(out))
+        self.held -= len(out)
+        return out
+
+    def close(self) -> None:
+        for f in self.futs:
+            f.cancel()
+        self.futs = {}
+        self.srv._release(self.held)
+        self.held = 0
+
 class Handler(BaseHTTPRequestHandler):
     server_version = "ArcheRiskA2A/0.4"
 
@@ -51,11 +228,70 @@ class Handler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(body)
 
+    def _send_batch(self, task_id: str, eps: List[Episode], blocking: bool) -> Dict[str, Any]:
+        batches = _iter_batch(self.server, eps)
+        tasks = self.server.tasks
+        tasks.put(task_id, _make_task(task_id, "running"))
+
+        def collect() -> Dict[str, Any]:
+            try:
+                results = [r for b in batches for r in b]
+                task = _make_task(task_id, "completed", _results_artifact(results))
+            except Exception as e:
+                task = _make_task(task_id, "failed", message=str(e))
+            finally:
+                batches.close()
+            tasks.put(task_id, task)
+            return task
+
+        if blocking:
+            return collect()
+        threading.Thread(target=collect, daemon=True).start()
+        return _make_task(task_id, "running")
+
+    def _stream_batch(self, rpc_id: Any, task_id: str, eps: List[Episode]) -> None:
+        """Answer with server-sent events: the task, one artifact-update per finished chunk
+        of EpisodeResults, then a final status-update."""
+        batches = _iter_batch(self.server, eps)
+        try:
+            self._stream_events(rpc_id, task_id, len(eps), batches)
+        finally:
+            batches.close()
+
+    def _stream_events(self, rpc_id: Any, task_id: str, n: int, batches: Iterator[List[EpisodeResult]]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def emit(result: Dict[str, Any]) -> None:
+            self.wfile.write(b"data: " + json.dumps({"jsonrpc": "2.0", "id": rpc_id, "result": result}).encode("utf-8") + b"\n\n")
+            self.wfile.flush()
+
+        task = _make_task(task_id, "running")
+        self.server.tasks.put(task_id, task)
+        emit({**task, "kind": "task"})
+        results: List[EpisodeResult] = []
+        try:
+            for i, batch in enumerate(batches):
+                results.extend(batch)
+                emit({"kind": "artifact-update", "taskId": task_id, "artifact": _results_artifact(batch, i),
+                      "append": True, "lastChunk": len(results) == n})
+            task = _make_task(task_id, "completed", _results_artifact(results))
+        except Exception as e:
+            task = _make_task(task_id, "failed", message=str(e))
+        self.server.tasks.put(task_id, task)
+        emit({"kind": "status-update", "taskId": task_id, "status": task["status"], "final": True})
+
     def do_GET(self):
         if self.path == "/.well-known/agent.json":
             host = self.headers.get("Host", "localhost")
             base = f"http://{host}"
             return self._send(200, agent_card(base))
+        if self.path == "/stats":
+            return self._send(200, server_stats(self.server))
         return self._send(404, {"error": "not found"})
 
     def do_POST(self):
@@ -82,46 +318,42 @@ class Handler(BaseHTTPRequestHandler):
                 if not task_id:
                     task_id = str(uuid.uuid4())
 
-                # Extract Episode from message parts (DataPart)
-                msg = params.get("message", {}) or {}
-                parts = msg.get("parts", []) or []
-                ep_obj = None
-                for p in parts:
-                    if p.get("kind") == "data":
-                        data = p.get("data", {}) or {}
-                        if "episode" in data:
-                            ep_obj = data["episode"]
-                            break
-                if ep_obj is None:
-                    raise ValueError("missing data.part.data.episode")
-
-                ep = Episode(**ep_obj)
-
-                # Mark running
-                with LOCK:
-                    TASKS[task_id] = _make_task(task_id, "running")
-
-                # Run synchronously (AgentBeats style is usually sync here)
-                res = simulate_episode(ep, out_trace_dir="runs/traces_a2a")
-                artifact = {
-                    "id": "episode_result",
-                    "name": "EpisodeResult",
-                    "parts": [{"kind": "data", "data": {"episode_result": res.to_dict()}}],
-                }
-                task = _make_task(task_id, "completed", artifact)
-
-                with LOCK:
-                    TASKS[task_id] = task
+                eps, is_batch = _episodes_from_params(params)
+                # configuration.blocking=false returns the running task at once; poll tasks/get
+                cfg = params.get("configuration", {}) or {}
+                blocking = cfg.get("blocking", True)
+                srv = self.server
+
+                if is_batch:
+                    return self._send(200, {"jsonrpc": "2.0", "id": rpc_id, "result": self._send_batch(task_id, eps, blocking)})
+
+                ep = eps[0]
+                if isinstance(srv, A2AServer):
+                    fut = srv.submit(task_id, ep)
+                    # waiters wake before done callbacks run, so answer from the future itself
+                    task = _finished_task(task_id, fut) if blocking else _make_task(task_id, "running")
+                    return self._send(200, {"jsonrpc": "2.0", "id": rpc_id, "result": task})
+
+                # Single-threaded server: run synchronously in the handler
+                srv.tasks.put(task_id, _make_task(task_id, "running"))
+                res = simulate_episode(ep, out_trace_dir=getattr(srv, "trace_dir", "runs/traces_a2a"),
+                                       policy=getattr(srv, "policy", FULL_TRACE))
+                task = _make_task(task_id, "completed", _result_artifact(res))
+                srv.tasks.put(task_id, task)
 
                 resp = {"jsonrpc": "2.0", "id": rpc_id, "result": task}
                 return self._send(200, resp)
 
+            if method in ("message/stream", "tasks/sendSubscribe"):
+                t = params.get("task", {}) or {}
+                task_id = t.get("id") or str(uuid.uuid4())
+                return self._stream_batch(rpc_id, task_id, _episodes_from_params(params)[0])
+
             if method in ("tasks/get",):
                 task_id = params.get("id") or params.get("taskId")
                 if not task_id:
                     raise ValueError("missing task id")
-                with LOCK:
-                    task = TASKS.get(task_id)
+                task = self.server.tasks.get(task_id)
                 if not task:
                     raise ValueError("unknown task id")
                 resp = {"jsonrpc": "2.0", "id": rpc_id, "result": task}
@@ -131,6 +363,9 @@ class Handler(BaseHTTPRequestHandler):
             resp = {"jsonrpc": "2.0", "id": rpc_id, "error": {"code": -32601, "message": "Method not found"}}
             return self._send(200, resp)
 
+        except BusyError as e:
+            resp = {"jsonrpc": "2.0", "id": rpc_id, "error": {"code": -32000, "message": str(e)}}
+            return self._send(200, resp)
         except Exception as e:
             resp = {"jsonrpc": "2.0", "id": rpc_id, "error": {"code": -32602, "message": str(e)}}
             return self._send(200, resp)
@@ -139,12 +374,48 @@ def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--host", default="127.0.0.1")
     ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--mode", choices=["threaded", "single"], default="threaded",
+                    help="threaded: concurrent front end + worker pool; single: one request at a time")
+    ap.add_argument("--pool", choices=["process", "thread"], default="process",
+                    help="Worker pool running simulate_episode (threaded mode)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="Pool size; 0 runs episodes in the request thread")
+    ap.add_argument("--max_pending", type=int, default=4096, help="Episodes queued or running before requests are refused")
+    ap.add_argument("--trace_dir", default="runs/traces_a2a")
+    ap.add_argument("--trace", choices=TRACE_LEVELS, default="full",
+                    help="Trace policy: off | summary (counters) | failures | sample (see --trace_rate) | full")
+    ap.add_argument("--trace_rate", type=float, default=0.01, help="Fraction of episodes traced with --trace sample")
+    ap.add_argument("--batch_chunk", type=int, default=64, help="Episodes per pool task (and per streamed artifact) in batches")
+    ap.add_argument("--max_tasks", type=int, default=100_000, help="Tasks kept in memory before the least recently used are evicted")
+    ap.add_argument("--task_ttl", type=float, default=0, help="Seconds after which tasks expire (0: never)")
+    ap.add_argument("--task_db", default=None, help="SQLite file persisting finished tasks across evictions and restarts")
+    ap.add_argument("--task_stripes", type=int, default=16, help="Independently locked partitions of the task store")
     args = ap.parse_args()
 
-    srv = HTTPServer((args.host, args.port), Handler)
-    print(f"[A2A] ArcheRisk-Core server on http://{args.host}:{args.port}/")
+    tasks = TaskStore(args.max_tasks, args.task_ttl, args.task_stripes, args.task_db)
+    policy = TracePolicy(args.trace, args.trace_rate)
+    if args.mode == "single":
+        srv = HTTPServer((args.host, args.port), Handler)
+        srv.trace_dir = args.trace_dir
+        srv.batch_chunk = args.batch_chunk
+        srv.tasks = tasks
+        srv.policy = policy
+    else:
+        executor: Optional[Executor] = None
+        if args.workers > 0:
+            executor = (ProcessPoolExecutor if args.pool == "process" else ThreadPoolExecutor)(max_workers=args.workers)
+        srv = A2AServer((args.host, args.port), executor, args.trace_dir, args.max_pending, args.batch_chunk, tasks,
+                        policy)
+    print(f"[A2A] ArcheRisk-Core server on http://{args.host}:{args.port}/ ({args.mode})")
     print(f"[A2A] agent card: http://{args.host}:{args.port}/.well-known/agent.json")
-    srv.serve_forever()
+    # on SIGTERM, unwind through the finally below so pool workers are shut down too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        srv.serve_forever()
+    finally:
+        if isinstance(srv, A2AServer) and srv.executor is not None:
+            srv.executor.shutdown(cancel_futures=True)
+        tasks.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,164 @@
+from __future__ import annotations
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+TERMINAL_STATES = ("completed", "failed", "canceled")
+
+def _finished(task: Dict[str, Any]) -> bool:
+    return task.get("status", {}).get("state") in TERMINAL_STATES
+
+class _Stripe:
+    __slots__ = ("lock", "items", "nbytes", "evictions", "expirations")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # task id -> (stored at, task, approximate size in bytes), least recently used first
+        self.items: "OrderedDict[str, Tuple[float, Dict[str, Any], int]]" = OrderedDict()
+        self.nbytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+class TaskStore:
+    """Bounded task table for the A2A server.
+
+    Tasks live in `stripes` independently locked LRU dicts (keyed by hash of the task id), so
+    concurrent requests rarely contend and every lookup is O(1). Each stripe holds at most
+    `max_tasks / stripes` tasks; the least recently used finished tasks are evicted first, and
+    finished tasks older than `ttl` seconds (if set) expire. Running tasks are never dropped (they
+    are not on disk yet), so a stripe only exceeds its share when more than that are in flight. With `db_path`, completed and failed
+    tasks are also written to a local SQLite file: evicted tasks stay retrievable from disk and
+    survive a restart.
+    """
+
+    def __init__(self, max_tasks: int = 100_000, ttl: Optional[float] = None, stripes: int = 16,
+                 db_path: Optional[str] = None) -> None:
+        self.stripes = [_Stripe() for _ in range(max(1, stripes))]
+        self.per_stripe = max(1, -(-max_tasks // len(self.stripes)))
+        self.max_tasks = max_tasks
+        self.ttl = ttl or None
+        self.db_path = db_path
+        self.db: Optional[sqlite3.Connection] = None
+        self.db_lock = threading.Lock()
+        self.db_writes = 0
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS tasks (id TEXT PRIMARY KEY, updated REAL NOT NULL, task TEXT NOT NULL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS tasks_updated ON tasks (updated)")
+            self._purge_db()
+
+    def _stripe(self, task_id: str) -> _Stripe:
+        return self.stripes[hash(task_id) % len(self.stripes)]
+
+    def _expired(self, stored: float, now: float) -> bool:
+        return self.ttl is not None and now - stored > self.ttl
+
+    def put(self, task_id: str, task: Dict[str, Any]) -> None:
+        raw = json.dumps(task)
+        now = time.time()
+        s = self._stripe(task_id)
+        with s.lock:
+            old = s.items.pop(task_id, None)
+            if old is not None:
+                s.nbytes -= old[2]
+            s.items[task_id] = (now, task, len(raw))
+            s.nbytes += len(raw)
+            excess = len(s.items) - self.per_stripe
+            dead: List[str] = []
+            for k, (stored, t, _) in s.items.items():
+                if not _finished(t):
+                    continue  # in flight and not on disk yet: dropping it would lose the task
+                if excess > 0:
+                    s.evictions += 1
+                    excess -= 1
+                elif self._expired(stored, now):
+                    s.expirations += 1
+                else:
+                    break
+                dead.append(k)
+            for k in dead:
+                s.nbytes -= s.items.pop(k)[2]
+        if self.db is not None and _finished(task):
+            self._write_db(task_id, now, raw)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        s = self._stripe(task_id)
+        with s.lock:
+            hit = s.items.get(task_id)
+            if hit is not None:
+                if not (self._expired(hit[0], now) and _finished(hit[1])):
+                    s.items.move_to_end(task_id)
+                    return hit[1]
+                del s.items[task_id]
+                s.nbytes -= hit[2]
+                s.expirations += 1
+        if self.db is None:
+            return None
+        with self.db_lock:
+            row = self.db.execute("SELECT updated, task FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None or self._expired(row[0], now):
+            return None
+        # served from disk; not promoted back into memory so lookups of old tasks cannot flush hot ones
+        return json.loads(row[1])
+
+    def __len__(self) -> int:
+        return sum(len(s.items) for s in self.stripes)
+
+    def _write_db(self, task_id: str, now: float, raw: str) -> None:
+        with self.db_lock:
+            self.db.execute("INSERT OR REPLACE INTO tasks (id, updated, task) VALUES (?, ?, ?)", (task_id, now, raw))
+            self.db_writes += 1
+            if self.ttl is not None and self.db_writes % 1000 == 0:
+                self._purge_db()
+
+    def _purge_db(self) -> None:
+        if self.ttl is not None:
+            self.db.execute("DELETE FROM tasks WHERE updated < ?", (time.time() - self.ttl,))
+
+    def sweep(self) -> int:
+        """Drop every expired task from memory now (expiry is otherwise lazy); returns how many."""
+        if self.ttl is None:
+            return 0
+        now = time.time()
+        n = 0
+        for s in self.stripes:
+            with s.lock:
+                dead: List[str] = [k for k, (stored, t, _) in s.items.items()
+                                   if self._expired(stored, now) and _finished(t)]
+                for k in dead:
+                    s.nbytes -= s.items.pop(k)[2]
+                s.expirations += len(dead)
+                n += len(dead)
+        if self.db is not None:
+            with self.db_lock:
+                self._purge_db()
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "tasks": 0, "bytes": 0, "evictions": 0, "expirations": 0,
+            "max_tasks": self.max_tasks, "ttl": self.ttl, "stripes": len(self.stripes),
+        }
+        for s in self.stripes:
+            with s.lock:
+                out["tasks"] += len(s.items)
+                out["bytes"] += s.nbytes
+                out["evictions"] += s.evictions
+                out["expirations"] += s.expirations
+        if self.db is not None:
+            with self.db_lock:
+                out["db"] = {"path": self.db_path, "tasks": self.db.execute("SELECT COUNT(*) FROM tasks").fetchone()[0],
+                             "writes": self.db_writes}
+        return out
+
+    def close(self) -> None:
+        if self.db is not None:
+            with self.db_lock:
+                self.db.close()
+            self.db = None
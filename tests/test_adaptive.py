@@ -0,0 +1,16 @@
+from archerisk_core.adaptive import AdaptiveSampler, iter_adaptive
+from archerisk_core.parallel import RunStats
+from archerisk_core.trace import TracePolicy
+
+def _run(workers, stats=None):
+    sampler = AdaptiveSampler(seed=7, target=0.2, min_per_cell=4, budget=3000)
+    pairs = list(iter_adaptive(sampler, trace_dir="", workers=workers, chunk_size=64,
+                               policy=TracePolicy("off"), stats=stats))
+    return sampler, [r.to_dict() for _, r in pairs]
+
+def test_rounds_share_one_pool():
+    stats = RunStats()
+    sampler, results = _run(2, stats)
+    assert sampler.rounds > 1
+    assert len(stats.workers) <= 2  # the same two worker processes served every round
+    assert results == _run(1)[1]
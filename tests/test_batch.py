@@ -0,0 +1,30 @@
+import dataclasses
+
+import pytest
+
+from archerisk_core import batch
+from archerisk_core.dataset_generate import iter_generate
+
+@pytest.fixture(scope="module")
+def episodes():
+    return list(iter_generate(target_n=400, seed=7))
+
+def test_batch_matches_reference(episodes):
+    assert batch.check_against_reference(episodes, reps=25, seed=7) == []
+
+def test_pooled_check_catches_small_shift(episodes, monkeypatch):
+    # a 5-point shift in every cell is too small for the per-cell test at this size (~20 episodes per cell)
+    tables = batch.cell_tables
+
+    def shifted(params=batch.DEFAULT_PARAMS):
+        t = tables(params)
+        return dataclasses.replace(t, p_attack=(t.p_attack + 0.05).clip(0, 1))
+
+    monkeypatch.setattr(batch, "cell_tables", shifted)
+    failures = batch.check_against_reference(episodes, reps=25, seed=7)
+    assert [(f["cell"], f["metric"]) for f in failures if f["cell"] == ("all",)][:1] == [(("all",), "attack_success")]
+
+def test_check_writes_no_traces(episodes, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    batch.check_against_reference(episodes[:50], reps=2, seed=7)
+    assert list(tmp_path.iterdir()) == []
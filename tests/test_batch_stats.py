@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from archerisk_core.batch_stats import benjamini_hochberg, holm
+
+# the 15 p-values of Benjamini & Hochberg (1995), section 4.1
+BH95 = [0.0001, 0.0004, 0.0019, 0.0095, 0.0201, 0.0278, 0.0298, 0.0344, 0.0459,
+        0.3240, 0.4262, 0.5719, 0.6528, 0.7590, 1.0000]
+
+def test_known_small_vector():
+    p = [0.01, 0.04, 0.03, 0.005]
+    assert holm(p) == pytest.approx([0.03, 0.06, 0.06, 0.02])
+    assert benjamini_hochberg(p) == pytest.approx([0.02, 0.04, 0.04, 0.02])
+
+def test_bh95_rejections():
+    # at level 0.05, Holm rejects the three smallest hypotheses and BH the four smallest
+    assert np.flatnonzero(holm(BH95) <= 0.05).tolist() == [0, 1, 2]
+    assert np.flatnonzero(benjamini_hochberg(BH95) <= 0.05).tolist() == [0, 1, 2, 3]
+    assert holm(BH95)[:4] == pytest.approx([0.0015, 0.0056, 0.0247, 0.114])
+    assert benjamini_hochberg(BH95)[:4] == pytest.approx([0.0015, 0.003, 0.0095, 0.035625])
+
+def test_ties_clipping_and_empty():
+    assert holm([0.02, 0.02, 0.5]).tolist() == pytest.approx([0.06, 0.06, 0.5])
+    assert benjamini_hochberg([0.02, 0.02, 0.5]).tolist() == pytest.approx([0.03, 0.03, 0.5])
+    assert holm([0.6, 0.7]).tolist() == [1.0, 1.0]
+    assert benjamini_hochberg([0.9, 1.0]).tolist() == [1.0, 1.0]
+    assert holm([]).size == benjamini_hochberg([]).size == 0
+
+def _reference(p, method):
+    # the textbook definitions, one adjusted value at a time
+    m = len(p)
+    s = sorted(p)
+    rank = {i: r for r, i in enumerate(sorted(range(m), key=lambda i: p[i]))}
+    if method == "holm":
+        return [max(min(1.0, (m - j) * s[j]) for j in range(rank[i] + 1)) for i in range(m)]
+    return [min(min(1.0, m * s[j] / (j + 1)) for j in range(rank[i], m)) for i in range(m)]
+
+@pytest.mark.parametrize("m", [1, 2, 7, 50])
+def test_matches_textbook_definition(m):
+    p = np.random.default_rng(m).random(m) ** 3
+    assert holm(p) == pytest.approx(_reference(list(p), "holm"))
+    assert benjamini_hochberg(p) == pytest.approx(_reference(list(p), "bh"))
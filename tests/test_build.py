@@ -0,0 +1,49 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from archerisk_core import build
+
+ARGS = ["--target_n", "300", "--no_plot", "--latex_dir", "tables", "--state", "runs/build_state.json"]
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def test_rebuild_skips_unchanged_steps(workdir, capsys):
+    build.main(ARGS)
+    capsys.readouterr()
+    build.main(ARGS)
+    assert "[OK] built 0 steps, 5 up to date" in capsys.readouterr().out
+
+def test_missing_trace_reruns_results(workdir, capsys):
+    build.main(ARGS)
+    os.remove(os.path.join("runs/traces", sorted(os.listdir("runs/traces"))[0]))
+    capsys.readouterr()
+    build.main(ARGS)
+    out = capsys.readouterr().out
+    assert "[BUILD] results: built" in out
+    assert "[BUILD] tab_asr_defended: up to date" in out  # the rerun reproduces the same summary
+
+def test_cache_is_trimmed(workdir):
+    build.main(ARGS + ["--cache", "runs/c.sqlite", "--cache_max_entries", "50"])
+    with sqlite3.connect("runs/c.sqlite") as db:
+        assert db.execute("select count(*) from results").fetchone() == (50,)
+
+def test_rerun_clears_stale_traces(workdir):
+    build.main(ARGS)
+    open("runs/traces/ep_stale.json", "w").close()
+    os.makedirs("runs/traces/notes")
+    build.main(ARGS + ["--target_n", "200"])
+    assert not os.path.exists("runs/traces/ep_stale.json")
+    assert len([n for n in os.listdir("runs/traces") if n.endswith(".json")]) == 200
+    assert os.path.isdir("runs/traces/notes")  # subdirectories are neither cleared nor a checksum error
+
+def test_pool_steps_are_profiled(workdir):
+    build.main(ARGS + ["--profile_out", "prof.json"])
+    with open("prof.json", encoding="utf-8") as f:
+        stages = json.load(f)["stages"]
+    assert {"build.results", "build.tab_asr_defended"} <= set(stages)
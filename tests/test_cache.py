@@ -0,0 +1,54 @@
+import os
+import shutil
+
+from archerisk_core import cache as cache_mod
+from archerisk_core.cache import SIM_SOURCES, ResultCache, simulator_fingerprint
+from archerisk_core.dataset_generate import generate
+from archerisk_core.parallel import RunStats, run_episodes
+from archerisk_core.trace import FULL_TRACE, TracePolicy
+
+def _run(eps, trace_dir, cache_path, trace_store="files", policy=FULL_TRACE):
+    stats = RunStats()
+    rows = [r.to_dict() for r in run_episodes(eps, trace_dir, cache=cache_path, stats=stats,
+                                              trace_store=trace_store, policy=policy)]
+    return rows, stats
+
+def test_hit_with_deleted_trace_is_a_miss(tmp_path):
+    eps = generate(12, seed=3)
+    traces, db = str(tmp_path / "traces"), str(tmp_path / "cache.sqlite")
+    first, _ = _run(eps, traces, db)
+    gone = first[0]["trace_path"]
+    os.remove(gone)
+    again, stats = _run(eps, traces, db)
+    assert again == first
+    assert (stats.cache_hits, stats.cache_misses) == (len(eps) - 1, 1)
+    assert os.path.exists(gone)
+
+def test_hit_with_deleted_shard_is_a_miss(tmp_path):
+    eps = generate(12, seed=3)
+    traces, db = str(tmp_path / "store"), str(tmp_path / "cache.sqlite")
+    first, _ = _run(eps, traces, db, "sharded")
+    for name in os.listdir(traces):
+        os.remove(os.path.join(traces, name))
+    _, stats = _run(eps, traces, db, "sharded")
+    assert (stats.cache_hits, stats.cache_misses) == (0, len(eps))
+
+def test_editing_a_simulator_source_invalidates_the_cache(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    for name in SIM_SOURCES:
+        shutil.copy(os.path.join(cache_mod.PACKAGE_DIR, name), src / name)
+    monkeypatch.setattr(cache_mod, "simulator_fingerprint", lambda: simulator_fingerprint(str(src)))
+    eps = generate(12, seed=3)
+    db = str(tmp_path / "cache.sqlite")
+
+    _run(eps, "", db, policy=TracePolicy("off"))
+    _, stats = _run(eps, "", db, policy=TracePolicy("off"))
+    assert stats.cache_misses == 0
+
+    with open(src / "params.py", "a", encoding="utf-8") as f:
+        f.write("\n# retuned\n")
+    simulator_fingerprint.cache_clear()
+    _, stats = _run(eps, "", db, policy=TracePolicy("off"))
+    assert (stats.cache_hits, stats.cache_misses) == (0, len(eps))
+    assert len(ResultCache(db)) == 2 * len(eps)
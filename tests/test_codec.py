@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from archerisk_core import codec
+from archerisk_core.dataset_generate import iter_generate
+from archerisk_core.episode_schema import EpisodeResult
+from archerisk_core.episode_store import iter_episodes, write_episodes
+
+@pytest.fixture(scope="module")
+def episodes():
+    return list(iter_generate(target_n=300, seed=7))
+
+def _result(ep, i):
+    return EpisodeResult(episode_id=ep.episode_id, seed=ep.seed, task_family=ep.task_family, task_id=ep.task_id,
+                         topology_family=ep.topology_family, topology_mode=ep.topology_mode,
+                         defense_baseline=ep.defense_baseline, attack_archetype=ep.attack_archetype,
+                         task_success=i % 2 == 0, attack_success=i % 3 == 0, leak=i % 5 == 0,
+                         unauthorized_write=i % 7 == 0, trace_path=f"runs/traces/{ep.episode_id}.json")
+
+def test_encoders_match_json_dumps(episodes):
+    for i, ep in enumerate(episodes):
+        assert codec.encode_episode(ep) == json.dumps(ep.to_dict(), ensure_ascii=False) + "\n"
+        r = _result(ep, i)
+        assert codec.encode_result(r) == json.dumps(r.to_dict(), ensure_ascii=False) + "\n"
+
+@pytest.mark.parametrize("fmt", ["jsonl", "dict"])
+def test_formats_round_trip(episodes, tmp_path, fmt):
+    path = str(tmp_path / f"eps.{fmt}")
+    write_episodes(path, episodes, fmt)
+    back = list(iter_episodes(path))
+    assert [codec.encode_episode(e) for e in back] == [codec.encode_episode(e) for e in episodes]
+
+def _write_dict_file(tmp_path, episodes):
+    path = tmp_path / "eps.dict"
+    write_episodes(str(path), episodes, "dict")
+    return path, path.read_text(encoding="utf-8").splitlines(keepends=True)
+
+def test_dict_format_skips_blank_lines(episodes, tmp_path):
+    path, lines = _write_dict_file(tmp_path, episodes[:20])
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+    assert len(list(iter_episodes(str(path)))) == 20
+
+@pytest.mark.parametrize("mutate, message", [
+    (lambda d: d.update(seed=True), "seed: expected int"),
+    (lambda d: d.update(seed="7"), "seed: expected int"),
+    (lambda d: d.update(task_family="poetry"), "task_family: invalid value"),
+    (lambda d: d.update(protected_paths=[1]), "protected_paths"),
+    (lambda d: d.update(secret=None), "secret: expected str"),
+    (lambda d: d.__setitem__("question", d.pop("prompt")), "exactly the fields"),
+])
+def test_jsonl_rejects_malformed_rows(episodes, tmp_path, mutate, message):
+    row = episodes[0].to_dict()
+    mutate(row)
+    path = tmp_path / "bad.jsonl"
+    path.write_text(json.dumps(row) + "\n", encoding="utf-8")
+    with pytest.raises(codec.SchemaError, match=message):
+        list(iter_episodes(str(path)))
+
+@pytest.mark.parametrize("edit, message", [
+    (lambda h, lines: [h.replace('"prompt"', '"question"')] + lines, "do not match"),
+    (lambda h, lines: [h] + [line.replace('"arithmetic_check"', '"poetry"') for line in lines], "invalid value"),
+    (lambda h, lines: [h] + [line.replace('["ep_000000", 7,', '["ep_000000", true,') for line in lines], "seed"),
+    (lambda h, lines: [h] + lines + ['["ep_999999", 7, 0]\n'], "values"),
+    (lambda h, lines: [h] + lines + ['["ep_999999", 7' + ", 999" * 11 + "]\n"], "undefined dictionary entries"),
+    (lambda h, lines: [h] + lines + ["garbage\n"], "expected a dictionary entry or a row"),
+])
+def test_dict_format_rejects_malformed_files(episodes, tmp_path, edit, message):
+    path, lines = _write_dict_file(tmp_path, episodes[:20])
+    path.write_text("".join(edit(lines[0], lines[1:])), encoding="utf-8")
+    with pytest.raises(codec.SchemaError, match=message):
+        list(iter_episodes(str(path)))
+
+def test_result_rows_reject_bad_flags(episodes, tmp_path):
+    row = _result(episodes[0], 0).to_dict()
+    row["leak"] = 1
+    path = tmp_path / "results.jsonl"
+    path.write_text(json.dumps(row) + "\n", encoding="utf-8")
+    rows = list(codec.iter_result_rows(str(path)))  # decoding checks factors only
+    with pytest.raises(codec.SchemaError, match="leak: expected bool"):
+        codec.validate_batch(rows, rows=True, flags=True)
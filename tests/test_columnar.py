@@ -0,0 +1,41 @@
+import filecmp
+
+from archerisk_core import columnar
+from archerisk_core.aggregate import StreamingAggregator
+from archerisk_core.columnar import ColumnarWriter, iter_results, write_results
+from archerisk_core.dataset_generate import generate
+from archerisk_core.parallel import run_episodes
+from archerisk_core.shard import checksum
+from archerisk_core.trace import TracePolicy
+
+def _results(tmp_path, n=300):
+    # a sampled trace policy mixes empty and non-empty trace_path strings
+    rows = [r.to_dict() for r in run_episodes(generate(n, seed=11), str(tmp_path / "traces"),
+                                              policy=TracePolicy("failures"))]
+    assert any(r["trace_path"] for r in rows) and not all(r["trace_path"] for r in rows)
+    return rows
+
+def test_jsonl_columnar_jsonl_is_byte_identical(tmp_path):
+    src, col, back = tmp_path / "r.jsonl", str(tmp_path / "r.col"), tmp_path / "back.jsonl"
+    rows = _results(tmp_path)
+    write_results(str(src), rows)
+    assert write_results(col, iter_results(str(src)), "columnar") == len(rows)
+    assert list(iter_results(col)) == rows
+    write_results(str(back), iter_results(col))
+    assert filecmp.cmp(src, back, shallow=False)
+
+def test_layout_does_not_depend_on_buffering(tmp_path):
+    rows = _results(tmp_path)
+    for name, buffer_rows in (("one", 1 << 16), ("many", 7)):
+        with ColumnarWriter(str(tmp_path / name), buffer_rows=buffer_rows) as w:
+            w.write_many(rows)
+    assert checksum(str(tmp_path / "one")) == checksum(str(tmp_path / "many"))
+    assert columnar.read_meta(str(tmp_path / "many"))["n"] == len(rows)
+
+def test_summary_matches_across_formats(tmp_path):
+    rows = _results(tmp_path)
+    write_results(str(tmp_path / "r.jsonl"), rows)
+    write_results(str(tmp_path / "r.col"), rows, "columnar")
+    a = StreamingAggregator().update_path(str(tmp_path / "r.jsonl")).summary()
+    b = StreamingAggregator().update_path(str(tmp_path / "r.col")).summary()
+    assert a == b
@@ -0,0 +1,28 @@
+import random
+
+import pytest
+
+from archerisk_core import dataset_generate, expected
+from archerisk_core.agents import solve_task
+
+@pytest.mark.parametrize("family", dataset_generate.TASK_FAMILIES)
+def test_solve_rate_matches_real_generators(family):
+    rng = random.Random(7)
+    n = 2000
+    solved = 0
+    for _ in range(n):
+        _, prompt, gt = dataset_generate._make_task(rng, family)
+        out = solve_task(prompt).strip()
+        solved += out == gt.strip() if family == "arithmetic_check" else out.upper().startswith(gt.strip().upper())
+    assert abs(solved / n - expected.task_solve_rate(family)) < 0.05
+
+@pytest.mark.parametrize("draw", [lambda rng: rng.random() < 0.3, lambda rng: rng.choice("ab"),
+                                  lambda rng: rng.random() * 2])
+def test_unmodelled_draws_raise(draw, monkeypatch):
+    monkeypatch.setattr(dataset_generate, "gen_file_task", lambda rng: ("t", "p", str(draw(rng))))
+    expected.task_solve_rate.cache_clear()
+    try:
+        with pytest.raises(TypeError):
+            expected.task_solve_rate("file_triage")
+    finally:
+        expected.task_solve_rate.cache_clear()
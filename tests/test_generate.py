@@ -0,0 +1,38 @@
+import filecmp
+
+import pytest
+
+from archerisk_core import dataset_generate
+from archerisk_core.dataset_generate import (CORE_REPLICATES, IndexedRange, episode_at, generate, iter_cells,
+                                             iter_scheme)
+
+FACTORS = ("task_family", "topology_family", "topology_mode", "defense_baseline", "attack_archetype")
+N = 2000  # past the 1800-episode factorial core, into the random top-up
+
+def _factors(ep):
+    return tuple(getattr(ep, f) for f in FACTORS)
+
+def test_episode_at_is_the_ith_indexed_episode():
+    full = list(iter_scheme("indexed", N, seed=7))
+    assert [e.episode_id for e in full] == [f"ep_{i:06d}" for i in range(N)]
+    for i in (0, 1, 359, 360, 1799, 1800, 1999):
+        assert episode_at(7, i) == full[i]
+    assert [e for r in IndexedRange(7, 0, N).split(300) for e in r] == full
+
+def test_indexed_scheme_keeps_the_sequential_design():
+    # per-episode generators change the task draws, not the factorial layout, ids or seeds
+    seq, ind = generate(N, seed=7), list(iter_scheme("indexed", N, seed=7))
+    core = CORE_REPLICATES * len(list(iter_cells()))
+    assert [_factors(e) for e in seq[:core]] == [_factors(e) for e in ind[:core]]
+    assert [(e.episode_id, e.seed) for e in seq] == [(e.episode_id, e.seed) for e in ind]
+
+@pytest.mark.parametrize("scheme", ["sequential", "indexed"])
+def test_shards_concatenate_to_the_full_dataset(tmp_path, scheme):
+    base = ["--target_n", "500", "--seed", "3", "--scheme", scheme]
+    dataset_generate.main(["--out", str(tmp_path / "full.jsonl"), *base])
+    for k in range(3):
+        dataset_generate.main(["--out", str(tmp_path / f"d{k}.jsonl"), *base, "--shard", f"{k}/3"])
+    with open(tmp_path / "joined.jsonl", "wb") as out:
+        for k in range(3):
+            out.write((tmp_path / f"d{k}.jsonl").read_bytes())
+    assert filecmp.cmp(tmp_path / "full.jsonl", tmp_path / "joined.jsonl", shallow=False)
@@ -0,0 +1,70 @@
+import filecmp
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from archerisk_core import runner
+from archerisk_core.dataset_generate import generate
+from archerisk_core.episode_store import iter_episodes, write_episodes
+from archerisk_core.parallel import run_to_file
+from archerisk_core.trace import TracePolicy
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _args(src, out, *extra):
+    return [*src, "--out", str(out), "--trace", "off", "--commit_every", "100", *extra]
+
+def test_interrupted_run_resumes_to_identical_output(tmp_path):
+    data = str(tmp_path / "data.jsonl")
+    write_episodes(data, generate(1000, seed=7))
+    runner.main(_args(["--data", data], tmp_path / "straight.jsonl"))
+
+    class Killed(Exception):
+        pass
+
+    def dying(results):
+        for i, r in enumerate(results):
+            if i == 450:
+                raise Killed
+            yield r
+
+    out = tmp_path / "resumed.jsonl"
+    with pytest.raises(Killed):
+        run_to_file(iter_episodes(data), str(out), source=os.path.abspath(data), commit_every=100, tap=dying,
+                    trace_dir="", policy=TracePolicy("off"))
+    with open(str(out) + ".progress.json", encoding="utf-8") as f:
+        assert 0 < json.load(f)["n_done"] < 1000  # killed past a commit, with uncommitted rows after it
+    runner.main(_args(["--data", data], out, "--resume", "--workers", "2", "--chunk_size", "64"))
+    assert filecmp.cmp(tmp_path / "straight.jsonl", out, shallow=False)
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="needs SIGKILL")
+def test_killed_process_resumes_to_identical_output(tmp_path):
+    src = ["--generate", "20000", "--seed", "3"]
+    out = tmp_path / "resumed.jsonl"
+    progress = str(out) + ".progress.json"
+    env = {**os.environ, "PYTHONPATH": REPO}
+    proc = subprocess.Popen([sys.executable, "-m", "archerisk_core.runner", *_args(src, out)], env=env,
+                            stdout=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    try:
+        while time.time() < deadline:
+            if os.path.exists(progress):
+                with open(progress, encoding="utf-8") as f:
+                    if json.load(f)["n_done"] >= 300:
+                        break
+            time.sleep(0.01)
+    finally:
+        proc.send_signal(signal.SIGKILL)
+        proc.wait()
+    with open(progress, encoding="utf-8") as f:
+        m = json.load(f)
+    if m["complete"]:
+        pytest.skip("the run finished before it could be killed")
+    runner.main(_args(src, out, "--resume"))
+    runner.main(_args(src, tmp_path / "straight.jsonl"))
+    assert filecmp.cmp(tmp_path / "straight.jsonl", out, shallow=False)
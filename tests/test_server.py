@@ -0,0 +1,42 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from archerisk_core.dataset_generate import iter_generate
+from archerisk_core.trace import TracePolicy
+from integrations.agentbeats_a2a.server import A2AServer
+
+@pytest.fixture
+def serve(tmp_path):
+    servers = []
+
+    def start(policy):
+        srv = A2AServer(("127.0.0.1", 0), None, str(tmp_path / "traces"), max_pending=64, policy=policy)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servers.append(srv)
+        return srv
+
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+def _send(srv, ep):
+    conn = http.client.HTTPConnection(*srv.server_address, timeout=30)
+    body = {"jsonrpc": "2.0", "id": 1, "method": "message/send",
+            "params": {"message": {"parts": [{"kind": "data", "data": {"episode": ep.to_dict()}}]}}}
+    conn.request("POST", "/", json.dumps(body), {"Content-Type": "application/json"})
+    out = json.loads(conn.getresponse().read())
+    conn.close()
+    return out["result"]["artifacts"][0]["parts"][0]["data"]["episode_result"]
+
+@pytest.mark.parametrize("level, traced", [("off", False), ("full", True)])
+def test_trace_policy(serve, tmp_path, level, traced):
+    srv = serve(TracePolicy(level))
+    ep = next(iter_generate(target_n=1, seed=7))
+    res = _send(srv, ep)
+    assert res["episode_id"] == ep.episode_id
+    assert bool(res["trace_path"]) == traced
+    assert (tmp_path / "traces").exists() == traced
@@ -0,0 +1,61 @@
+import glob
+import os
+
+import pytest
+
+from archerisk_core import aggregate, dataset_generate, runner, shard
+
+N = 200
+
+def _run_shards(n_shards, prefix=""):
+    for k in range(n_shards):
+        s = f"{k}/{n_shards}"
+        dataset_generate.main(["--out", f"data/{prefix}d{k}.jsonl", "--target_n", str(N), "--seed", "7", "--shard", s])
+        runner.main(["--data", f"data/{prefix}d{k}.jsonl", "--out", f"runs/{prefix}r{k}.jsonl", "--trace", "off",
+                     "--shard", s])
+        aggregate.main(["--in", f"runs/{prefix}r{k}.jsonl", "--out", f"runs/{prefix}s{k}.json",
+                        "--state_out", f"runs/{prefix}state{k}.json", "--latex_dir", "tables", "--shard", s])
+
+def _glob(pattern):
+    return sorted(glob.glob(pattern))  # as the shell expands it
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def test_readme_merge_matches_single_node(workdir):
+    _run_shards(4)
+    # the README command: `runs/state*.json` also matches the runs/stateK.json.shard.json manifests
+    shard.main(["--results", *_glob("runs/r*.jsonl"), "--states", *_glob("runs/state*.json"),
+                "--results_out", "merged/results.jsonl", "--out", "merged/summary.json",
+                "--latex_dir", "merged/tables"])
+
+    dataset_generate.main(["--out", "data/full.jsonl", "--target_n", str(N), "--seed", "7"])
+    runner.main(["--data", "data/full.jsonl", "--out", "single/results.jsonl", "--trace", "off"])
+    aggregate.main(["--in", "single/results.jsonl", "--out", "single/summary.json", "--latex_dir", "single/tables"])
+
+    assert _read("merged/results.jsonl") == _read("single/results.jsonl")
+    assert _read("merged/summary.json") == _read("single/summary.json")
+    for name in os.listdir("single/tables"):
+        assert _read(f"merged/tables/{name}") == _read(f"single/tables/{name}")
+
+def test_merge_rejects_states_of_a_different_split(workdir, capsys):
+    _run_shards(4)
+    _run_shards(2, prefix="h")
+    with pytest.raises(SystemExit) as exc:
+        shard.main(["--results", *_glob("runs/r?.jsonl"), "--states", *_glob("runs/hstate?.json"), "--check"])
+    assert exc.value.code == 1
+    assert "[FAIL] aggregate: states cover shards" in capsys.readouterr().out
+
+def test_merge_reports_missing_shard(workdir, capsys):
+    _run_shards(4)
+    os.remove("runs/r2.jsonl.shard.json")
+    os.remove("runs/r2.jsonl")
+    with pytest.raises(SystemExit):
+        shard.main(["--results", *_glob("runs/r?.jsonl"), "--check"])
+    assert "shard 2/4: missing" in capsys.readouterr().out
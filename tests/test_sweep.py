@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from archerisk_core.batch import episodes_to_columns
+from archerisk_core.dataset_generate import iter_generate
+from archerisk_core.sweep import sweep_batch, sweep_expected
+
+POINTS = [{}, {"base_asr.B3.MIXED": 0.9}]
+
+@pytest.fixture(scope="module")
+def columns():
+    cols = episodes_to_columns(list(iter_generate(target_n=600, seed=7)))
+    cols["protected"] = np.arange(600) % 2 == 0  # half the episodes have no protected paths
+    return cols
+
+def test_episode_chunks_match_expected_rates(columns):
+    tiled = {k: np.tile(v, 20) for k, v in columns.items()}  # 12k episodes
+    n_draws = len(tiled["protected"])
+    labels, n_group, counts = sweep_batch(tiled, POINTS, seed=7, by=["defense_baseline"], chunk=1000)
+    _, n_exp, rates = sweep_expected(tiled, POINTS, by=["defense_baseline"])
+    assert n_group.sum() == n_draws and (n_group == n_exp).all()
+    observed = counts / n_group[None, :, None]
+    se = np.sqrt(rates * (1 - rates) / n_group[None, :, None])
+    assert (np.abs(observed - rates) <= 5 * se + 1e-9).all()
+
+def test_single_block_unchanged_by_episode_chunking(columns):
+    # with n <= chunk the episode axis is one block, as before
+    a = sweep_batch(columns, POINTS, seed=3, chunk=10_000)[2]
+    b = sweep_batch(columns, POINTS, seed=3, chunk=len(columns["protected"]) * len(POINTS))[2]
+    assert (a == b).all()
+
+def test_expected_uwr_respects_protected(columns):
+    everything = dict(columns, protected=np.ones(600, dtype=bool))
+    nothing = dict(columns, protected=np.zeros(600, dtype=bool))
+    uwr = {name: sweep_expected(cols, [{}])[2][0, 0, 2] for name, cols in
+           [("all", everything), ("none", nothing), ("half", columns)]}
+    assert uwr["none"] < uwr["half"] < uwr["all"]
@@ -0,0 +1,38 @@
+from integrations.agentbeats_a2a.task_store import TaskStore
+
+def _task(task_id, state):
+    return {"id": task_id, "status": {"state": state}, "artifacts": []}
+
+def test_running_task_survives_a_full_store():
+    store = TaskStore(max_tasks=4, stripes=1)
+    store.put("busy", _task("busy", "running"))
+    for i in range(20):
+        store.put(f"t{i}", _task(f"t{i}", "completed"))
+    assert store.get("busy")["status"]["state"] == "running"
+    assert len(store) == 4  # the running task and the 3 most recent finished ones
+    assert store.get("t16") is None and store.get("t17") is not None
+
+def test_store_of_running_tasks_grows_past_its_limit():
+    store = TaskStore(max_tasks=2, stripes=1)
+    for i in range(5):
+        store.put(f"r{i}", _task(f"r{i}", "running"))
+    assert len(store) == 5 and store.stats()["evictions"] == 0
+    for i in range(5):
+        store.put(f"r{i}", _task(f"r{i}", "completed"))
+    assert len(store) == 2
+
+def test_running_tasks_do_not_expire():
+    store = TaskStore(max_tasks=10, ttl=1e-9, stripes=1)
+    store.put("busy", _task("busy", "running"))
+    store.put("done", _task("done", "completed"))
+    assert store.sweep() == 1
+    assert store.get("busy") is not None
+
+def test_evicted_finished_task_is_read_from_db(tmp_path):
+    store = TaskStore(max_tasks=2, stripes=1, db_path=str(tmp_path / "tasks.sqlite"))
+    store.put("busy", _task("busy", "running"))
+    for i in range(5):
+        store.put(f"t{i}", _task(f"t{i}", "completed"))
+    assert store.get("t0")["status"]["state"] == "completed"
+    assert store.get("busy")["status"]["state"] == "running"
+    store.close()